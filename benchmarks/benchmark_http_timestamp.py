@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+benchmark_http_timestamp.py
+
+compare the time strptime and parse_http_timestamp take to parse HTTP 
+timestamps, with all-distinct timestamps and with the repeated timestamps
+typical of a listing page.
+
+    python -m benchmarks.benchmark_http_timestamp [timestamp count]
+"""
+from __future__ import print_function
+from datetime import datetime
+from email.utils import formatdate
+import sys
+import time
+
+from motoboto.s3 import util
+from motoboto.s3.util import parse_http_timestamp
+
+_default_timestamp_count = 100 * 1000
+_start_time = 1000 * 1000 * 1000
+
+def _strptime(timestamp_str):
+    return datetime.strptime(timestamp_str, util._http_timestamp_format)
+
+def _measure(parser, timestamp_strs):
+    util._http_timestamp_memo.clear()
+    start_time = time.time()
+    for timestamp_str in timestamp_strs:
+        parser(timestamp_str)
+    return time.time() - start_time
+
+def main():
+    timestamp_count = _default_timestamp_count
+    if len(sys.argv) > 1:
+        timestamp_count = int(sys.argv[1])
+
+    distinct = [formatdate(_start_time + n, usegmt=True) 
+                for n in range(timestamp_count)]
+    repeated = [formatdate(_start_time + n // 100, usegmt=True) 
+                for n in range(timestamp_count)]
+
+    print("{0:,} timestamps".format(timestamp_count))
+    print("{0:12} {1:>12} {2:>12} {3:>10}".format(
+        "timestamps", "strptime", "parse", "speedup"
+    ))
+    for label, timestamp_strs in [("distinct", distinct, ), 
+                                  ("repeated", repeated, ), ]:
+        strptime_time = _measure(_strptime, timestamp_strs)
+        parse_time = _measure(parse_http_timestamp, timestamp_strs)
+        print("{0:12} {1:>12.3f} {2:>12.3f} {3:>9.1f}x".format(
+            label, strptime_time, parse_time, strptime_time / parse_time
+        ))
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+benchmark_key_listing.py
+
+compare the memory and time used to build listing results from full Key
+objects and from compact KeyListing records.
+
+No network access is needed: the listing pages are synthesized.
+
+    python -m benchmarks.benchmark_key_listing [key count]
+"""
+from __future__ import print_function
+from email.utils import formatdate
+import sys
+import time
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from motoboto.identity import identity_template
+from motoboto.s3.bucket import Bucket
+
+_default_key_count = 1000 * 1000
+_page_size = 1000
+
+def _synthesize_pages(key_count):
+    timestamp = formatdate(time.time(), usegmt=True)
+    pages = list()
+    for page_start in range(0, key_count, _page_size):
+        page_end = min(page_start + _page_size, key_count)
+        key_data = [
+            {"key"                  : "benchmark/key-{0:010}".format(n),
+             "version_identifier"   : "{0:032x}".format(n),
+             "timestamp"            : timestamp, }
+            for n in range(page_start, page_end)
+        ]
+        pages.append({"key_data" : key_data,
+                      "truncated" : page_end < key_count})
+    return pages
+
+def _build_results(bucket, pages, slim):
+    return [bucket._key_list_from_dict(data_dict, slim) 
+            for data_dict in pages]
+
+def _measure(bucket, pages, slim):
+    """
+    return (seconds, peak bytes) to build and hold the results of every page
+
+    time and memory are measured on separate passes, because tracing 
+    allocations slows everything down
+    """
+    start_time = time.time()
+    results = _build_results(bucket, pages, slim)
+    elapsed_time = time.time() - start_time
+    del results
+
+    peak = None
+    if tracemalloc is not None:
+        tracemalloc.start()
+        results = _build_results(bucket, pages, slim)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del results
+
+    return elapsed_time, peak
+
+def main():
+    key_count = _default_key_count
+    if len(sys.argv) > 1:
+        key_count = int(sys.argv[1])
+
+    identity = identity_template(user_name="benchmark",
+                                 auth_key_id="0",
+                                 auth_key="benchmark")
+    bucket = Bucket(identity, "benchmark")
+    pages = _synthesize_pages(key_count)
+
+    print("{0:,} keys in pages of {1:,}".format(key_count, _page_size))
+    print("{0:12} {1:>10} {2:>12} {3:>14}".format(
+        "records", "seconds", "keys/second", "peak MiB"
+    ))
+    for label, slim in [("Key", False, ), ("KeyListing", True, ), ]:
+        elapsed_time, peak = _measure(bucket, pages, slim)
+        peak_str = ("n/a" if peak is None
+                    else "{0:.1f}".format(peak / (1024.0 * 1024.0)))
+        print("{0:12} {1:>10.2f} {2:>12,.0f} {3:>14}".format(
+            label, elapsed_time, key_count / elapsed_time, peak_str
+        ))
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
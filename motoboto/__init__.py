@@ -4,6 +4,6 @@ init for motoboto
 """
 from motoboto.s3_emulator import S3Emulator
 
-def connect_s3(identity=None):
-    return S3Emulator(identity)
+def connect_s3(identity=None, **kwargs):
+    return S3Emulator(identity, **kwargs)
 
@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+"""
+asyncio interface to nimbus.io
+
+This mirrors the blocking motoboto interface: every method that talks to 
+nimbus.io is a coroutine, and bucket listings support ``async for``.
+"""
+from motoboto.aio.s3_emulator import AsyncS3Emulator
+from motoboto.aio.bucket import AsyncBucket
+from motoboto.aio.bucketlistresultset import AsyncBucketListResultSet
+from motoboto.aio.key import AsyncKey
+from motoboto.aio.multipart import AsyncMultiPartUpload
+
+def connect_s3(identity=None, **kwargs):
+    return AsyncS3Emulator(identity, **kwargs)
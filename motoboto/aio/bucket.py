@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+bucket.py
+
+asyncio counterpart of motoboto.s3.bucket.Bucket
+"""
+import json
+
+from lumberyard.http_util import compute_collection_hostname, \
+        compute_default_hostname, \
+        compute_uri
+
+from motoboto.aio.bucketlistresultset import AsyncBucketListResultSet, \
+        AsyncBucketVersionListResultSet
+from motoboto.aio.deadline import with_deadline
+from motoboto.aio.http_connection import AsyncConnectionPool
+from motoboto.aio.key import AsyncKey
+from motoboto.aio.multipart import AsyncMultiPartUpload
+from motoboto.s3.bucket import Bucket, \
+        _compute_get_all_keys_uri, \
+        _compute_get_all_versions_uri, \
+        _compute_get_all_multipart_uploads_uri
+
+class AsyncBucket(Bucket):
+    """
+    A Bucket whose network operations are coroutines.
+
+    connection_pool must be an AsyncConnectionPool; normally this is the
+    pool of the AsyncS3Emulator that created the bucket.
+    """
+    _key_class = AsyncKey
+    _multipart_upload_class = AsyncMultiPartUpload
+
+    def __init__(
+        self, identity, collection_name, versioning=False, connection_pool=None
+    ):
+        if connection_pool is None:
+            connection_pool = AsyncConnectionPool(identity)
+        super(AsyncBucket, self).__init__(identity,
+                                          collection_name,
+                                          versioning=versioning,
+                                          connection_pool=connection_pool)
+
+    def create_http_connection(self):
+        """
+        create an HTTP connection with our colection name as the host
+
+        Our listing pages are read whole, so none needs a dedicated 
+        connection.
+        """
+        return self._connection_pool.create_http_connection(
+            compute_collection_hostname(self._collection_name)
+        )
+
+    async def _request_json(self, http_connection, method, uri, **kwargs):
+        try:
+            response = await http_connection.request(method, uri, **kwargs)
+            data = await response.read()
+        finally:
+            http_connection.close()
+        return json.loads(data.decode("utf-8"))
+
+    @with_deadline
+    async def configure_versioning(self, versioning):
+        """
+        set the bucket's versioning property to True or False
+        """
+        http_connection = self._connection_pool.create_http_connection(
+            compute_default_hostname()
+        )
+        uri = self._compute_collection_uri(versioning=repr(versioning))
+
+        self._log.info("putting {0}".format(uri))
+        result = await self._request_json(http_connection, "PUT", uri)
+        assert result["success"]
+
+        self._versioning = versioning
+
+    @with_deadline
+    async def configure_access_control(self, access_control):
+        """
+        set the bucket's access_control propoerty to a dict
+        """
+        http_connection = self._connection_pool.create_http_connection(
+            compute_default_hostname()
+        )
+        uri = self._compute_collection_uri(access_control="update")
+
+        body = None
+        headers = dict()
+        if access_control is not None:
+            body = access_control
+            headers["Content-Type"] = "application/json"
+            headers["Content-Length"] = len(body)
+
+        self._log.info("putting {0} {1}".format(uri, headers))
+        return await self._request_json(
+            http_connection, "PUT", uri, body=body, headers=headers
+        )
+
+    @with_deadline
+    async def get_all_keys(
+        self, max_keys=1000, prefix="", marker="", delimiter="", slim=False
+    ):
+        """
+        see Bucket.get_all_keys
+        """
+        http_connection = self.create_http_connection()
+        uri = _compute_get_all_keys_uri(max_keys, prefix, marker, delimiter)
+        data_dict = await self._request_json(http_connection, "GET", uri)
+        return self._key_list_from_dict(data_dict, slim)
+
+    @with_deadline
+    async def get_all_versions(
+        self,
+        max_keys=1000,
+        prefix="",
+        key_marker="",
+        version_id_marker="",
+        delimiter="",
+        slim=False
+    ):
+        """
+        see Bucket.get_all_versions
+        """
+        http_connection = self.create_http_connection()
+        uri = _compute_get_all_versions_uri(
+            max_keys, prefix, key_marker, version_id_marker, delimiter
+        )
+        data_dict = await self._request_json(http_connection, "GET", uri)
+        return self._version_list_from_dict(data_dict, slim)
+
+    @with_deadline
+    async def get_all_multipart_uploads(
+        self, max_uploads=1000, key_marker="", upload_id_marker=""
+    ):
+        """
+        see Bucket.get_all_multipart_uploads
+        """
+        http_connection = self.create_http_connection()
+        uri = _compute_get_all_multipart_uploads_uri(
+            max_uploads, key_marker, upload_id_marker
+        )
+        data_dict = await self._request_json(http_connection, "GET", uri)
+        return self._multipart_upload_list_from_dict(data_dict)
+
+    def __iter__(self):
+        raise TypeError("use 'async for' with AsyncBucket")
+
+    def __aiter__(self):
+        return self.list().__aiter__()
+
+    def list(self, prefix="", delimiter="", marker=""):
+        """
+        return an AsyncBucketListResultSet object, for use with ``async for``
+        """
+        return AsyncBucketListResultSet(self, prefix, delimiter, marker)
+
+    def list_versions(
+        self, prefix="", delimiter="", key_marker="", version_id_marker=""
+    ):
+        """
+        return an AsyncBucketVersionListResultSet object, for use with 
+        ``async for``
+        """
+        return AsyncBucketVersionListResultSet(
+            self, prefix, delimiter, key_marker, version_id_marker
+        )
+
+    @with_deadline
+    async def get_space_used(self):
+        """
+        get disk space statistics for this collection
+        """
+        http_connection = self._connection_pool.create_http_connection(
+            compute_default_hostname()
+        )
+        uri = self._compute_collection_uri(action="space_usage")
+        return await self._request_json(http_connection, "GET", uri)
+
+    @with_deadline
+    async def initiate_multipart_upload(self, key_name):
+        """
+        start a multipart upload, return an AsyncMultiPartUpload
+        """
+        uri = compute_uri("conjoined", key_name, action="start")
+
+        http_connection = self.create_http_connection()
+
+        self._log.info("posting {0}".format(uri))
+        result_dict = await self._request_json(http_connection, "POST", uri)
+
+        return self._multipart_upload_class(bucket=self, **result_dict)
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+AsyncBucketListResultSet
+"""
+import logging
+
+class AsyncBucketListResultSet(object):
+    """
+    An asynchronous iterator over every key in a bucket, for use with
+    ``async for``. Pages are fetched with AsyncBucket.get_all_keys as they
+    are needed.
+    """
+    def __init__(self, bucket, prefix="", delimiter="", marker=""):
+        self._log = logging.getLogger("AsyncBucketListResultSet")
+        self._bucket = bucket
+        self._prefix = prefix
+        self._delimiter = delimiter
+        self._marker = marker
+
+    async def __aiter__(self):
+        more_data = True
+        while more_data:
+            result = await self._bucket.get_all_keys(
+                prefix=self._prefix,
+                delimiter=self._delimiter,
+                marker=self._marker
+            )
+
+            if len(result) == 0 or self._delimiter != "":
+                more_data = False
+            else:
+                more_data = result.truncated
+                self._marker = result[-1].name
+
+            for key in result:
+                yield key
+
+class AsyncBucketVersionListResultSet(object):
+    """
+    An asynchronous iterator over every version of every key in a bucket, 
+    for use with ``async for``. Pages are fetched with 
+    AsyncBucket.get_all_versions as they are needed.
+    """
+    def __init__(self, 
+                 bucket, 
+                 prefix="", 
+                 delimiter="", 
+                 key_marker="", 
+                 version_id_marker=""):
+        self._log = logging.getLogger("AsyncBucketVersionListResultSet")
+        self._bucket = bucket
+        self._prefix = prefix
+        self._delimiter = delimiter
+        self._key_marker = key_marker
+        self._version_id_marker = version_id_marker
+
+    async def __aiter__(self):
+        key_marker = self._key_marker
+        version_id_marker = self._version_id_marker
+        more_data = True
+        while more_data:
+            result = await self._bucket.get_all_versions(
+                prefix=self._prefix,
+                key_marker=key_marker,
+                version_id_marker=version_id_marker,
+                delimiter=self._delimiter
+            )
+
+            if len(result) == 0 or self._delimiter != "":
+                more_data = False
+            else:
+                more_data = result.truncated
+                key_marker = result[-1].name
+                version_id_marker = result[-1].version_id
+
+            for key in result:
+                yield key
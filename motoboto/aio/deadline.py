@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+deadline.py
+
+deadlines for the asyncio client, see motoboto.deadline
+"""
+import asyncio
+import functools
+import socket
+
+from motoboto.deadline import DeadlineExceeded, deadline_scope, \
+        _pop_timeouts
+
+async def wait_for(awaitable, timeout):
+    """
+    await awaitable, raising socket.timeout if it takes more than timeout
+    seconds. A timeout of None waits as long as it takes.
+    """
+    if timeout is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except DeadlineExceeded:
+        raise
+    except asyncio.TimeoutError:
+        raise socket.timeout("timed out after {0:.3f} seconds".format(
+            timeout
+        ))
+
+def with_deadline(method):
+    """
+    decorate a coroutine method to take total_timeout, connect_timeout and
+    first_byte_timeout keyword arguments, and run in a deadline_scope of
+    them if any is given
+    """
+    @functools.wraps(method)
+    async def _method_with_deadline(*args, **kwargs):
+        timeouts = _pop_timeouts(kwargs)
+        if timeouts == (None, None, None, ):
+            return await method(*args, **kwargs)
+        with deadline_scope(*timeouts):
+            return await method(*args, **kwargs)
+    return _method_with_deadline
@@ -0,0 +1,736 @@
+# -*- coding: utf-8 -*-
+"""
+http_connection.py
+
+A minimal asyncio HTTP/1.1 client for nimbus.io, with a keep-alive pool.
+
+Requests are signed the same way lumberyard signs them. The address, port
+and scheme of each host come from lumberyard's own HTTPConnection, so
+the asyncio client goes wherever the blocking client would go.
+"""
+import asyncio
+from http.client import OK, HTTPSConnection
+import logging
+import os
+import socket
+import ssl
+import time
+from urllib.parse import unquote_plus
+
+from lumberyard.http_connection import HTTPConnection, LumberyardHTTPError
+from lumberyard.http_util import compute_authentication_string
+
+from motoboto.aio.deadline import wait_for
+from motoboto.connection_pool import _default_max_connections_per_host, \
+        _default_idle_timeout
+from motoboto.circuit_breaker import is_failure
+from motoboto.deadline import DeadlineExceeded, current_deadline
+from motoboto.hedge import hedged_methods
+from motoboto.retry import RetryPolicy, compute_body_position, rewind_body
+
+_read_buffer_size = 64 * 1024
+_max_discard_size = 64 * 1024
+
+class AsyncHTTPError(LumberyardHTTPError):
+    """
+    an unexpected HTTP status from the asyncio client.
+
+    This is a LumberyardHTTPError, so code written for the blocking client
+    can catch it the same way.
+    """
+    def __init__(self, status, reason):
+        Exception.__init__(self, "{0} {1}".format(status, reason))
+        self.status = status
+        self.reason = reason
+
+def _compute_address(hostname, identity):
+    """
+    return (host, port, ssl_context) for a nimbus.io hostname, as lumberyard
+    would connect to it
+    """
+    # constructing a lumberyard connection does not open a socket
+    connection = HTTPConnection(hostname,
+                                identity.user_name,
+                                identity.auth_key,
+                                identity.auth_key_id)
+    ssl_context = None
+    if isinstance(connection, HTTPSConnection):
+        ssl_context = ssl.create_default_context()
+    return connection.host, connection.port, ssl_context
+
+def _compute_body_length(body):
+    """
+    return the length of a request body or None if we can't tell
+    without reading it
+    """
+    if body is None:
+        return 0
+    if isinstance(body, str):
+        return len(body.encode("utf-8"))
+    if isinstance(body, (bytes, bytearray, memoryview, )):
+        return len(body)
+    try:
+        return os.fstat(body.fileno()).st_size - body.tell()
+    except (AttributeError, OSError, ValueError, ):
+        pass
+    try:
+        position = body.tell()
+        body.seek(0, os.SEEK_END)
+        length = body.tell() - position
+        body.seek(position)
+        return length
+    except (AttributeError, OSError, ValueError, ):
+        return None
+
+def _compute_timeout(deadline, step_timeout=None):
+    if deadline is None:
+        return step_timeout
+    return deadline.compute_timeout(step_timeout)
+
+class AsyncHTTPResponse(object):
+    """
+    the response to a request made with AsyncHTTPConnection.
+
+    Reading the body is bound by deadline, if it is not None.
+    """
+    def __init__(self, reader, method, status, reason, headers, 
+                 deadline=None):
+        self._reader = reader
+        self._deadline = deadline
+        self.status = status
+        self.reason = reason
+        self._headers = headers
+
+        self._chunked = \
+            headers.get("transfer-encoding", "").lower() == "chunked"
+        self._chunk_left = 0
+        self.will_close = headers.get("connection", "").lower() == "close"
+
+        if method == "HEAD" or status in (204, 304, ) or 100 <= status < 200:
+            self.length = 0
+        elif self._chunked:
+            self.length = None
+        elif "content-length" in headers:
+            self.length = int(headers["content-length"])
+        else:
+            self.length = None
+            self.will_close = True
+
+        self._closed = (self.length == 0)
+
+    def getheader(self, name, default=None):
+        return self._headers.get(name.lower(), default)
+
+    def getheaders(self):
+        return list(self._headers.items())
+
+    def isclosed(self):
+        return self._closed
+
+    async def read(self, amt=None):
+        """
+        read up to amt bytes of the body, or all of it if amt is None.
+
+        returns b"" at the end of the body
+        """
+        if self._closed:
+            return b""
+
+        if amt is not None and self._deadline is not None:
+            timeout = self._deadline.compute_timeout()
+            return await wait_for(self._read(amt), timeout)
+        return await self._read(amt)
+
+    async def _read(self, amt):
+        if amt is None:
+            data_list = list()
+            while True:
+                data = await self.read(_read_buffer_size)
+                if len(data) == 0:
+                    break
+                data_list.append(data)
+            return b"".join(data_list)
+
+        if self._chunked:
+            return await self._read_chunked(amt)
+
+        if self.length is None:
+            data = await self._reader.read(amt)
+            if len(data) == 0:
+                self._closed = True
+            return data
+
+        data = await self._reader.read(min(amt, self.length))
+        if len(data) == 0:
+            raise asyncio.IncompleteReadError(data, self.length)
+        self.length -= len(data)
+        if self.length == 0:
+            self._closed = True
+        return data
+
+    async def _read_chunked(self, amt):
+        if self._chunk_left == 0:
+            line = await self._reader.readline()
+            chunk_size = int(line.split(b";", 1)[0].strip(), 16)
+            if chunk_size == 0:
+                # skip any trailers
+                while True:
+                    line = await self._reader.readline()
+                    if line in (b"\r\n", b"\n", b"", ):
+                        break
+                self._closed = True
+                return b""
+            self._chunk_left = chunk_size
+
+        data = await self._reader.read(min(amt, self._chunk_left))
+        if len(data) == 0:
+            raise asyncio.IncompleteReadError(data, self._chunk_left)
+        self._chunk_left -= len(data)
+        if self._chunk_left == 0:
+            await self._reader.readline()
+        return data
+
+class AsyncHTTPConnection(object):
+    """
+    an asyncio counterpart of the lumberyard HTTPConnection: one socket
+    to one nimbus.io host, authenticated as identity
+
+    Each step of a request is bound by deadline, the Deadline of the 
+    request, if any.
+    """
+    deadline = None
+
+    def __init__(self, hostname, identity, address):
+        self._log = logging.getLogger("AsyncHTTPConnection")
+        self._hostname = hostname
+        self._identity = identity
+        self._host, self._port, self._ssl_context = address
+        self._reader = None
+        self._writer = None
+        self.last_response = None
+
+    async def request(self, method, uri, body=None, headers=None,
+                      expected_status=OK):
+        """
+        send a request and read the response status and headers.
+
+        body may be bytes, str, or a file-like object with a read() method.
+
+        raise AsyncHTTPError if the status is not expected_status
+        """
+        if self._writer is None:
+            connect_timeout = None
+            if self.deadline is not None:
+                connect_timeout = self.deadline.connect_timeout
+            timeout = _compute_timeout(self.deadline, connect_timeout)
+            await wait_for(self._connect(), timeout)
+
+        if headers is None:
+            headers = dict()
+        else:
+            headers = dict(headers)
+
+        timestamp = int(time.time())
+        headers["Authorization"] = compute_authentication_string(
+            self._identity.auth_key_id,
+            self._identity.auth_key,
+            self._identity.user_name,
+            method,
+            timestamp,
+            unquote_plus(uri)
+        )
+        headers["x-nimbus-io-timestamp"] = str(timestamp)
+        headers["Host"] = self._compute_host_header()
+
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+
+        body_length = _compute_body_length(body)
+        if body_length is None:
+            headers["Transfer-Encoding"] = "chunked"
+        elif body is not None or method in ("POST", "PUT", ):
+            headers["Content-Length"] = str(body_length)
+
+        request_lines = ["{0} {1} HTTP/1.1".format(method, uri)]
+        for name, value in headers.items():
+            request_lines.append("{0}: {1}".format(name, value))
+        request_lines.extend(["", ""])
+        self._writer.write("\r\n".join(request_lines).encode("latin-1"))
+
+        timeout = _compute_timeout(self.deadline)
+        await wait_for(self._send_body(body, body_length is None), timeout)
+
+        first_byte_timeout = None
+        if self.deadline is not None:
+            first_byte_timeout = self.deadline.first_byte_timeout
+        timeout = _compute_timeout(self.deadline, first_byte_timeout)
+        response = await wait_for(self._read_response(method), timeout)
+        self.last_response = response
+
+        if response.status != expected_status:
+            raise AsyncHTTPError(response.status, response.reason)
+
+        return response
+
+    def is_reusable(self):
+        response = self.last_response
+        if response is None or self._writer is None:
+            return False
+        return response.isclosed() and not response.will_close
+
+    async def discard_response(self):
+        """
+        read and drop a small unread response body (from an error response)
+        so the connection can be reused
+        """
+        response = self.last_response
+        if response is None or response.isclosed():
+            return
+        if response.length is None or response.length > _max_discard_size:
+            return
+        try:
+            await response.read()
+        except (asyncio.IncompleteReadError, OSError, ):
+            self.last_response = None
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            self._reader = None
+
+    def _compute_host_header(self):
+        default_port = (443 if self._ssl_context is not None else 80)
+        if self._port == default_port:
+            return self._host
+        return "{0}:{1}".format(self._host, self._port)
+
+    async def _connect(self):
+        self._log.debug("connecting to {0}:{1}".format(self._host,
+                                                       self._port))
+        server_hostname = (self._host if self._ssl_context is not None
+                           else None)
+        self._reader, self._writer = await asyncio.open_connection(
+            self._host,
+            self._port,
+            ssl=self._ssl_context,
+            server_hostname=server_hostname
+        )
+
+    async def _send_body(self, body, chunked):
+        if body is None:
+            pass
+        elif hasattr(body, "read"):
+            await self._send_file_body(body, chunked)
+        else:
+            self._writer.write(body)
+        await self._writer.drain()
+
+    async def _send_file_body(self, file_object, chunked):
+        while True:
+            data = file_object.read(_read_buffer_size)
+            if isinstance(data, str):
+                data = data.encode("utf-8")
+            if len(data) == 0:
+                break
+            if chunked:
+                self._writer.write("{0:x}\r\n".format(len(data)).encode())
+                self._writer.write(data)
+                self._writer.write(b"\r\n")
+            else:
+                self._writer.write(data)
+            await self._writer.drain()
+        if chunked:
+            self._writer.write(b"0\r\n\r\n")
+
+    async def _read_response(self, method):
+        while True:
+            status_line = await self._reader.readline()
+            if len(status_line) == 0:
+                raise ConnectionResetError(
+                    "connection closed by {0}".format(self._hostname)
+                )
+            _version, status, reason = \
+                (status_line.decode("latin-1").rstrip("\r\n").split(" ", 2)
+                 + [""])[:3]
+            status = int(status)
+            headers = dict()
+            while True:
+                line = await self._reader.readline()
+                if line in (b"\r\n", b"\n", b"", ):
+                    break
+                name, value = line.decode("latin-1").split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+            # skip interim responses such as 100 Continue
+            if status != 100:
+                return AsyncHTTPResponse(
+                    self._reader, method, status, reason, headers, 
+                    self.deadline
+                )
+
+class AsyncPooledHTTPConnection(object):
+    """
+    A connection checked out of an AsyncConnectionPool, with the same
+    interface as AsyncHTTPConnection. close() returns the underlying
+    connection to the pool if its response has been completely read.
+    """
+    def __init__(self, pool, hostname):
+        self._log = logging.getLogger("AsyncPooledHTTPConnection")
+        self._pool = pool
+        self._hostname = hostname
+        self._connection = None
+        self._reused = False
+        self._retry_after = None
+
+    @property
+    def hostname(self):
+        return self._hostname
+
+    async def request(self, method, uri, body=None, headers=None,
+                      expected_status=OK):
+        """
+        send a request through a pooled connection,
+        see AsyncHTTPConnection.request
+
+        A request that fails is sent again as the pool's RetryPolicy allows.
+
+        The request is bound by the Deadline of the deadline scope we are 
+        in, if any.
+        """
+        retry_policy = self._pool.retry_policy
+        retry_policy.request_sent()
+        deadline = current_deadline()
+        body_position = compute_body_position(body)
+        attempt = 0
+        while True:
+            self._retry_after = None
+            if deadline is not None:
+                deadline.check()
+            try:
+                return await self._request_once(method, 
+                                                uri, 
+                                                body, 
+                                                headers, 
+                                                expected_status)
+            except Exception as instance:
+                error = instance
+                if deadline is not None and \
+                   isinstance(error, socket.timeout) and \
+                   not isinstance(error, DeadlineExceeded) and \
+                   deadline.remaining() is not None and \
+                   deadline.remaining() <= 0.0:
+                    raise DeadlineExceeded("deadline exceeded during "
+                                           "{0} {1}: {2}".format(method, 
+                                                                 uri, 
+                                                                 error))
+                delay = retry_policy.compute_retry_delay(method, 
+                                                         uri, 
+                                                         error, 
+                                                         attempt,
+                                                         self._retry_after)
+                if delay is None or not rewind_body(body, body_position):
+                    raise
+                if deadline is not None and \
+                   deadline.remaining() is not None and \
+                   deadline.remaining() <= delay:
+                    # no time to wait for a retry
+                    raise
+            attempt += 1
+            self._log.warning("{0} {1} failed, retry {2} in {3:.3f} "
+                              "seconds: {4}".format(method, 
+                                                    uri, 
+                                                    attempt, 
+                                                    delay, 
+                                                    error))
+            await asyncio.sleep(delay)
+
+    async def _request_once(self, method, uri, body, headers, 
+                            expected_status):
+        breaker = None
+        probe = None
+        circuit_breaker_policy = self._pool.circuit_breaker_policy
+        if circuit_breaker_policy is not None:
+            breaker = circuit_breaker_policy.breaker(self._hostname)
+            probe = breaker.before_request()
+        try:
+            response = await self._send_or_hedge(method, 
+                                                 uri, 
+                                                 body, 
+                                                 headers, 
+                                                 expected_status)
+        except Exception as instance:
+            if breaker is not None:
+                if is_failure(instance):
+                    breaker.record_failure(probe)
+                else:
+                    breaker.record_success(probe)
+            raise
+        if breaker is not None:
+            breaker.record_success(probe)
+        return response
+
+    async def _send_or_hedge(self, method, uri, body, headers, 
+                             expected_status):
+        hedge_policy = self._pool.hedge_policy
+        if hedge_policy is not None and method in hedged_methods:
+            return await self._hedged_request(hedge_policy, 
+                                              method, 
+                                              uri, 
+                                              headers, 
+                                              expected_status)
+        return await self._send(method, uri, body, headers, expected_status)
+
+    async def _hedged_request(self, hedge_policy, method, uri, headers, 
+                              expected_status):
+        """
+        send the request, and if it is slower than the hedge delay, a copy
+        on another connection. Take over the connection of the first to 
+        succeed, and cancel the other.
+        """
+        hedge_policy.request_sent()
+        delay = hedge_policy.compute_hedge_delay()
+        if delay is None:
+            start_time = time.time()
+            response = await self._send(method, 
+                                        uri, 
+                                        None, 
+                                        headers, 
+                                        expected_status)
+            hedge_policy.record_latency(time.time() - start_time)
+            return response
+
+        async def _run(attempt):
+            start_time = time.time()
+            response = await attempt._send(method, 
+                                           uri, 
+                                           None, 
+                                           headers, 
+                                           expected_status)
+            hedge_policy.record_latency(time.time() - start_time)
+            return response
+
+        attempts = [AsyncPooledHTTPConnection(self._pool, self._hostname)]
+        tasks = [asyncio.ensure_future(_run(attempts[0]))]
+        done, pending = await asyncio.wait(tasks, timeout=delay)
+        if len(done) == 0 and hedge_policy.start_hedge():
+            self._log.debug("hedging {0} {1} after {2:.3f} seconds".format(
+                method, uri, delay
+            ))
+            attempts.append(
+                AsyncPooledHTTPConnection(self._pool, self._hostname)
+            )
+            tasks.append(asyncio.ensure_future(_run(attempts[1])))
+            pending = set(tasks)
+
+        winner = None
+        error = None
+        try:
+            while winner is None:
+                for task in tasks:
+                    if not task.done() or task.cancelled():
+                        continue
+                    if task.exception() is None:
+                        if winner is None:
+                            winner = task
+                    elif error is None:
+                        error = task.exception()
+                        attempt = attempts[tasks.index(task)]
+                        self._retry_after = attempt._retry_after
+                if winner is not None or len(pending) == 0:
+                    break
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+        finally:
+            # a cancelled request releases its connection as unusable
+            for task in pending:
+                task.cancel()
+
+        if winner is None:
+            raise error
+
+        winner_attempt = attempts[tasks.index(winner)]
+        for attempt, task in zip(attempts, tasks):
+            if task is not winner and task.done() and not task.cancelled():
+                # a response we won't read
+                attempt.close()
+        if winner_attempt is not attempts[0]:
+            hedge_policy.hedge_won()
+        self.close()
+        self._connection = winner_attempt._connection
+        self._reused = winner_attempt._reused
+        winner_attempt._connection = None
+        return winner.result()
+
+    async def _send(self, method, uri, body, headers, expected_status):
+        replayable = not hasattr(body, "read")
+        for attempt in range(2):
+            if self._connection is None:
+                self._connection, self._reused = await self._pool._checkout(
+                    self._hostname, reuse_idle=(attempt == 0)
+                )
+            self._connection.deadline = current_deadline()
+            try:
+                return await self._connection.request(
+                    method,
+                    uri,
+                    body=body,
+                    headers=headers,
+                    expected_status=expected_status
+                )
+            except AsyncHTTPError:
+                self._retry_after = \
+                    self._connection.last_response.getheader("Retry-After")
+                await self._connection.discard_response()
+                self._release(self._connection.is_reusable())
+                raise
+            except (OSError, asyncio.IncompleteReadError, ) as instance:
+                self._release(reusable=False)
+                # an idle connection the server has closed under us:
+                # try once more on a fresh socket
+                if attempt > 0 or not self._reused or not replayable or \
+                   isinstance(instance, socket.timeout):
+                    raise
+                self._log.debug("stale connection to {0}".format(
+                    self._hostname
+                ))
+            except BaseException:
+                # includes cancellation: the socket is in an unknown state
+                self._release(reusable=False)
+                raise
+
+    def close(self):
+        """
+        return the connection to the pool
+        """
+        if self._connection is not None:
+            self._release(self._connection.is_reusable())
+
+    def _release(self, reusable):
+        connection = self._connection
+        self._connection = None
+        if connection is not None:
+            self._pool._checkin(self._hostname, connection, reusable)
+
+    def __del__(self):
+        # a caller that fails part way through reading a response may never
+        # call close(); don't let that hold a slot of the pool forever
+        if getattr(self, "_connection", None) is not None:
+            self._release(reusable=False)
+
+class AsyncConnectionPool(object):
+    """
+    Keep-alive asyncio connections to nimbus.io, organized by hostname
+
+    max_connections_per_host
+        the most connections we will have in use to one host.
+        A request for a connection beyond this waits for one to be returned.
+
+    idle_timeout
+        seconds an idle connection is kept before it is closed
+
+    retry_policy
+        the motoboto.retry.RetryPolicy for requests through the pool,
+        None for a default RetryPolicy of our own
+
+    hedge_policy
+        if not None, a motoboto.hedge.HedgePolicy for hedging slow GET and
+        HEAD requests through the pool
+
+    circuit_breaker_policy
+        if not None, a motoboto.circuit_breaker.CircuitBreakerPolicy, which
+        stops requests to a host while it is failing
+    """
+    def __init__(self,
+                 identity,
+                 max_connections_per_host=_default_max_connections_per_host,
+                 idle_timeout=_default_idle_timeout,
+                 retry_policy=None,
+                 hedge_policy=None,
+                 circuit_breaker_policy=None):
+        self._log = logging.getLogger("AsyncConnectionPool")
+        self._identity = identity
+        self._max_connections_per_host = max_connections_per_host
+        self._idle_timeout = idle_timeout
+        self._retry_policy = (RetryPolicy() if retry_policy is None
+                              else retry_policy)
+        self._hedge_policy = hedge_policy
+        self._circuit_breaker_policy = circuit_breaker_policy
+        self._addresses = dict()
+        self._semaphores = dict()
+        self._idle = dict()
+        self._closed = False
+
+    @property
+    def retry_policy(self):
+        return self._retry_policy
+
+    @property
+    def hedge_policy(self):
+        return self._hedge_policy
+
+    @property
+    def circuit_breaker_policy(self):
+        return self._circuit_breaker_policy
+
+    def create_http_connection(self, hostname):
+        """
+        return an AsyncPooledHTTPConnection to hostname
+        """
+        return AsyncPooledHTTPConnection(self, hostname)
+
+    def idle_count(self, hostname=None):
+        if hostname is not None:
+            return len(self._idle.get(hostname, []))
+        return sum(len(idle_list) for idle_list in self._idle.values())
+
+    def close(self):
+        """
+        close all idle connections.
+
+        Connections in use are closed when they are returned.
+        """
+        self._closed = True
+        for idle_list in self._idle.values():
+            for connection, _ in idle_list:
+                connection.close()
+        self._idle.clear()
+
+    async def _checkout(self, hostname, reuse_idle=True):
+        """
+        return (connection, reused)
+        """
+        if hostname not in self._semaphores:
+            self._semaphores[hostname] = \
+                asyncio.Semaphore(self._max_connections_per_host)
+        timeout = _compute_timeout(current_deadline())
+        try:
+            await wait_for(self._semaphores[hostname].acquire(), timeout)
+        except socket.timeout:
+            raise DeadlineExceeded("deadline exceeded waiting for a "
+                                   "connection to {0}".format(hostname))
+
+        idle_list = self._idle.get(hostname, [])
+        cutoff = time.time() - self._idle_timeout
+        while len(idle_list) > 0:
+            connection, idle_time = idle_list.pop()
+            if reuse_idle and idle_time >= cutoff:
+                return connection, True
+            connection.close()
+
+        if hostname not in self._addresses:
+            self._addresses[hostname] = \
+                _compute_address(hostname, self._identity)
+        connection = AsyncHTTPConnection(
+            hostname, self._identity, self._addresses[hostname]
+        )
+        return connection, False
+
+    def _checkin(self, hostname, connection, reusable):
+        if reusable and not self._closed:
+            self._idle.setdefault(hostname, []).append(
+                (connection, time.time(), )
+            )
+        else:
+            connection.close()
+        self._semaphores[hostname].release()
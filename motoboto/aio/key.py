@@ -0,0 +1,363 @@
+# -*- coding: utf-8 -*-
+"""
+key.py
+
+asyncio counterpart of motoboto.s3.key.Key
+"""
+from http.client import OK, PARTIAL_CONTENT, NOT_FOUND
+import json
+import os
+import sys
+
+from lumberyard.http_connection import LumberyardHTTPError
+from lumberyard.http_util import compute_uri
+from lumberyard.read_reporter import ReadReporter
+
+from motoboto.aio.deadline import with_deadline
+from motoboto.s3.archive_callback_wrapper import ArchiveCallbackWrapper
+from motoboto.s3.key import Key, \
+        _read_buffer_size, \
+        _convert_slice_to_range_header, \
+        _convert_conditions_to_headers, \
+        _convert_retrieve_error, \
+        _compute_archive_kwargs
+from motoboto.s3.retrieve_callback_wrapper import NullCallbackWrapper, \
+        RetrieveCallbackWrapper
+
+class AsyncKey(Key):
+    """
+    A Key whose network operations are coroutines.
+
+    The arguments and results are the same as for motoboto.s3.key.Key.
+    """
+    @with_deadline
+    async def exists(self, modified_since=None, unmodified_since=None):
+        """
+        return True if we can HEAD the key, and it fits one of the
+        optional date_modified restrctions.
+        """
+        found = False
+
+        if self._bucket is None:
+            raise ValueError("No bucket")
+        if self._name is None:
+            raise ValueError("No name")
+        if modified_since is not None and unmodified_since is not None:
+            raise ValueError(
+                "Can't specify both modified_since and unmodified_since")
+
+        method = "HEAD"
+        uri = compute_uri("data", self._name)
+        headers = {}
+        _convert_conditions_to_headers(headers,
+                                       modified_since,
+                                       unmodified_since)
+
+        http_connection = self._bucket.create_http_connection()
+
+        self._log.info("requesting HEAD {0} {1}".format(uri, headers))
+        try:
+            try:
+                response = await http_connection.request(method,
+                                                         uri,
+                                                         body=None,
+                                                         headers=headers)
+            except LumberyardHTTPError:
+                instance = sys.exc_info()[1]
+                # not modified, not found, precondition not met
+                if instance.status not in [304, 404, 412]:
+                    self._log.error(str(instance))
+                    raise
+            else:
+                found = True
+
+            if found:
+                await response.read()
+        finally:
+            http_connection.close()
+
+        return found
+
+    @with_deadline
+    async def set_contents_from_string(
+        self,
+        data,
+        replace=True,
+        cb=None,
+        cb_count=10,
+        multipart_id=None,
+        part_num=0,
+    ):
+        """
+        archive the content of the string into nimbus.io
+
+        sets version_id attribute after successful archive
+        """
+        if self._bucket is None:
+            raise ValueError("No bucket")
+        if self._name is None:
+            raise ValueError("No name")
+
+        kwargs = _compute_archive_kwargs(self._metadata,
+                                         multipart_id,
+                                         part_num)
+
+        method = "POST"
+        uri = compute_uri("data", self._name, **kwargs)
+
+        http_connection = self._bucket.create_http_connection()
+
+        self._log.info("posting {0}".format(uri))
+        try:
+            response = await http_connection.request(method, uri, body=data)
+            response_str = await response.read()
+        finally:
+            http_connection.close()
+
+        response_dict = json.loads(response_str.decode("utf-8"))
+        self._version_id = response_dict["version_identifier"]
+
+    @with_deadline
+    async def set_contents_from_file(
+        self,
+        file_object,
+        replace=True,
+        cb=None,
+        cb_count=10,
+        multipart_id=None,
+        part_num=0
+    ):
+        """
+        archive the content of the file in nimbus.io
+
+        The file is read with ordinary blocking reads, one buffer at a time,
+        between writes to the socket.
+        """
+        if self._bucket is None:
+            raise ValueError("No bucket")
+        if self._name is None:
+            raise ValueError("No name")
+
+        if cb is None:
+            body = file_object
+        else:
+            body = ReadReporter(file_object)
+            ArchiveCallbackWrapper(body, cb, cb_count)
+
+        kwargs = _compute_archive_kwargs(self._metadata,
+                                         multipart_id,
+                                         part_num)
+
+        method = "POST"
+        uri = compute_uri("data", self._name, **kwargs)
+
+        http_connection = self._bucket.create_http_connection()
+
+        self._log.info("requesting POST {0}".format(uri))
+        try:
+            response = await http_connection.request(method, uri, body=body)
+            response_str = await response.read()
+        finally:
+            http_connection.close()
+
+        response_dict = json.loads(response_str.decode("utf-8"))
+        self._version_id = response_dict["version_identifier"]
+
+    async def _request_contents(self,
+                                version_id,
+                                slice_offset,
+                                slice_size,
+                                modified_since,
+                                unmodified_since):
+        """
+        start a GET of the key's contents: return (http_connection, response)
+        """
+        if self._bucket is None:
+            raise ValueError("No bucket")
+        if self._name is None:
+            raise ValueError("No name")
+        if modified_since is not None and unmodified_since is not None:
+            raise ValueError(
+                "Can't specify both modified_since and unmodified_since")
+
+        kwargs = {
+            "version_identifier"    : version_id,
+        }
+        headers = {}
+        _convert_slice_to_range_header(headers, slice_offset, slice_size)
+        expected_status = (PARTIAL_CONTENT if "Range" in headers else OK)
+        _convert_conditions_to_headers(headers,
+                                       modified_since,
+                                       unmodified_since)
+
+        method = "GET"
+        uri = compute_uri("data", self._name, **kwargs)
+
+        http_connection = self._bucket.create_http_connection()
+
+        self._log.info("requesting GET {0} {1}".format(uri, headers))
+        try:
+            response = await http_connection.request(
+                method,
+                uri,
+                body=None,
+                headers=headers,
+                expected_status=expected_status
+            )
+        except LumberyardHTTPError:
+            instance = sys.exc_info()[1]
+            http_connection.close()
+            error = _convert_retrieve_error(instance,
+                                            modified_since,
+                                            unmodified_since)
+            if error is instance:
+                raise
+            raise error
+
+        return http_connection, response
+
+    @with_deadline
+    async def get_contents_as_string(self,
+                                     cb=None,
+                                     cb_count=10,
+                                     version_id=None,
+                                     slice_offset=None,
+                                     slice_size=None,
+                                     modified_since=None,
+                                     unmodified_since=None):
+        """
+        retrieve the contents from nimbus.io as a string
+        """
+        http_connection, response = await self._request_contents(
+            version_id, slice_offset, slice_size, modified_since,
+            unmodified_since
+        )
+
+        body_list = list()
+        try:
+            while True:
+                data = await response.read(_read_buffer_size)
+                if len(data) == 0:
+                    break
+                body_list.append(data)
+        finally:
+            # a connection with its response unread goes back as unusable
+            http_connection.close()
+
+        return b"".join(body_list)
+
+    @with_deadline
+    async def get_contents_to_file(self,
+                                   file_object,
+                                   cb=None,
+                                   cb_count=10,
+                                   version_id=None,
+                                   slice_offset=None,
+                                   slice_size=None,
+                                   modified_since=None,
+                                   unmodified_since=None,
+                                   resumable=False,
+                                   res_download_handler=None):
+        """
+        retrieve the contents from nimbus.io to a file
+
+        The file is written with ordinary blocking writes.
+        """
+        if resumable == True or res_download_handler is not None:
+            file_object.seek(0, os.SEEK_END)
+            current_file_size = file_object.tell()
+            if slice_size is not None:
+                assert current_file_size < slice_size
+                slice_size -= current_file_size
+            if slice_offset is not None:
+                slice_offset += current_file_size
+            else:
+                slice_offset = current_file_size
+
+        http_connection, response = await self._request_contents(
+            version_id, slice_offset, slice_size, modified_since,
+            unmodified_since
+        )
+
+        if cb is None:
+            reporter = NullCallbackWrapper()
+        else:
+            reporter = RetrieveCallbackWrapper(self.size, cb, cb_count)
+
+        reporter.start()
+        try:
+            while True:
+                data = await response.read(_read_buffer_size)
+                bytes_read = len(data)
+                if bytes_read == 0:
+                    break
+                file_object.write(data)
+                reporter.bytes_written(bytes_read)
+        finally:
+            http_connection.close()
+        reporter.finish()
+
+    @with_deadline
+    async def delete(self, version_id=None):
+        """
+        delete this key from the nimbus.io collection
+        """
+        if self._bucket is None:
+            raise ValueError("No bucket")
+        if self._name is None:
+            raise ValueError("No name")
+
+        kwargs = dict()
+        if version_id is not None:
+            kwargs["version_identifier"] = version_id
+
+        method = "DELETE"
+        uri = compute_uri("data", self._name, **kwargs)
+
+        http_connection = self._bucket.create_http_connection()
+
+        self._log.info("requesting DELETE {0}".format(uri))
+        try:
+            response = await http_connection.request(method, uri, body=None)
+            await response.read()
+        finally:
+            http_connection.close()
+
+    @with_deadline
+    async def get_metadata(self, meta_key):
+        """
+        return the meta_value associated with the meta_key
+
+        returns None if the meta_key (or the key itself) does not exist.
+        """
+        if meta_key in self._metadata:
+            return self._metadata[meta_key]
+
+        if self._bucket is None:
+            raise ValueError("No bucket")
+        if self._name is None:
+            raise ValueError("No name")
+
+        method = "GET"
+        uri = compute_uri("data", self._name, action="meta")
+
+        http_connection = self._bucket.create_http_connection()
+
+        self._log.info("requesting GET {0}".format(uri))
+        try:
+            response = await http_connection.request(method, uri, body=None)
+            data = await response.read()
+        except LumberyardHTTPError:
+            instance = sys.exc_info()[1]
+            if instance.status == NOT_FOUND:
+                self._log.warn("key not found retrieving meta")
+                return None
+
+            self._log.error(str(instance))
+            raise
+        finally:
+            http_connection.close()
+
+        self.update_metadata(json.loads(data.decode("utf-8")))
+
+        return self._metadata.get(meta_key)
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+multipart.py
+
+asyncio counterpart of motoboto.s3.multipart.MultiPartUpload
+"""
+import json
+
+from lumberyard.http_util import compute_uri
+
+from motoboto.aio.deadline import with_deadline
+from motoboto.s3.multipart import MultiPartUpload, Part
+
+class AsyncMultiPartUpload(MultiPartUpload):
+    """
+    A MultiPartUpload whose network operations are coroutines.
+    """
+    async def _post_action(self, action):
+        kwargs = {
+            "action"                : action,
+            "conjoined_identifier"  : self._conjoined_identifier,
+        }
+
+        method = "POST"
+        uri = compute_uri("conjoined", self.key_name, **kwargs)
+
+        http_connection = self._bucket.create_http_connection()
+
+        self._log.info("posting {0}".format(uri))
+        try:
+            response = await http_connection.request(method, uri)
+            await response.read()
+        finally:
+            http_connection.close()
+
+    @with_deadline
+    async def cancel_upload(self):
+        """
+        Cancels a MultiPart Upload operation. The storage consumed by any
+        previously uploaded parts will be freed.
+        """
+        await self._post_action("abort")
+
+    @with_deadline
+    async def complete_upload(self):
+        """
+        Complete the MultiPart Upload operation.
+
+        This method should be called when all parts of the file have been
+        successfully uploaded.
+        """
+        await self._post_action("finish")
+
+    # part_lister is synchronous, page with get_all_parts instead
+    __iter__ = None
+
+    @with_deadline
+    async def get_all_parts(self, max_parts=None, part_number_marker=None):
+        """
+        Return the uploaded parts of this MultiPart Upload, in part number
+        order. Sets is_truncated, and next_part_number_marker for the next
+        call when there are more parts.
+        """
+        kwargs = {
+            "conjoined_identifier"  : self._conjoined_identifier,
+        }
+        if max_parts is not None:
+            kwargs["max_parts"] = max_parts
+        if part_number_marker is not None:
+            kwargs["part_number_marker"] = part_number_marker
+
+        method = "GET"
+        uri = compute_uri("conjoined", self.key_name, **kwargs)
+
+        http_connection = self._bucket.create_http_connection()
+
+        self._log.info("requesting {0}".format(uri))
+        try:
+            response = await http_connection.request(method, uri)
+            data = await response.read()
+        finally:
+            http_connection.close()
+
+        result_dict = json.loads(data.decode("utf-8"))
+        parts = [Part(self._bucket, **part_dict)
+                 for part_dict in result_dict["part_list"]]
+        self.is_truncated = result_dict.get("truncated", False)
+        self.next_part_number_marker = \
+            (parts[-1].part_number if parts else part_number_marker)
+        return parts
+
+    @with_deadline
+    async def upload_part_from_file(
+        self, fp, part_num, replace=True, cb=None, num_cb=10
+    ):
+        """
+        Upload a part of this MultiPart Upload.
+        """
+        key = self._bucket.get_key(self.key_name)
+        await key.set_contents_from_file(
+            fp,
+            replace=replace,
+            cb=cb,
+            cb_count=num_cb,
+            multipart_id=self._conjoined_identifier,
+            part_num=part_num
+        )
+
+    @with_deadline
+    async def upload_part_from_string(self, data, part_num):
+        """
+        Upload a part of this MultiPart Upload from data in memory.
+        """
+        key = self._bucket.get_key(self.key_name)
+        await key.set_contents_from_string(
+            data,
+            multipart_id=self._conjoined_identifier,
+            part_num=part_num
+        )
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+s3_emulator.py
+
+asyncio counterpart of motoboto.s3_emulator.S3Emulator
+"""
+from datetime import datetime
+from http.client import CREATED
+import json
+import logging
+import sys
+
+from lumberyard.http_connection import LumberyardHTTPError
+from lumberyard.http_util import compute_default_hostname, \
+        compute_default_collection_name, \
+        compute_reserved_collection_name, \
+        compute_uri
+
+from motoboto.aio.bucket import AsyncBucket
+from motoboto.aio.deadline import with_deadline
+from motoboto.aio.http_connection import AsyncConnectionPool
+from motoboto.connection_pool import _default_max_connections_per_host, \
+        _default_idle_timeout
+from motoboto.s3_emulator import _load_identity
+
+class AsyncS3Emulator(object):
+    """
+    An S3Emulator whose network operations are coroutines.
+
+    All the buckets, keys and multipart uploads it creates share one pool of
+    asyncio keep-alive connections, so many concurrent requests can run on
+    one event loop without a thread per request.
+
+    Create and use it from within a running event loop.
+
+    The coroutines that make requests take total_timeout, connect_timeout
+    and first_byte_timeout as S3Emulator's methods do, and a 
+    motoboto.deadline.deadline_scope bounds the requests of the task 
+    within it.
+    """
+    def __init__(self, 
+                 identity=None, 
+                 max_connections_per_host=_default_max_connections_per_host,
+                 idle_timeout=_default_idle_timeout,
+                 retry_policy=None,
+                 hedge_policy=None,
+                 circuit_breaker_policy=None):
+        self._log = logging.getLogger("AsyncS3Emulator")
+        self._identity = _load_identity(identity)
+
+        self._connection_pool = AsyncConnectionPool(
+            self._identity,
+            max_connections_per_host=max_connections_per_host,
+            idle_timeout=idle_timeout,
+            retry_policy=retry_policy,
+            hedge_policy=hedge_policy,
+            circuit_breaker_policy=circuit_breaker_policy
+        )
+
+        self._default_bucket = AsyncBucket(
+            self._identity, 
+            compute_default_collection_name(self._identity.user_name),
+            connection_pool=self._connection_pool
+        )
+
+    @property
+    def default_bucket(self):
+        return self._default_bucket
+
+    @property
+    def retry_policy(self):
+        return self._connection_pool.retry_policy
+
+    @property
+    def hedge_policy(self):
+        return self._connection_pool.hedge_policy
+
+    @property
+    def circuit_breaker_policy(self):
+        return self._connection_pool.circuit_breaker_policy
+
+    @property
+    def circuit_breaker_states(self):
+        """
+        a dict of the state of the circuit breaker ("closed", "open" or 
+        "half-open") for each host we have sent requests to
+        """
+        circuit_breaker_policy = self._connection_pool.circuit_breaker_policy
+        if circuit_breaker_policy is None:
+            return dict()
+        return circuit_breaker_policy.states()
+
+    def close(self):
+        """
+        close idle connections to nimbus.io
+        """
+        self._log.debug("closing")
+        self._connection_pool.close()
+
+    def get_bucket(self, bucket_name):
+        """
+        get an AsyncBucket for an existing nimbus.io collection
+        """
+        return AsyncBucket(self._identity, 
+                           bucket_name, 
+                           connection_pool=self._connection_pool)
+
+    def _compute_collections_uri(self, *args, **kwargs):
+        return compute_uri(
+            "/".join(
+                ["customers", self._identity.user_name, "collections"] + 
+                list(args)
+            ), 
+            **kwargs
+        )
+
+    async def _request(self, method, uri, **kwargs):
+        http_connection = self._connection_pool.create_http_connection(
+            compute_default_hostname()
+        )
+
+        self._log.info("requesting {0} {1}".format(method, uri))
+        try:
+            try:
+                response = await http_connection.request(method, 
+                                                         uri, 
+                                                         **kwargs)
+            except LumberyardHTTPError:
+                instance = sys.exc_info()[1]
+                self._log.error(str(instance))
+                raise
+            return await response.read()
+        finally:
+            http_connection.close()
+
+    @with_deadline
+    async def create_bucket(self, bucket_name, access_control=None):
+        """
+        create a nimbus.io collection, see S3Emulator.create_bucket
+        """
+        uri = self._compute_collections_uri(action="create", name=bucket_name)
+
+        body = None
+        headers = dict()
+        if access_control is not None:
+            body = access_control
+            headers["Content-Type"] = "application/json"
+            headers["Content-Length"] = len(body)
+
+        await self._request("POST", 
+                            uri, 
+                            body=body, 
+                            headers=headers, 
+                            expected_status=CREATED)
+
+        return self.get_bucket(bucket_name)
+
+    @with_deadline
+    async def create_unique_bucket(self, access_control=None):
+        """
+        create a nimbus.io collection with a unique name, 
+        see S3Emulator.create_unique_bucket
+        """
+        current_time = datetime.utcnow()
+        time_string = current_time.strftime("%Y%m%d%H%M%S%f")
+        bucket_name = compute_reserved_collection_name(self._identity.user_name,
+                                                       time_string)
+
+        return await self.create_bucket(bucket_name, access_control)
+ 
+    @with_deadline
+    async def get_all_buckets(self):
+        """
+        List all collections for the user
+
+        returns a list of motoboto.aio.AsyncBucket objects
+        """
+        data = await self._request("GET", self._compute_collections_uri())
+        collection_list = json.loads(data.decode("utf-8"))
+
+        bucket_list = list()
+        for collection_dict in collection_list:
+            bucket = AsyncBucket(
+                self._identity, 
+                collection_dict["name"], 
+                versioning=collection_dict["versioning"],
+                connection_pool=self._connection_pool
+            )
+            bucket_list.append(bucket)
+        return bucket_list
+
+    @with_deadline
+    async def delete_bucket(self, bucket_name):
+        """
+        remove (an empty) bucket from nimbus.io
+        """
+        if bucket_name.startswith("/"):
+            bucket_name = bucket_name[1:]
+        uri = self._compute_collections_uri(bucket_name)
+
+        await self._request("DELETE", uri)
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+circuit_breaker.py
+
+class CircuitOpenError
+class CircuitBreaker
+class CircuitBreakerPolicy
+
+stop sending requests to a collection's host while it is failing
+"""
+from collections import deque
+import threading
+import time
+
+from lumberyard.http_connection import LumberyardHTTPError
+
+from motoboto.deadline import DeadlineExceeded
+from motoboto.retry import connection_errors
+
+_default_failure_rate = 0.5
+_default_min_requests = 20
+_default_window = 30.0
+_default_open_time = 30.0
+
+closed = "closed"
+open_ = "open"
+half_open = "half-open"
+
+class CircuitOpenError(Exception):
+    """
+    a request was not sent, because the circuit breaker for its host is
+    open
+    """
+    def __init__(self, hostname, retry_time):
+        Exception.__init__(
+            self,
+            "circuit open for {0}, probing again in {1:.1f} seconds".format(
+                hostname, max(0.0, retry_time - time.time())
+            )
+        )
+        self.hostname = hostname
+        self.retry_time = retry_time
+
+def is_failure(error):
+    """
+    True for an error that says the host is sick: a dropped connection
+    or a server error. Other errors, such as 404, are the host working.
+    """
+    if isinstance(error, LumberyardHTTPError):
+        return error.status >= 500
+    if isinstance(error, DeadlineExceeded):
+        # our deadline ran out, the host may be fine
+        return False
+    return isinstance(error, connection_errors)
+
+class CircuitBreaker(object):
+    """
+    The circuit breaker for one host.
+
+    closed
+        requests are sent. If, within the last window seconds, there have
+        been at least min_requests and failure_rate of them failed, the
+        circuit opens.
+
+    open
+        requests fail at once with CircuitOpenError, for open_time seconds
+
+    half-open
+        one request at a time is sent as a probe. If it succeeds the
+        circuit closes; if it fails it opens again. A probe that has not
+        finished after open_time seconds is given up, and another is sent.
+
+    before_request returns a probe token for the probe, None for other
+    requests. Pass it to record_success or record_failure: while the 
+    circuit is not closed, only the result of the probe counts. The
+    results of requests that were sent before the circuit opened are
+    ignored.
+    """
+    def __init__(self,
+                 hostname,
+                 failure_rate=_default_failure_rate,
+                 min_requests=_default_min_requests,
+                 window=_default_window,
+                 open_time=_default_open_time):
+        self._lock = threading.Lock()
+        self.hostname = hostname
+        self._failure_rate = failure_rate
+        self._min_requests = min_requests
+        self._window = window
+        self._open_time = open_time
+        self._state = closed
+        # (time, failed) for each request finished in the window
+        self._results = deque()
+        self._failure_count = 0
+        self._open_until = None
+        self._probe = None
+        self._probe_until = None
+        self._probe_count = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == open_ and time.time() >= self._open_until:
+                return half_open
+            return self._state
+
+    def before_request(self):
+        """
+        raise CircuitOpenError if the request must not be sent.
+
+        return a probe token if the request is the half-open probe, 
+        otherwise None
+        """
+        with self._lock:
+            if self._state == closed:
+                return None
+            now = time.time()
+            if self._state == open_:
+                if now < self._open_until:
+                    raise CircuitOpenError(self.hostname, self._open_until)
+                self._state = half_open
+            if self._probe is not None and now < self._probe_until:
+                raise CircuitOpenError(self.hostname, self._probe_until)
+            self._probe_count += 1
+            self._probe = self._probe_count
+            self._probe_until = now + self._open_time
+            return self._probe
+
+    def record_success(self, probe=None):
+        with self._lock:
+            if self._state != closed:
+                if probe is not None and probe == self._probe:
+                    self._close()
+                return
+            self._add_result(False)
+
+    def record_failure(self, probe=None):
+        with self._lock:
+            if self._state != closed:
+                if probe is not None and probe == self._probe:
+                    self._open()
+                return
+            self._add_result(True)
+            if len(self._results) >= self._min_requests and \
+               self._failure_count >= \
+                    self._failure_rate * len(self._results):
+                self._open()
+
+    def _add_result(self, failed):
+        """
+        call with the lock held
+        """
+        now = time.time()
+        self._results.append((now, failed, ))
+        if failed:
+            self._failure_count += 1
+        cutoff = now - self._window
+        while self._results and self._results[0][0] < cutoff:
+            _, old_failed = self._results.popleft()
+            if old_failed:
+                self._failure_count -= 1
+
+    def _open(self):
+        self._state = open_
+        self._open_until = time.time() + self._open_time
+        self._probe = None
+
+    def _close(self):
+        self._state = closed
+        self._results.clear()
+        self._failure_count = 0
+        self._open_until = None
+        self._probe = None
+
+class CircuitBreakerPolicy(object):
+    """
+    A CircuitBreaker for each host requests are sent to, which is the
+    collection's hostname for Bucket, Key and MultiPartUpload requests,
+    all made with the same settings.
+    """
+    def __init__(self,
+                 failure_rate=_default_failure_rate,
+                 min_requests=_default_min_requests,
+                 window=_default_window,
+                 open_time=_default_open_time):
+        self._lock = threading.Lock()
+        self._failure_rate = failure_rate
+        self._min_requests = min_requests
+        self._window = window
+        self._open_time = open_time
+        self._breakers = dict()
+
+    def breaker(self, hostname):
+        """
+        return the CircuitBreaker for hostname
+        """
+        with self._lock:
+            breaker = self._breakers.get(hostname)
+            if breaker is None:
+                breaker = CircuitBreaker(hostname,
+                                         self._failure_rate,
+                                         self._min_requests,
+                                         self._window,
+                                         self._open_time)
+                self._breakers[hostname] = breaker
+            return breaker
+
+    def states(self):
+        """
+        return a dict of the state of the breaker for each host
+        """
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return dict([(breaker.hostname, breaker.state, )
+                     for breaker in breakers])
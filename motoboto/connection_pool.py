@@ -0,0 +1,693 @@
+# -*- coding: utf-8 -*-
+"""
+connection_pool.py
+
+A pool of keep-alive HTTP connections to nimbus.io, one set per hostname.
+
+The pool is owned by an S3Emulator and shared by every Bucket, Key and
+MultiPartUpload it creates, so a sequence of requests to the same collection
+reuses one TCP (and TLS) connection instead of handshaking for each request.
+"""
+try:
+    import httplib
+    from httplib import OK
+except ImportError:
+    import http.client as httplib
+    from http.client import OK
+import logging
+import select
+import socket
+import sys
+import threading
+import time
+
+from lumberyard.http_connection import HTTPConnection
+
+from motoboto.circuit_breaker import is_failure
+from motoboto.deadline import DeadlineExceeded, current_deadline, \
+        propagate_deadline
+from motoboto.file_body import FileBody
+from motoboto.hedge import hedged_methods
+from motoboto.retry import RetryPolicy, compute_body_position, rewind_body
+
+_default_max_connections_per_host = 8
+_default_idle_timeout = 30.0
+
+# the largest error response body we will read just to keep the socket open
+_max_discard_size = 64 * 1024
+
+# exceptions that mean an idle keep-alive socket was closed by the server
+# before we sent the request on it
+_stale_connection_errors = (httplib.HTTPException, socket.error, )
+
+def _is_replayable(body):
+    return body is None or isinstance(body, (bytes, str, ))
+
+class _PoolHTTPConnection(HTTPConnection):
+    """
+    a lumberyard HTTPConnection that remembers its most recent response,
+    so the pool can tell whether the socket is still usable.
+
+    The socket timeout is set for each step of a request from deadline,
+    the Deadline of the request, if any.
+
+    before_response, if not None, is called once with the socket after the
+    request is sent, before waiting for the response.
+    """
+    last_response = None
+    deadline = None
+    before_response = None
+
+    def __init__(self, *args, **kwargs):
+        HTTPConnection.__init__(self, *args, **kwargs)
+        self._default_timeout = self.timeout
+        if not isinstance(self._default_timeout, (int, float, )):
+            self._default_timeout = socket.getdefaulttimeout()
+
+    def _compute_timeout(self, step_timeout):
+        timeout = None
+        if self.deadline is not None:
+            timeout = self.deadline.compute_timeout(step_timeout)
+        if timeout is None:
+            timeout = self._default_timeout
+        return timeout
+
+    def _set_timeout(self, step_timeout=None):
+        if self.sock is None:
+            return
+        timeout = self._compute_timeout(step_timeout)
+        if self.sock.gettimeout() != timeout:
+            self.sock.settimeout(timeout)
+
+    def connect(self):
+        connect_timeout = None
+        if self.deadline is not None:
+            connect_timeout = self.deadline.connect_timeout
+        self.timeout = self._compute_timeout(connect_timeout)
+        HTTPConnection.connect(self)
+        self._set_timeout()
+
+    def getresponse(self, *args, **kwargs):
+        first_byte_timeout = None
+        if self.deadline is not None:
+            first_byte_timeout = self.deadline.first_byte_timeout
+        if self.before_response is not None:
+            before_response, self.before_response = self.before_response, None
+            before_response(self.sock)
+        self._set_timeout(first_byte_timeout)
+        response = HTTPConnection.getresponse(self, *args, **kwargs)
+        self.last_response = response
+        # for reading the body
+        self._set_timeout()
+        return response
+
+    def endheaders(self, message_body=None, **kwargs):
+        """
+        send a FileBody straight from its file to the socket, after the
+        headers. The request must give its Content-Length.
+        """
+        self._set_timeout()
+        if not isinstance(message_body, FileBody):
+            return HTTPConnection.endheaders(self, message_body, **kwargs)
+        HTTPConnection.endheaders(self, **kwargs)
+        message_body.send(self.sock)
+
+    def is_reusable(self):
+        """
+        True if the last response has been completely read and the server
+        has not asked us to close the connection
+        """
+        response = self.last_response
+        if response is None:
+            return False
+        return response.isclosed() and not response.will_close
+
+    def discard_response(self):
+        """
+        read and drop a small unread response body (from an error response)
+        so the connection can be reused
+        """
+        response = self.last_response
+        if response is None or response.isclosed():
+            return
+        if response.length is None or response.length > _max_discard_size:
+            return
+        try:
+            response.read()
+        except _stale_connection_errors:
+            self.last_response = None
+
+class PooledHTTPConnection(object):
+    """
+    A connection checked out of a ConnectionPool.
+
+    This has the same request() and close() interface as a lumberyard
+    HTTPConnection. close() returns the underlying connection to the pool
+    if its response has been completely read; otherwise the socket is closed.
+
+    A dedicated connection does not count against the pool's
+    max_connections_per_host, see ConnectionPool.create_http_connection.
+    """
+    def __init__(self, pool, hostname, dedicated=False):
+        self._log = logging.getLogger("PooledHTTPConnection")
+        self._pool = pool
+        self._hostname = hostname
+        self._dedicated = dedicated
+        self._connection = None
+        self._reused = False
+        self._retry_after = None
+        self._aborted = False
+        self._before_response = None
+
+    @property
+    def hostname(self):
+        return self._hostname
+
+    def request(self, method, uri, body=None, headers=None,
+                expected_status=OK):
+        """
+        send a request through a pooled connection, see lumberyard
+        HTTPConnection.request
+
+        A request that fails is sent again as the pool's RetryPolicy allows.
+
+        The request is bound by the Deadline of the deadline scope we are 
+        in, if any.
+        """
+        retry_policy = self._pool.retry_policy
+        retry_policy.request_sent()
+        deadline = current_deadline()
+        body_position = compute_body_position(body)
+        attempt = 0
+        while True:
+            self._retry_after = None
+            if deadline is not None:
+                deadline.check()
+            try:
+                return self._request_once(method, 
+                                          uri, 
+                                          body, 
+                                          headers, 
+                                          expected_status)
+            except Exception:
+                error = sys.exc_info()[1]
+                if deadline is not None and \
+                   isinstance(error, socket.timeout) and \
+                   not isinstance(error, DeadlineExceeded) and \
+                   deadline.remaining() is not None and \
+                   deadline.remaining() <= 0.0:
+                    raise DeadlineExceeded("deadline exceeded during "
+                                           "{0} {1}: {2}".format(method, 
+                                                                 uri, 
+                                                                 error))
+                delay = retry_policy.compute_retry_delay(method, 
+                                                         uri, 
+                                                         error, 
+                                                         attempt,
+                                                         self._retry_after)
+                if delay is None or not rewind_body(body, body_position):
+                    raise
+                if deadline is not None and \
+                   deadline.remaining() is not None and \
+                   deadline.remaining() <= delay:
+                    # no time to wait for a retry
+                    raise
+            attempt += 1
+            self._log.warning("{0} {1} failed, retry {2} in {3:.3f} "
+                              "seconds: {4}".format(method, 
+                                                    uri, 
+                                                    attempt, 
+                                                    delay, 
+                                                    error))
+            time.sleep(delay)
+
+    def _request_once(self, method, uri, body, headers, expected_status):
+        breaker = None
+        probe = None
+        circuit_breaker_policy = self._pool.circuit_breaker_policy
+        if circuit_breaker_policy is not None:
+            breaker = circuit_breaker_policy.breaker(self._hostname)
+            probe = breaker.before_request()
+        try:
+            response = self._send_or_hedge(method, 
+                                           uri, 
+                                           body, 
+                                           headers, 
+                                           expected_status)
+        except Exception:
+            if breaker is not None:
+                if is_failure(sys.exc_info()[1]):
+                    breaker.record_failure(probe)
+                else:
+                    breaker.record_success(probe)
+            raise
+        if breaker is not None:
+            breaker.record_success(probe)
+        return response
+
+    def _send_or_hedge(self, method, uri, body, headers, expected_status):
+        hedge_policy = self._pool.hedge_policy
+        if hedge_policy is not None and method in hedged_methods:
+            return self._hedged_request(hedge_policy, 
+                                        method, 
+                                        uri, 
+                                        headers, 
+                                        expected_status)
+        return self._send(method, uri, body, headers, expected_status)
+
+    def _hedged_request(self, hedge_policy, method, uri, headers, 
+                        expected_status):
+        """
+        send the request on this thread, and if it has no response within
+        the hedge delay, a copy on another connection (see _Hedge). Take 
+        over the connection of the first to succeed, and abort the other.
+        """
+        hedge_policy.request_sent()
+        delay = hedge_policy.compute_hedge_delay()
+        start_time = time.time()
+        if delay is None:
+            response = self._send(method, uri, None, headers, expected_status)
+            hedge_policy.record_latency(time.time() - start_time)
+            return response
+
+        hedge = _Hedge(self, hedge_policy)
+        def _wait_for_response(sock):
+            wait_time = delay - (time.time() - start_time)
+            if wait_time > 0.0 and \
+               len(select.select([sock], [], [], wait_time)[0]) > 0:
+                return
+            if hedge.start(method, uri, headers, expected_status):
+                self._log.debug("hedging {0} {1} after {2:.3f} "
+                                "seconds".format(method, uri, delay))
+
+        self._before_response = _wait_for_response
+        try:
+            response = self._send(method, uri, None, headers, expected_status)
+        except Exception:
+            response = None
+            error = sys.exc_info()[1]
+        else:
+            error = None
+            hedge_policy.record_latency(time.time() - start_time)
+        finally:
+            self._before_response = None
+
+        if not hedge.decide(error is None):
+            if error is not None:
+                raise error
+            return response
+
+        hedge_policy.hedge_won()
+        self.close()
+        self._aborted = False
+        self._connection, self._reused = \
+                hedge.attempt._connection, hedge.attempt._reused
+        hedge.attempt._connection = None
+        return hedge.response
+
+    def _abort(self):
+        """
+        from another thread: make a request in flight fail at once
+        """
+        self._aborted = True
+        connection = self._connection
+        sock = getattr(connection, "sock", None)
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+
+    def _send(self, method, uri, body, headers, expected_status):
+        if self._connection is None:
+            self._connection, self._reused = \
+                    self._pool._checkout(self._hostname,
+                                         dedicated=self._dedicated)
+
+        self._connection.deadline = current_deadline()
+        self._connection.before_response = self._before_response
+        try:
+            return self._connection.request(method,
+                                            uri,
+                                            body=body,
+                                            headers=headers,
+                                            expected_status=expected_status)
+        except _stale_connection_errors:
+            instance = sys.exc_info()[1]
+            self._release(reusable=False)
+            if isinstance(instance, socket.timeout) or self._aborted or \
+               not (self._reused and _is_replayable(body)):
+                raise
+            self._log.debug("stale connection to {0}: {1}".format(
+                self._hostname, instance
+            ))
+        except Exception:
+            self._discard()
+            raise
+
+        # the server closed an idle connection under us: try once more
+        # on a fresh socket
+        self._connection, self._reused = \
+                self._pool._checkout(self._hostname,
+                                     reuse_idle=False,
+                                     dedicated=self._dedicated)
+        self._connection.deadline = current_deadline()
+        self._connection.before_response = self._before_response
+        try:
+            return self._connection.request(method,
+                                            uri,
+                                            body=body,
+                                            headers=headers,
+                                            expected_status=expected_status)
+        except Exception:
+            self._discard()
+            raise
+
+    def check_deadline(self):
+        """
+        call before each read of the response: raise DeadlineExceeded if
+        the deadline of the request has passed, otherwise bound the read
+        by the time left
+        """
+        connection = self._connection
+        if connection is None or connection.deadline is None:
+            return
+        connection.deadline.check()
+        connection._set_timeout()
+
+    def close(self):
+        """
+        return the connection to the pool
+        """
+        if self._connection is not None:
+            self._release(self._connection.is_reusable())
+
+    def _discard(self):
+        """
+        release the connection after a request failed: it can be reused if
+        the failure was an HTTP error status with a small body
+        """
+        if self._connection is not None:
+            response = self._connection.last_response
+            if response is not None:
+                self._retry_after = response.getheader("Retry-After")
+            self._connection.discard_response()
+            self._release(self._connection.is_reusable())
+
+    def _release(self, reusable):
+        connection = self._connection
+        self._connection = None
+        if connection is not None:
+            self._pool._checkin(self._hostname,
+                                connection,
+                                reusable,
+                                dedicated=self._dedicated)
+
+    def __del__(self):
+        # a caller that fails part way through reading a response may never
+        # call close(); don't let that leak a slot in the pool
+        if getattr(self, "_connection", None) is not None:
+            self._release(reusable=False)
+
+class _Hedge(object):
+    """
+    A copy of a slow request, sent on another pooled connection, by a
+    thread of its own. No copy is sent if the pool has no connection free,
+    rather than wait for one.
+
+    attempt
+        the PooledHTTPConnection of the copy, once it has been started
+
+    won
+        True if the copy succeeded before the original request
+    """
+    def __init__(self, original, hedge_policy):
+        self._log = logging.getLogger("Hedge")
+        self._original = original
+        self._hedge_policy = hedge_policy
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+        self._decided = False
+        self.attempt = None
+        self.won = False
+        self.response = None
+
+    def start(self, method, uri, headers, expected_status):
+        """
+        send the copy, return True if it was sent
+        """
+        pool = self._original._pool
+        hostname = self._original.hostname
+        checked_out = pool._checkout(hostname, wait=False)
+        if checked_out is None:
+            self._log.debug("no connection free to {0}".format(hostname))
+            return False
+        connection, reused = checked_out
+        if not self._hedge_policy.start_hedge():
+            pool._checkin(hostname, connection, connection.is_reusable())
+            return False
+
+        self.attempt = PooledHTTPConnection(pool, hostname)
+        self.attempt._connection, self.attempt._reused = connection, reused
+        thread = threading.Thread(target=propagate_deadline(self._run), 
+                                  args=(method, uri, headers, expected_status),
+                                  name="hedged-request")
+        thread.daemon = True
+        thread.start()
+        return True
+
+    def _run(self, method, uri, headers, expected_status):
+        start_time = time.time()
+        try:
+            response = self.attempt._send(method, 
+                                          uri, 
+                                          None, 
+                                          headers, 
+                                          expected_status)
+        except Exception:
+            response = None
+        else:
+            self._hedge_policy.record_latency(time.time() - start_time)
+
+        with self._lock:
+            decided = self._decided
+            if not decided and response is not None:
+                self._decided = self.won = True
+                self.response = response
+                self._original._abort()
+        if decided:
+            # we lost: the connection, with its unread response, is no use
+            self.attempt.close()
+        self._finished.set()
+
+    def decide(self, original_succeeded):
+        """
+        called when the original request has finished: return True if the
+        copy won, and its response is to be used instead
+        """
+        with self._lock:
+            if self.attempt is None or self._decided:
+                return self.won
+            if original_succeeded:
+                self._decided = True
+                self.attempt._abort()
+                return False
+        # the original failed, so wait to see if the copy does better
+        self._finished.wait()
+        return self.won
+
+class ConnectionPool(object):
+    """
+    Keep-alive HTTP connections to nimbus.io, organized by hostname
+
+    max_connections_per_host
+        the most connections (in use plus idle) we will open to one host.
+        A request for a connection beyond this waits for one to be returned.
+
+    idle_timeout
+        seconds an idle connection is kept before it is closed
+
+    retry_policy
+        the motoboto.retry.RetryPolicy for requests through the pool,
+        None for a default RetryPolicy of our own
+
+    hedge_policy
+        if not None, a motoboto.hedge.HedgePolicy for hedging slow GET and
+        HEAD requests through the pool
+
+    circuit_breaker_policy
+        if not None, a motoboto.circuit_breaker.CircuitBreakerPolicy, which
+        stops requests to a host while it is failing
+    """
+    def __init__(self,
+                 identity,
+                 max_connections_per_host=_default_max_connections_per_host,
+                 idle_timeout=_default_idle_timeout,
+                 retry_policy=None,
+                 hedge_policy=None,
+                 circuit_breaker_policy=None):
+        self._log = logging.getLogger("ConnectionPool")
+        self._identity = identity
+        self._max_connections_per_host = max_connections_per_host
+        self._idle_timeout = idle_timeout
+        self._retry_policy = (RetryPolicy() if retry_policy is None
+                              else retry_policy)
+        self._hedge_policy = hedge_policy
+        self._circuit_breaker_policy = circuit_breaker_policy
+        self._condition = threading.Condition()
+        self._idle = dict()
+        self._in_use = dict()
+        self._closed = False
+
+    @property
+    def max_connections_per_host(self):
+        return self._max_connections_per_host
+
+    @property
+    def idle_timeout(self):
+        return self._idle_timeout
+
+    @property
+    def retry_policy(self):
+        return self._retry_policy
+
+    @property
+    def hedge_policy(self):
+        return self._hedge_policy
+
+    @property
+    def circuit_breaker_policy(self):
+        return self._circuit_breaker_policy
+
+    def create_http_connection(self, hostname, dedicated=False):
+        """
+        return a PooledHTTPConnection to hostname.
+
+        No connection is taken from the pool until the first request is made.
+
+        dedicated
+            if True, the connection does not count against
+            max_connections_per_host and never waits for one: for a response
+            read at the pace of a caller who may make other requests through
+            the pool before finishing it. An idle connection is reused if 
+            there is one.
+        """
+        return PooledHTTPConnection(self, hostname, dedicated=dedicated)
+
+    def idle_count(self, hostname=None):
+        """
+        the number of idle connections in the pool, for one host or all
+        """
+        with self._condition:
+            if hostname is not None:
+                return len(self._idle.get(hostname, []))
+            return sum(len(idle_list) for idle_list in self._idle.values())
+
+    def close(self):
+        """
+        close all idle connections.
+
+        Connections currently in use are closed when they are returned.
+        The pool remains usable, but no longer keeps idle connections.
+        """
+        with self._condition:
+            self._closed = True
+            idle_lists = list(self._idle.values())
+            self._idle.clear()
+
+        for idle_list in idle_lists:
+            for connection, _ in idle_list:
+                connection.close()
+
+    def _checkout(self, hostname, reuse_idle=True, wait=True,
+                  dedicated=False):
+        """
+        return (connection, reused), or None if wait is False and every 
+        connection we may open to hostname is in use
+        """
+        expired = list()
+        try:
+            with self._condition:
+                while True:
+                    expired.extend(self._remove_expired(hostname))
+                    idle_list = self._idle.get(hostname, [])
+                    if dedicated:
+                        # outside the limit: never counted as in use
+                        if reuse_idle and len(idle_list) > 0:
+                            connection, _ = idle_list.pop()
+                            reused = True
+                        else:
+                            connection = None
+                            reused = False
+                        break
+                    if reuse_idle and len(idle_list) > 0:
+                        connection, _ = idle_list.pop()
+                        self._in_use[hostname] = \
+                                self._in_use.get(hostname, 0) + 1
+                        reused = True
+                        break
+                    in_use = self._in_use.get(hostname, 0)
+                    if in_use + len(idle_list) < \
+                       self._max_connections_per_host:
+                        self._in_use[hostname] = in_use + 1
+                        connection = None
+                        reused = False
+                        break
+                    if len(idle_list) > 0:
+                        # we need a fresh connection, make room for it
+                        expired.append(idle_list.pop(0))
+                        continue
+                    if not wait:
+                        return None
+                    deadline = current_deadline()
+                    self._condition.wait(None if deadline is None
+                                         else deadline.compute_timeout())
+        finally:
+            # closed even when the deadline runs out while we wait
+            for expired_connection, _ in expired:
+                expired_connection.close()
+
+        if connection is None:
+            self._log.debug("new connection to {0}".format(hostname))
+            connection = _PoolHTTPConnection(
+                hostname,
+                self._identity.user_name,
+                self._identity.auth_key,
+                self._identity.auth_key_id
+            )
+
+        return connection, reused
+
+    def _checkin(self, hostname, connection, reusable, dedicated=False):
+        with self._condition:
+            if dedicated:
+                # keep it only if there is room for it within the limit
+                idle_list = self._idle.get(hostname, [])
+                reusable = reusable and \
+                        self._in_use.get(hostname, 0) + len(idle_list) < \
+                        self._max_connections_per_host
+            else:
+                self._in_use[hostname] -= 1
+            if reusable and not self._closed:
+                self._idle.setdefault(hostname, []).append(
+                    (connection, time.time(), )
+                )
+                connection = None
+            self._condition.notify()
+
+        if connection is not None:
+            connection.close()
+
+    def _remove_expired(self, hostname):
+        """
+        remove idle connections that have timed out.
+        call with the condition held, close the result without it.
+        """
+        idle_list = self._idle.get(hostname)
+        if not idle_list:
+            return []
+        cutoff = time.time() - self._idle_timeout
+        expired = [entry for entry in idle_list if entry[1] < cutoff]
+        if len(expired) > 0:
+            idle_list[:] = [entry for entry in idle_list if entry[1] >= cutoff]
+        return expired
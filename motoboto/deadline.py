@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+deadline.py
+
+class Deadline
+class DeadlineExceeded
+
+bound the time taken by the requests made within a deadline_scope, or by
+one call to a method that takes connect_timeout, first_byte_timeout and
+total_timeout
+"""
+from contextlib import contextmanager
+import functools
+import socket
+import sys
+import threading
+import time
+
+try:
+    import contextvars
+except ImportError:
+    contextvars = None
+
+class DeadlineExceeded(socket.timeout):
+    """
+    the total time allowed for an operation has run out
+    """
+    pass
+
+class Deadline(object):
+    """
+    The limits on the requests made within a deadline_scope
+
+    expires
+        the time.time() at which all requests must be finished, or None
+
+    connect_timeout
+        the most seconds to wait to connect to a host, or None
+
+    first_byte_timeout
+        the most seconds to wait, once a request is sent, for the response
+        to start, or None
+    """
+    def __init__(self, expires=None, connect_timeout=None,
+                 first_byte_timeout=None):
+        self.expires = expires
+        self.connect_timeout = connect_timeout
+        self.first_byte_timeout = first_byte_timeout
+
+    def remaining(self):
+        """
+        return the seconds left, or None if there is no total deadline
+        """
+        if self.expires is None:
+            return None
+        return self.expires - time.time()
+
+    def check(self):
+        """
+        raise DeadlineExceeded if the deadline has passed
+        """
+        if self.expires is not None and time.time() >= self.expires:
+            raise DeadlineExceeded("deadline exceeded")
+
+    def compute_timeout(self, timeout=None):
+        """
+        return the smaller of timeout and the seconds left, None if both
+        are None. raise DeadlineExceeded if the deadline has passed.
+        """
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        if remaining <= 0.0:
+            raise DeadlineExceeded("deadline exceeded")
+        if timeout is None:
+            return remaining
+        return min(timeout, remaining)
+
+if contextvars is not None:
+    _current_deadline = contextvars.ContextVar("motoboto_deadline",
+                                               default=None)
+
+    def current_deadline():
+        """
+        return the Deadline of the scope we are in, or None
+        """
+        return _current_deadline.get()
+
+    def _enter(deadline):
+        return _current_deadline.set(deadline)
+
+    def _exit(token):
+        _current_deadline.reset(token)
+else:
+    # no asyncio in python 2, so a deadline per thread will do
+    _local = threading.local()
+
+    def current_deadline():
+        """
+        return the Deadline of the scope we are in, or None
+        """
+        return getattr(_local, "deadline", None)
+
+    def _enter(deadline):
+        previous_deadline = current_deadline()
+        _local.deadline = deadline
+        return previous_deadline
+
+    def _exit(previous_deadline):
+        _local.deadline = previous_deadline
+
+def _min_timeout(first, second):
+    if first is None:
+        return second
+    if second is None:
+        return first
+    return min(first, second)
+
+@contextmanager
+def deadline_scope(total_timeout=None, connect_timeout=None,
+                   first_byte_timeout=None):
+    """
+    every request made within the scope, by this thread or task, or by
+    the threads motoboto starts for it, is bound by these limits:
+
+    total_timeout
+        seconds from now by which all the requests must be finished. A
+        request that runs over fails with DeadlineExceeded, and no retry
+        is started that could not finish in time.
+
+    connect_timeout
+        the most seconds to wait to connect to a host
+
+    first_byte_timeout
+        the most seconds to wait, once a request is sent, for the response
+        to start
+
+    A scope within another is also bound by the outer one's limits. A
+    socket timeout that ends the scope after the deadline has passed is
+    raised as DeadlineExceeded.
+    """
+    expires = None
+    if total_timeout is not None:
+        expires = time.time() + total_timeout
+    outer_deadline = current_deadline()
+    if outer_deadline is not None:
+        expires = _min_timeout(expires, outer_deadline.expires)
+        connect_timeout = _min_timeout(connect_timeout,
+                                       outer_deadline.connect_timeout)
+        first_byte_timeout = _min_timeout(first_byte_timeout,
+                                          outer_deadline.first_byte_timeout)
+    deadline = Deadline(expires, connect_timeout, first_byte_timeout)
+    token = _enter(deadline)
+    try:
+        yield deadline
+    except socket.timeout:
+        error = sys.exc_info()[1]
+        remaining = deadline.remaining()
+        if isinstance(error, DeadlineExceeded) or remaining is None or \
+           remaining > 0.0:
+            raise
+        raise DeadlineExceeded("deadline exceeded: {0}".format(error))
+    finally:
+        _exit(token)
+
+def check_deadline():
+    """
+    raise DeadlineExceeded if the deadline of the scope we are in has passed
+    """
+    deadline = current_deadline()
+    if deadline is not None:
+        deadline.check()
+
+def compute_read_size(size, chunk_size):
+    """
+    return how many of size bytes (None for all there are) to read from a
+    response at once: all of them, or, in a scope with a total deadline,
+    no more than chunk_size, so the deadline is checked between reads
+    """
+    deadline = current_deadline()
+    if deadline is None or deadline.expires is None:
+        return size
+    if size is None:
+        return chunk_size
+    return min(size, chunk_size)
+
+def propagate_deadline(target):
+    """
+    return target, wrapped to run in the deadline scope we are in now, to
+    be the target of a new thread
+    """
+    deadline = current_deadline()
+    if deadline is None:
+        return target
+    @functools.wraps(target)
+    def _run_in_scope(*args, **kwargs):
+        token = _enter(deadline)
+        try:
+            return target(*args, **kwargs)
+        finally:
+            _exit(token)
+    return _run_in_scope
+
+def _pop_timeouts(kwargs):
+    return (kwargs.pop("total_timeout", None),
+            kwargs.pop("connect_timeout", None),
+            kwargs.pop("first_byte_timeout", None), )
+
+def with_deadline(method):
+    """
+    decorate a method to take total_timeout, connect_timeout and
+    first_byte_timeout keyword arguments, and run in a deadline_scope of
+    them if any is given
+    """
+    @functools.wraps(method)
+    def _method_with_deadline(*args, **kwargs):
+        timeouts = _pop_timeouts(kwargs)
+        if timeouts == (None, None, None, ):
+            return method(*args, **kwargs)
+        with deadline_scope(*timeouts):
+            return method(*args, **kwargs)
+    return _method_with_deadline
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+file_body.py
+
+class FileBody
+
+a request body sent straight from a regular file to the socket, without
+reading it into Python
+"""
+import io
+import mmap
+import os
+import socket
+import stat
+
+try:
+    import ssl
+except ImportError:
+    ssl = None
+
+# the most we send in one call, so progress is reported as we go
+_send_size = 1024 * 1024
+
+def _is_tls(sock):
+    return ssl is not None and isinstance(sock, ssl.SSLSocket)
+
+class FileBody(object):
+    """
+    size bytes of a regular file, from offset, to be sent as a request body.
+
+    Over a plain socket the bytes go with sendfile(), from the page cache
+    to the socket in the kernel. Over TLS, which the kernel cannot encrypt
+    for us, they are sent from an mmap of the file.
+
+    The bytes are sent from offset whatever the position of the file, so
+    several FileBody objects can send parts of one file at once.
+    """
+    def __init__(self, file_object, offset, size):
+        self._file_object = file_object
+        self.offset = offset
+        self.size = size
+        self._callback = None
+
+    def set_callback(self, callback):
+        """
+        callback(bytes_sent) is called as each block is sent, like a
+        lumberyard ReadReporter
+        """
+        self._callback = callback
+
+    def _report(self, bytes_sent):
+        if self._callback is not None:
+            self._callback(bytes_sent)
+
+    def send(self, sock):
+        """
+        send the bytes on a connected socket
+        """
+        if self.size == 0:
+            return
+        if hasattr(os, "sendfile") and not _is_tls(sock):
+            self._send_with_sendfile(sock)
+        else:
+            self._send_from_mmap(sock)
+
+    def _send_with_sendfile(self, sock):
+        offset = self.offset
+        end = self.offset + self.size
+        while offset < end:
+            bytes_sent = sock.sendfile(self._file_object,
+                                       offset,
+                                       min(_send_size, end - offset))
+            if bytes_sent == 0:
+                raise IOError("file ended {0} bytes early".format(
+                    end - offset
+                ))
+            offset += bytes_sent
+            self._report(bytes_sent)
+
+    def _send_from_mmap(self, sock):
+        # an mmap must start on a multiple of the allocation granularity
+        map_offset = self.offset - self.offset % mmap.ALLOCATIONGRANULARITY
+        start = self.offset - map_offset
+        end = start + self.size
+        try:
+            mapped = mmap.mmap(self._file_object.fileno(),
+                               end,
+                               access=mmap.ACCESS_READ,
+                               offset=map_offset)
+        except ValueError:
+            raise IOError("file is shorter than {0} bytes".format(
+                self.offset + self.size
+            ))
+        try:
+            with memoryview(mapped) as view:
+                while start < end:
+                    send_size = min(_send_size, end - start)
+                    with view[start:start+send_size] as block:
+                        sock.sendall(block)
+                    start += send_size
+                    self._report(send_size)
+        finally:
+            mapped.close()
+
+def compute_file_body(file_object, size=None):
+    """
+    return a FileBody for size bytes (None for the rest of the file) from
+    the current position of file_object, or None if it is not a regular
+    file open for reading in binary mode, or we can't send files directly
+    """
+    if not hasattr(socket.socket, "sendfile"):
+        # python 2: no socket.sendfile, and mmap has no memoryview
+        return None
+    if isinstance(file_object, io.TextIOBase):
+        return None
+    try:
+        if not file_object.readable():
+            return None
+        file_stat = os.fstat(file_object.fileno())
+        offset = file_object.tell()
+    except (AttributeError, IOError, OSError, ValueError, ):
+        return None
+    if not stat.S_ISREG(file_stat.st_mode):
+        return None
+    if size is None:
+        size = max(0, file_stat.st_size - offset)
+    return FileBody(file_object, offset, size)
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+hedge.py
+
+class HedgePolicy
+
+decide when a slow GET or HEAD gets a second copy sent on another
+connection
+"""
+from collections import deque
+import threading
+
+from motoboto.retry import RetryBudget
+
+_default_percentile = 95.0
+_default_max_hedge_ratio = 0.05
+_default_min_samples = 20
+_default_window_size = 1000
+
+# we sort the window again after this many new latencies
+_delay_update_interval = 50
+
+# the only requests we hedge: sending them twice does no harm
+hedged_methods = frozenset(["GET", "HEAD", ])
+
+class HedgePolicy(object):
+    """
+    Hedge GET and HEAD requests that are slow to answer.
+
+    If a request has not had its response status and headers within the
+    percentile latency of recent requests, a duplicate is sent on another
+    pooled connection, if one is free. The first to succeed is returned,
+    and the other is cancelled by shutting down its socket.
+
+    No request is hedged until min_samples latencies have been recorded,
+    from the last window_size requests.
+
+    Hedges are capped at max_hedge_ratio of the requests sent, by a
+    RetryBudget that starts with one hedge to spend.
+    """
+    def __init__(self,
+                 percentile=_default_percentile,
+                 max_hedge_ratio=_default_max_hedge_ratio,
+                 min_samples=_default_min_samples,
+                 window_size=_default_window_size):
+        self._lock = threading.Lock()
+        self._percentile = percentile
+        self._min_samples = min_samples
+        self._latencies = deque(maxlen=window_size)
+        self._new_latency_count = 0
+        self._delay = None
+        self.budget = RetryBudget(ratio=max_hedge_ratio, reserve=1.0)
+        self.hedges_sent = 0
+        self.hedges_won = 0
+
+    def request_sent(self):
+        """
+        called once for each request that may be hedged
+        """
+        self.budget.deposit()
+
+    def record_latency(self, seconds):
+        """
+        record the time a request took to get its response headers
+        """
+        with self._lock:
+            self._latencies.append(seconds)
+            self._new_latency_count += 1
+            if self._delay is None or \
+               self._new_latency_count >= _delay_update_interval:
+                self._update_delay()
+
+    def _update_delay(self):
+        """
+        call with the lock held
+        """
+        self._new_latency_count = 0
+        if len(self._latencies) < self._min_samples:
+            self._delay = None
+            return
+        latencies = sorted(self._latencies)
+        index = int(len(latencies) * self._percentile / 100.0)
+        self._delay = latencies[min(index, len(latencies) - 1)]
+
+    def compute_hedge_delay(self):
+        """
+        return the seconds to wait before hedging, or None if we don't yet
+        know enough to hedge
+        """
+        with self._lock:
+            return self._delay
+
+    def start_hedge(self):
+        """
+        return True, and count the hedge, if the budget allows one
+        """
+        if not self.budget.withdraw():
+            return False
+        with self._lock:
+            self.hedges_sent += 1
+        return True
+
+    def hedge_won(self):
+        with self._lock:
+            self.hedges_won += 1
@@ -25,11 +25,11 @@ def copy_file_to_nimbusio(
 def copy_stdin_to_nimbusio(
     motoboto_connection, dest_bucket_name, dest_key_name
 ):
-    # we can feed stdin directly to the key because we don't know the
-    # content length.
+    # we don't know the content length, so stream stdin in parts rather
+    # than reading all of it into memory
     dest_bucket = motoboto_connection.get_bucket(dest_bucket_name)
     dest_key = dest_bucket.get_key(dest_key_name)
-    dest_key.set_contents_from_string(sys.stdin.read())
+    dest_key.set_contents_from_stream(getattr(sys.stdin, "buffer", sys.stdin))
 
 def copy_nimbusio_to_file(
     motoboto_connection, source_bucket_name, source_key_name, dest_path
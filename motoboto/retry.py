@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+retry.py
+
+class RetryBudget
+class RetryPolicy
+
+decide whether a failed request is sent again, and how long to wait first
+"""
+try:
+    import httplib
+    from urlparse import urlparse, parse_qs
+except ImportError:
+    import http.client as httplib
+    from urllib.parse import urlparse, parse_qs
+from email.utils import parsedate_tz, mktime_tz
+import random
+import socket
+import threading
+import time
+
+from lumberyard.http_connection import LumberyardHTTPError
+
+from motoboto.deadline import DeadlineExceeded
+from motoboto.file_body import FileBody
+
+_default_num_retries = 3
+
+# the nth retry waits a random time up to _base_delay * 2 ** n seconds,
+# but no more than max_delay
+_default_base_delay = 0.1
+_default_max_delay = 20.0
+
+# each request earns budget_ratio of a retry, and we start with (and can
+# save up no more than) budget_reserve retries
+_default_budget_ratio = 0.1
+_default_budget_reserve = 10.0
+
+_idempotent_methods = frozenset(["GET", "HEAD", "DELETE", ])
+
+# REQUEST_TIMEOUT, TOO_MANY_REQUESTS and the server errors that mean the
+# server did not (or could not) act on the request
+_retryable_statuses = frozenset([408, 429, 500, 502, 503, 504, ])
+
+# the errors of a dropped or unreachable connection. On python 3, 
+# socket.error is OSError, which is also raised for local failures such as a
+# full disk or a body file that ends early: those are not worth retrying
+try:
+    connection_errors = (ConnectionError, 
+                         socket.timeout, 
+                         socket.gaierror, 
+                         httplib.HTTPException, )
+except NameError:
+    connection_errors = (socket.error, httplib.HTTPException, )
+
+def is_idempotent(method, uri):
+    """
+    True if sending the request twice has the same effect as sending it
+    once: GET, HEAD and DELETE, and a POST of part of a MultiPart Upload,
+    which carries a conjoined identifier
+    """
+    if method in _idempotent_methods:
+        return True
+    if method == "POST":
+        query = parse_qs(urlparse(uri).query)
+        return "conjoined_identifier" in query
+    return False
+
+def is_retryable_error(error):
+    """
+    True for an error that may go away if we ask again: a dropped
+    connection or a server that is overloaded or failing
+    """
+    if isinstance(error, LumberyardHTTPError):
+        return error.status in _retryable_statuses
+    if isinstance(error, DeadlineExceeded):
+        return False
+    return isinstance(error, connection_errors)
+
+def parse_retry_after(value):
+    """
+    return the seconds to wait from a Retry-After header, which is either
+    a number of seconds or an HTTP date, or None if it can't be parsed
+    """
+    if value is None:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    parsed_date = parsedate_tz(value)
+    if parsed_date is None:
+        return None
+    return max(0.0, mktime_tz(parsed_date) - time.time())
+
+def compute_body_position(body):
+    """
+    return something that rewind_body can use to send body again, or
+    None if it can only be sent once
+    """
+    if body is None or isinstance(body, (bytes, str, FileBody, )):
+        return 0
+    try:
+        return body.tell()
+    except (AttributeError, IOError, OSError, ValueError, ):
+        return None
+
+def rewind_body(body, body_position):
+    """
+    make body ready to be sent again, return False if we can't
+    """
+    if body_position is None:
+        return False
+    if body is None or isinstance(body, (bytes, str, FileBody, )):
+        return True
+    try:
+        body.seek(body_position)
+    except (AttributeError, IOError, OSError, ValueError, ):
+        return False
+    return True
+
+class RetryBudget(object):
+    """
+    limit retries to a fraction of the requests sent, so an outage doesn't
+    turn into a retry storm.
+
+    Each request adds ratio to the balance, up to reserve, and each retry
+    takes 1 away. A retry is allowed only when the balance has 1 to spend.
+    """
+    def __init__(self, ratio=_default_budget_ratio,
+                 reserve=_default_budget_reserve):
+        self._lock = threading.Lock()
+        self._ratio = ratio
+        self._reserve = reserve
+        self._balance = reserve
+
+    @property
+    def balance(self):
+        with self._lock:
+            return self._balance
+
+    def deposit(self):
+        """
+        record a request
+        """
+        with self._lock:
+            self._balance = min(self._reserve, self._balance + self._ratio)
+
+    def withdraw(self):
+        """
+        return True, and record a retry, if the budget allows one
+        """
+        with self._lock:
+            if self._balance < 1.0:
+                return False
+            self._balance -= 1.0
+            return True
+
+class RetryPolicy(object):
+    """
+    Retry idempotent requests that fail with a dropped connection or a
+    server error, up to num_retries times each.
+
+    The nth retry waits a random time (full jitter) up to
+    base_delay * 2 ** n seconds, capped at max_delay. A Retry-After from
+    the server is waited out instead, unless it is longer than max_delay,
+    in which case the error is raised.
+
+    Retries are also limited by a RetryBudget, shared by every request
+    that uses this policy. Each S3Emulator makes its own policy unless
+    one is passed in.
+
+    RetryPolicy(num_retries=0) turns retries off.
+    """
+    def __init__(self,
+                 num_retries=_default_num_retries,
+                 base_delay=_default_base_delay,
+                 max_delay=_default_max_delay,
+                 budget_ratio=_default_budget_ratio,
+                 budget_reserve=_default_budget_reserve):
+        self.num_retries = num_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = RetryBudget(budget_ratio, budget_reserve)
+
+    def request_sent(self):
+        """
+        called once for each request, not for its retries
+        """
+        self.budget.deposit()
+
+    def compute_retry_delay(self, method, uri, error, attempt,
+                            retry_after=None):
+        """
+        return the seconds to wait before retry number attempt + 1 of a
+        request that failed with error, or None if it should not be retried
+
+        retry_after
+            the Retry-After header of the response, if any
+        """
+        if attempt >= self.num_retries:
+            return None
+        if not is_idempotent(method, uri):
+            return None
+        return self.compute_delay(error, attempt, retry_after)
+
+    def compute_delay(self, error, attempt, retry_after=None):
+        """
+        return the seconds to wait before trying again after error, or None
+        if the error won't go away or the retry budget is spent.
+
+        This is for callers that decide for themselves what is safe to 
+        repeat, and how often, such as the resumable handlers: each retry
+        still comes out of the budget.
+        """
+        if not is_retryable_error(error):
+            return None
+
+        delay = random.uniform(0.0, min(self.max_delay,
+                                        self.base_delay * 2 ** attempt))
+        retry_after = parse_retry_after(retry_after)
+        if retry_after is not None:
+            if retry_after > self.max_delay:
+                return None
+            delay = max(delay, retry_after)
+
+        if not self.budget.withdraw():
+            return None
+        return delay
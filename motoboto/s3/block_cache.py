@@ -0,0 +1,381 @@
+# -*- coding: utf-8 -*-
+"""
+block_cache.py
+
+class BlockCache
+
+cache fixed size blocks of key contents, in memory and optionally on disk
+"""
+try:
+    from httplib import REQUESTED_RANGE_NOT_SATISFIABLE
+except ImportError:
+    from http.client import REQUESTED_RANGE_NOT_SATISFIABLE
+from collections import OrderedDict
+import hashlib
+import logging
+import os
+import sys
+import threading
+
+from lumberyard.http_connection import LumberyardHTTPError
+
+from motoboto.s3.util import parse_content_range_size
+
+_default_block_size = 1024 * 1024
+_default_memory_budget = 64 * 1024 * 1024
+_default_disk_budget = 1024 * 1024 * 1024
+
+# the sizes of this many versions are remembered, so reads to the end of a
+# version, and reads past its end, can be served from the cache
+_size_cache_entries = 4096
+
+_block_file_suffix = ".block"
+
+class _LRUTier(object):
+    """
+    least recently used bookkeeping for one tier, under a byte budget.
+    the caller holds the cache lock.
+    """
+    def __init__(self, budget):
+        self._budget = budget
+        self._entries = OrderedDict()
+        self.bytes_used = 0
+
+    def __contains__(self, entry_key):
+        return entry_key in self._entries
+
+    def get(self, entry_key):
+        value = self._entries.pop(entry_key, None)
+        if value is not None:
+            self._entries[entry_key] = value
+        return value
+
+    def put(self, entry_key, value, size):
+        """
+        add an entry, return a list of the (entry_key, value) pairs evicted
+        to stay under budget
+        """
+        self.remove(entry_key)
+        evicted = list()
+        if size > self._budget:
+            return evicted
+        self._entries[entry_key] = (value, size, )
+        self.bytes_used += size
+        while self.bytes_used > self._budget:
+            evicted_key, (evicted_value, evicted_size) = \
+                self._entries.popitem(last=False)
+            self.bytes_used -= evicted_size
+            evicted.append((evicted_key, evicted_value, ))
+        return evicted
+
+    def remove(self, entry_key):
+        entry = self._entries.pop(entry_key, None)
+        if entry is not None:
+            self.bytes_used -= entry[1]
+        return entry
+
+    def clear(self):
+        entries = list(self._entries.items())
+        self._entries.clear()
+        self.bytes_used = 0
+        return entries
+
+class BlockCache(object):
+    """
+    A cache of the contents of key versions, in aligned blocks of
+    block_size bytes, keyed by (collection, key, version_id, block index).
+
+    Blocks are kept in memory, least recently used first out, up to
+    memory_budget bytes. If disk_path is given, blocks are also written to
+    files in that directory, up to disk_budget bytes, and a block that has
+    left memory is read back from its file. Block files left by an earlier
+    BlockCache in the same directory are used too.
+
+    Only versions named by their version_id are cached, because the
+    contents of a version never change.
+
+    Pass a BlockCache to S3Emulator (or Bucket) as block_cache, and slices
+    read with get_contents_as_string(version_id=..., slice_offset=...,
+    slice_size=...) are served from it. Blocks that are missing are fetched
+    with one ranged GET for each run of missing blocks.
+    """
+    def __init__(self,
+                 block_size=_default_block_size,
+                 memory_budget=_default_memory_budget,
+                 disk_path=None,
+                 disk_budget=_default_disk_budget):
+        self._log = logging.getLogger("BlockCache")
+        self._block_size = block_size
+        self._lock = threading.Lock()
+        self._memory = _LRUTier(memory_budget)
+        self._disk_path = disk_path
+        self._disk = None
+        if disk_path is not None:
+            self._disk = _LRUTier(disk_budget)
+            self._load_disk_index()
+        self._sizes = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def block_size(self):
+        return self._block_size
+
+    def _load_disk_index(self):
+        """
+        index the block files already in disk_path, oldest first
+        """
+        if not os.path.isdir(self._disk_path):
+            os.makedirs(self._disk_path)
+        file_entries = list()
+        for file_name in os.listdir(self._disk_path):
+            if not file_name.endswith(_block_file_suffix):
+                continue
+            file_stat = os.stat(os.path.join(self._disk_path, file_name))
+            file_entries.append((file_stat.st_mtime,
+                                 file_name,
+                                 file_stat.st_size, ))
+        for _, file_name, file_size in sorted(file_entries):
+            for evicted_name, _ in self._disk.put(file_name,
+                                                  file_name,
+                                                  file_size):
+                self._remove_block_file(evicted_name)
+
+    def _block_file_name(self, block_id):
+        # a BlockCache with another block_size may share disk_path: its
+        # blocks for the same index hold other bytes
+        block_hash = hashlib.sha1(
+            repr((self._block_size, ) + block_id).encode("utf-8")
+        )
+        return block_hash.hexdigest() + _block_file_suffix
+
+    def _remove_block_file(self, file_name):
+        try:
+            os.unlink(os.path.join(self._disk_path, file_name))
+        except OSError:
+            pass
+
+    def _read_block_file(self, file_name):
+        try:
+            with open(os.path.join(self._disk_path, file_name), "rb") \
+            as block_file:
+                return block_file.read()
+        except (IOError, OSError, ):
+            self._log.warning("unable to read block file {0}: {1}".format(
+                file_name, sys.exc_info()[1]
+            ))
+            return None
+
+    def _write_block_file(self, file_name, data):
+        path = os.path.join(self._disk_path, file_name)
+        temp_path = "{0}.{1}.{2}".format(path,
+                                         os.getpid(),
+                                         threading.current_thread().ident)
+        try:
+            with open(temp_path, "wb") as block_file:
+                block_file.write(data)
+            os.rename(temp_path, path)
+        except (IOError, OSError, ):
+            self._log.warning("unable to write block file {0}: {1}".format(
+                file_name, sys.exc_info()[1]
+            ))
+            return False
+        return True
+
+    def get_block(self, block_id):
+        """
+        return the cached block, or None
+        """
+        with self._lock:
+            entry = self._memory.get(block_id)
+            if entry is not None:
+                self.hits += 1
+                return entry[0]
+            file_name = None
+            if self._disk is not None:
+                file_name = self._block_file_name(block_id)
+                if self._disk.get(file_name) is None:
+                    file_name = None
+
+        data = None
+        if file_name is not None:
+            data = self._read_block_file(file_name)
+
+        with self._lock:
+            if data is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._memory.put(block_id, data, len(data))
+        return data
+
+    def put_block(self, block_id, data):
+        """
+        add a block to the cache
+        """
+        with self._lock:
+            self._memory.put(block_id, data, len(data))
+
+        if self._disk is None:
+            return
+        file_name = self._block_file_name(block_id)
+        if not self._write_block_file(file_name, data):
+            return
+        with self._lock:
+            evicted = self._disk.put(file_name, file_name, len(data))
+        for evicted_name, _ in evicted:
+            self._remove_block_file(evicted_name)
+
+    def get_size(self, version_key):
+        with self._lock:
+            return self._sizes.get(version_key)
+
+    def put_size(self, version_key, size):
+        with self._lock:
+            self._sizes.pop(version_key, None)
+            self._sizes[version_key] = size
+            while len(self._sizes) > _size_cache_entries:
+                self._sizes.popitem(last=False)
+
+    def clear(self):
+        """
+        empty the cache, removing any block files
+        """
+        with self._lock:
+            self._memory.clear()
+            self._sizes.clear()
+            disk_entries = (list() if self._disk is None
+                            else self._disk.clear())
+        for file_name, _ in disk_entries:
+            self._remove_block_file(file_name)
+
+    @property
+    def memory_bytes(self):
+        return self._memory.bytes_used
+
+    @property
+    def disk_bytes(self):
+        return (0 if self._disk is None else self._disk.bytes_used)
+
+    def read(self, key, version_id, slice_offset, slice_size):
+        """
+        return slice_size bytes (or to the end, if slice_size is None) of
+        the version of key, from slice_offset, fetching missing blocks
+        """
+        version_key = (key._bucket.name, key.name, version_id, )
+        start = (0 if slice_offset is None else slice_offset)
+        size = self.get_size(version_key)
+        end = size
+        if slice_size is not None:
+            end = start + slice_size
+            if size is not None:
+                end = min(end, size)
+
+        first_block = start // self._block_size
+        blocks = dict()
+        block_index = first_block
+        while end is None or block_index * self._block_size < end:
+            block_id = version_key + (block_index, )
+            data = self.get_block(block_id)
+            if data is None:
+                fetched = self._fetch_blocks(key,
+                                             version_id,
+                                             version_key,
+                                             block_index,
+                                             end)
+                blocks.update(fetched)
+                size = self.get_size(version_key)
+                if size is not None and (end is None or end > size):
+                    end = size
+                if block_index not in blocks:
+                    break
+                # skip to the first block we have not just fetched
+                while block_index in blocks:
+                    block_index += 1
+                continue
+
+            blocks[block_index] = data
+            if len(data) < self._block_size:
+                # the last block
+                if end is None or end > block_index * self._block_size + \
+                   len(data):
+                    end = block_index * self._block_size + len(data)
+                break
+            block_index += 1
+
+        if end is None:
+            end = max([index * self._block_size + len(blocks[index])
+                       for index in blocks] + [start])
+
+        pieces = list()
+        for block_index in sorted(blocks):
+            block_start = block_index * self._block_size
+            data = blocks[block_index]
+            piece_start = max(start - block_start, 0)
+            piece_end = min(end - block_start, len(data))
+            if piece_end > piece_start:
+                pieces.append(memoryview(data)[piece_start:piece_end])
+        return b"".join(pieces)
+
+    def _fetch_blocks(self, key, version_id, version_key, block_index, end):
+        """
+        fetch the run of missing blocks starting at block_index, up to the
+        block containing end (or the end of the version), in one ranged GET.
+        return a dict of the blocks fetched
+        """
+        last_block = None
+        if end is not None:
+            last_block = (end - 1) // self._block_size
+            # stop the run at the next block we already hold
+            probe = block_index + 1
+            while probe <= last_block:
+                if self._contains(version_key + (probe, )):
+                    last_block = probe - 1
+                    break
+                probe += 1
+
+        fetch_offset = block_index * self._block_size
+        fetch_size = None
+        if last_block is not None:
+            fetch_size = (last_block - block_index + 1) * self._block_size
+
+        try:
+            http_connection, response = key._open_contents(
+                version_id, fetch_offset, fetch_size, None, None
+            )
+        except LumberyardHTTPError:
+            instance = sys.exc_info()[1]
+            # the run starts past the end of the version
+            if instance.status == REQUESTED_RANGE_NOT_SATISFIABLE:
+                return dict()
+            raise
+
+        blocks = dict()
+        try:
+            self.put_size(version_key, parse_content_range_size(response))
+            while True:
+                data = response.read(self._block_size)
+                if len(data) == 0:
+                    break
+                # http.client may return a short read before the end
+                while len(data) < self._block_size:
+                    more = response.read(self._block_size - len(data))
+                    if len(more) == 0:
+                        break
+                    data += more
+                self.put_block(version_key + (block_index, ), data)
+                blocks[block_index] = data
+                block_index += 1
+        finally:
+            http_connection.close()
+
+        return blocks
+
+    def _contains(self, block_id):
+        with self._lock:
+            if block_id in self._memory:
+                return True
+            if self._disk is not None and \
+               self._block_file_name(block_id) in self._disk:
+                return True
+        return False
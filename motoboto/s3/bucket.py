@@ -10,10 +10,19 @@ import logging
 from lumberyard.http_util import compute_default_hostname, \
         compute_collection_hostname, \
         compute_uri
-from lumberyard.http_connection import HTTPConnection
 
-from motoboto.s3.bucketlistresultset import BucketListResultSet
+from motoboto.connection_pool import ConnectionPool
+from motoboto.deadline import with_deadline
+from motoboto.s3.bucketlistresultset import BucketListResultSet, \
+        BucketVersionListResultSet, \
+        ParallelBucketListResultSet
 from motoboto.s3.key import Key
+from motoboto.s3.key_listing import KeyListing
+from motoboto.s3.listing_decoder import ListingDecoder
+from motoboto.s3.multidelete import MultiDelete, \
+        _default_delete_concurrency
+from motoboto.s3.multiget import MultiGet, _default_get_concurrency, \
+        _default_max_bytes_in_flight
 from motoboto.s3.multipart import MultiPartUpload
 from motoboto.s3.util import parse_http_timestamp
 
@@ -26,6 +35,10 @@ class Prefix(object):
         self.bucket = bucket
         self.name = name
 
+# the lists in a listing page that are decoded an entry at a time
+_key_list_names = ["key_data", "prefixes", ]
+_multipart_upload_list_names = ["conjoined_list", ]
+
 class TruncatableList(list):
     """
     A list of Keys that has the additional attribute 'truncated', indicating
@@ -35,20 +48,108 @@ class TruncatableList(list):
         super(TruncatableList, self).__init__(*args, **kwargs)
         self.truncated = False
 
+def _compute_get_all_keys_uri(max_keys, prefix, marker, delimiter):
+    kwargs = {
+        "max_keys" : max_keys,
+    }
+    if prefix != "" and prefix is not None: 
+        kwargs["prefix"] = prefix
+    if marker != "" and marker is not None: 
+        kwargs["marker"] = marker
+    if delimiter != "" and delimiter is not None: 
+        kwargs["delimiter"] = delimiter
+
+    return compute_uri("data/", **kwargs)
+
+def _compute_get_all_versions_uri(
+    max_keys, prefix, key_marker, version_id_marker, delimiter
+):
+    kwargs = {
+        "max_keys" : max_keys,
+    }
+    if prefix != "" and prefix is not None: 
+        kwargs["prefix"] = prefix
+    if key_marker != "" and key_marker is not None: 
+        kwargs["key_marker"] = key_marker
+    if version_id_marker != "" and version_id_marker is not None: 
+        kwargs["version_id_marker"] = version_id_marker
+    if delimiter != "" and delimiter is not None: 
+        kwargs["delimiter"] = delimiter
+
+    return compute_uri("/?versions", **kwargs)
+
+def _compute_get_all_multipart_uploads_uri(
+    max_uploads, key_marker, upload_id_marker
+):
+    kwargs = {
+        "max_uploads" : max_uploads,
+    }
+    if key_marker != "" and key_marker is not None: 
+        kwargs["key_marker"] = key_marker
+    if upload_id_marker != "" and upload_id_marker is not None: 
+        kwargs["upload_id_marker"] = upload_id_marker
+
+    return compute_uri("conjoined/", **kwargs)
+
 class Bucket(object):
     """
     wraps a nimbus.io collection to simuate an S3 bucket
+
+    connection_pool
+        the ConnectionPool shared with the S3Emulator that created us.
+        If None, the bucket keeps a pool of its own.
+
+    block_cache
+        if not None, a BlockCache that serves slices of versions read with
+        get_contents_as_string
+
+    single_flight
+        if not None, a SingleFlight that shares one request among the
+        threads that call exists, get_metadata or get_contents_as_string
+        for the same key at the same time
+
+    The methods that make requests, other than those that return an 
+    iterator, also take total_timeout, connect_timeout and 
+    first_byte_timeout, as motoboto.deadline.deadline_scope does.
     """
-    def __init__(self, identity, collection_name, versioning=False):
+    _key_class = Key
+    _multipart_upload_class = MultiPartUpload
+
+    def __init__(
+        self, 
+        identity, 
+        collection_name, 
+        versioning=False, 
+        connection_pool=None,
+        block_cache=None,
+        single_flight=None
+    ):
         self._log = logging.getLogger("Bucket({0})".format(collection_name))
         self._identity = identity
         self._collection_name = collection_name
         self._versioning = versioning
+        if connection_pool is None:
+            connection_pool = ConnectionPool(identity)
+        self._connection_pool = connection_pool
+        self._block_cache = block_cache
+        self._single_flight = single_flight
 
     @property
     def name(self):
         return self._collection_name
 
+    @property
+    def block_cache(self):
+        return self._block_cache
+
+    @property
+    def single_flight(self):
+        return self._single_flight
+
+    @property
+    def retry_policy(self):
+        return self._connection_pool.retry_policy
+
     @property
     def versioning(self):
         return self._versioning
@@ -56,26 +157,16 @@ class Bucket(object):
     def __str__(self):
         return self.name
 
+    @with_deadline
     def configure_versioning(self, versioning):
         """
         set the bucket's versioning property to True or False
         """
-        http_connection = HTTPConnection(
-            compute_default_hostname(),
-            self._identity.user_name,
-            self._identity.auth_key,
-            self._identity.auth_key_id
+        http_connection = self._connection_pool.create_http_connection(
+            compute_default_hostname()
         )
         method = "PUT"
-        uri = compute_uri(
-            "/".join([
-                "customers", 
-                self._identity.user_name, 
-                "collections",
-                self._collection_name
-            ]),
-            versioning=repr(versioning) 
-        )
+        uri = self._compute_collection_uri(versioning=repr(versioning))
 
         self._log.info("putting {0}".format(uri))
         response = http_connection.request(method, uri)
@@ -89,26 +180,16 @@ class Bucket(object):
 
         self._versioning = versioning
 
+    @with_deadline
     def configure_access_control(self, access_control):
         """
         set the bucket's access_control propoerty to a dict
         """
-        http_connection = HTTPConnection(
-            compute_default_hostname(),
-            self._identity.user_name,
-            self._identity.auth_key,
-            self._identity.auth_key_id
+        http_connection = self._connection_pool.create_http_connection(
+            compute_default_hostname()
         )
         method = "PUT"
-        uri = compute_uri(
-            "/".join([
-                "customers", 
-                self._identity.user_name, 
-                "collections",
-                self._collection_name
-            ]),
-            access_control="update"
-        )
+        uri = self._compute_collection_uri(access_control="update")
 
         body = None
         headers = dict()
@@ -129,8 +210,9 @@ class Bucket(object):
 
         return json.loads(data.decode("utf-8"))
 
+    @with_deadline
     def get_all_keys(
-        self, max_keys=1000, prefix="", marker="", delimiter=""
+        self, max_keys=1000, prefix="", marker="", delimiter="", slim=False
     ):
         """
         max_keys
@@ -150,61 +232,32 @@ class Bucket(object):
 
             These rolled-up keys are not returned elsewhere in the response.
 
+        slim
+            if True, return compact KeyListing records instead of Keys.
+            Use KeyListing.to_key() to get a full Key.
+
         return 
             TruncatableList : a list of Keys() with an additional attribute
             `truncated`. If truncated is True, ithere are more keys avaialoble 
             to list. To get them, call get_all_keys again with 'marker' set 
             to the name of the last key in the list
         """
-        method = "GET"
-
-        http_connection = self.create_http_connection()
-
-        kwargs = {
-            "max_keys" : max_keys,
-        }
-        if prefix != "" and prefix is not None: 
-            kwargs["prefix"] = prefix
-        if marker != "" and marker is not None: 
-            kwargs["marker"] = marker
-        if delimiter != "" and delimiter is not None: 
-            kwargs["delimiter"] = delimiter
-
-        uri = compute_uri("data/", **kwargs)
-
-        response = http_connection.request(method, uri)
-        
-        data = response.read()
-        http_connection.close()
-        data_dict = json.loads(data.decode("utf-8"))
-
-        if "key_data" in data_dict:
-            result_list = TruncatableList()
-            for key_entry in data_dict["key_data"]:
-                key = Key(
-                    bucket=self, 
-                    name=key_entry["key"], 
-                    version_id=key_entry["version_identifier"],
-                    last_modified=parse_http_timestamp(key_entry["timestamp"])
-                )
-                result_list.append(key)
-        elif "prefixes" in data_dict:
-            result_list = TruncatableList(
-                [Prefix(bucket=self, name=p) for p in data_dict["prefixes"]]
-            )
-        else:
-            raise ValueError("Unexpected return value {0}".format(data_dict))
-
-        result_list.truncated = data_dict["truncated"]
+        values = dict()
+        result_list = TruncatableList(
+            self._iter_keys(values, max_keys, prefix, marker, delimiter, slim)
+        )
+        result_list.truncated = values["truncated"]
         return result_list
 
+    @with_deadline
     def get_all_versions(
         self, 
         max_keys=1000, 
         prefix="", 
         key_marker="", 
         version_id_marker="", 
-        delimiter=""
+        delimiter="",
+        slim=False
     ):
         """
         max_keys
@@ -227,55 +280,30 @@ class Bucket(object):
 
             These rolled-up keys are not returned elsewhere in the response.
 
+        slim
+            if True, return compact KeyListing records instead of Keys.
+            Use KeyListing.to_key() to get a full Key.
+
         return 
             TruncatableList : a list of Keys() with an additional attribute
             `truncated`. If truncated is True, ithere are more keys avaialoble 
             to list. To get them, call get_all_keys again with 'marker' set 
             to the name of the last key in the list
         """
-        method = "GET"
-
-        http_connection = self.create_http_connection()
-
-        kwargs = {
-            "max_keys" : max_keys,
-        }
-        if prefix != "" and prefix is not None: 
-            kwargs["prefix"] = prefix
-        if key_marker != "" and key_marker is not None: 
-            kwargs["key_marker"] = key_marker
-        if version_id_marker != "" and version_id_marker is not None: 
-            kwargs["version_id_marker"] = version_id_marker
-        if delimiter != "" and delimiter is not None: 
-            kwargs["delimiter"] = delimiter
-
-        uri = compute_uri("/?versions", **kwargs)
-
-        response = http_connection.request(method, uri)
-        
-        data = response.read()
-        http_connection.close()
-        data_dict = json.loads(data.decode("utf-8"))
-
-        if "key_data" in data_dict:
-            result_list = TruncatableList()
-            for key_entry in data_dict["key_data"]:
-                key = Key(
-                    bucket=self, 
-                    name=key_entry["key"], 
-                    version_id=key_entry["version_identifier"]
-                )
-                result_list.append(key)
-        elif "prefixes" in data_dict:
-            result_list = TruncatableList(
-                [Prefix(bucket=self, name=p) for p in data_dict["prefixes"]]
-            )
-        else:
-            raise ValueError("Unexpected return value {0}".format(data_dict))
-
-        result_list.truncated = data_dict["truncated"]
+        values = dict()
+        result_list = TruncatableList(
+            self._iter_versions(values, 
+                                max_keys, 
+                                prefix, 
+                                key_marker, 
+                                version_id_marker, 
+                                delimiter, 
+                                slim)
+        )
+        result_list.truncated = values["truncated"]
         return result_list
 
+    @with_deadline
     def get_all_multipart_uploads(
         self, max_uploads=1000, key_marker="", upload_id_marker=""
     ):
@@ -292,38 +320,175 @@ class Bucket(object):
 
         return a list of all keys in this collection
         """
-        method = "GET"
+        uri = _compute_get_all_multipart_uploads_uri(
+            max_uploads, key_marker, upload_id_marker
+        )
 
-        http_connection = self.create_http_connection()
+        values = dict()
+        result_list = TruncatableList(
+            [self._multipart_upload_from_entry(list_name, entry)
+             for list_name, entry in self._iter_listing(
+                 uri, _multipart_upload_list_names, values
+             )]
+        )
+        result_list.truncated = values["truncated"]
+        return result_list
 
-        kwargs = {
-            "max_uploads" : max_uploads,
-        }
-        if key_marker != "" and key_marker is not None: 
-            kwargs["key_marker"] = key_marker
-        if upload_id_marker != "" and upload_id_marker is not None: 
-            kwargs["upload_id_marker"] = upload_id_marker
+    def _iter_listing(self, uri, list_names, values, dedicated=False):
+        """
+        GET a listing page and generate (list name, entry) for each entry
+        in the named lists as it arrives.
 
-        uri = compute_uri("conjoined/", **kwargs)
+        The page's other top level values are put in the dict values when
+        the page is finished.
 
-        response = http_connection.request(method, uri)
-        
-        data = response.read()
-        http_connection.close()
+        dedicated
+            if True, read the page through a connection outside the pool's
+            max_connections_per_host, so the caller can make requests of 
+            its own while it works through the page
+        """
+        http_connection = self.create_http_connection(dedicated=dedicated)
+        try:
+            response = http_connection.request("GET", uri)
+            decoder = ListingDecoder(response, list_names)
+            for item in decoder:
+                yield item
+            if not decoder.streamed:
+                raise ValueError(
+                    "Unexpected return value {0}".format(decoder.values)
+                )
+            values.update(decoder.values)
+        finally:
+            http_connection.close()
 
-        data_dict = json.loads(data.decode("utf-8"))
-        result_list = TruncatableList()
-        for conjoined_dict in data_dict["conjoined_list"]:
-            result_list.append(MultiPartUpload(bucket=self, **conjoined_dict)
+    def _iter_keys(
+        self, values, max_keys=1000, prefix="", marker="", delimiter="", 
+        slim=False, dedicated=False
+    ):
+        """
+        generate the entries of a get_all_keys page as they arrive
+        """
+        uri = _compute_get_all_keys_uri(max_keys, prefix, marker, delimiter)
+        for list_name, entry in self._iter_listing(uri, 
+                                                   _key_list_names, 
+                                                   values,
+                                                   dedicated):
+            yield self._key_from_entry(list_name, entry, slim)
+
+    def _iter_versions(
+        self, 
+        values, 
+        max_keys=1000, 
+        prefix="", 
+        key_marker="", 
+        version_id_marker="", 
+        delimiter="",
+        slim=False,
+        dedicated=False
+    ):
+        """
+        generate the entries of a get_all_versions page as they arrive
+        """
+        uri = _compute_get_all_versions_uri(
+            max_keys, prefix, key_marker, version_id_marker, delimiter
         )
-        result_list.truncated = data_dict["truncated"]
+        for list_name, entry in self._iter_listing(uri, 
+                                                   _key_list_names, 
+                                                   values,
+                                                   dedicated):
+            yield self._version_from_entry(list_name, entry, slim)
 
+    def _key_from_entry(self, list_name, entry, slim):
+        """
+        build one entry of the result of get_all_keys
+        """
+        if list_name == "prefixes":
+            return Prefix(bucket=self, name=entry)
+        if slim:
+            return KeyListing(self, 
+                              entry["key"], 
+                              entry["version_identifier"],
+                              entry["timestamp"])
+        return self._key_class(
+            bucket=self, 
+            name=entry["key"], 
+            version_id=entry["version_identifier"],
+            last_modified=parse_http_timestamp(entry["timestamp"])
+        )
+
+    def _version_from_entry(self, list_name, entry, slim):
+        """
+        build one entry of the result of get_all_versions
+        """
+        if list_name == "prefixes":
+            return Prefix(bucket=self, name=entry)
+        if slim:
+            return KeyListing(self, 
+                              entry["key"], 
+                              entry["version_identifier"],
+                              entry.get("timestamp"))
+        return self._key_class(
+            bucket=self, 
+            name=entry["key"], 
+            version_id=entry["version_identifier"]
+        )
+
+    def _multipart_upload_from_entry(self, _list_name, entry):
+        """
+        build one entry of the result of get_all_multipart_uploads
+        """
+        return self._multipart_upload_class(bucket=self, **entry)
+
+    def _list_from_dict(self, data_dict, list_names, entry_builder, *args):
+        """
+        build a TruncatableList from a decoded listing page
+        """
+        for list_name in list_names:
+            if list_name in data_dict:
+                break
+        else:
+            raise ValueError("Unexpected return value {0}".format(data_dict))
+
+        result_list = TruncatableList(
+            [entry_builder(list_name, entry, *args) 
+             for entry in data_dict[list_name]]
+        )
+        result_list.truncated = data_dict["truncated"]
         return result_list
 
+    def _key_list_from_dict(self, data_dict, slim=False):
+        """
+        build the result of get_all_keys from the decoded response
+        """
+        return self._list_from_dict(
+            data_dict, _key_list_names, self._key_from_entry, slim
+        )
+
+    def _version_list_from_dict(self, data_dict, slim=False):
+        """
+        build the result of get_all_versions from the decoded response
+        """
+        return self._list_from_dict(
+            data_dict, _key_list_names, self._version_from_entry, slim
+        )
+
+    def _multipart_upload_list_from_dict(self, data_dict):
+        """
+        build the result of get_all_multipart_uploads from the decoded 
+        response
+        """
+        return self._list_from_dict(
+            data_dict, 
+            _multipart_upload_list_names, 
+            self._multipart_upload_from_entry
+        )
+
     def __iter__(self):
         return iter(self.list())
 
-    def list(self, prefix="", delimiter="", marker=""):
+    def list(
+        self, prefix="", delimiter="", marker="", prefetch_pages=0, slim=False
+    ):
         """
         prefix
             The prefix of the keys you want to retrieve
@@ -339,47 +504,205 @@ class Bucket(object):
 
             These rolled-up keys are not returned elsewhere in the response.
 
+        prefetch_pages
+            if greater than 0, fetch up to this many pages of keys ahead, on
+            a background thread, while you work through the current page
+
+        slim
+            if True, list compact KeyListing records instead of Keys
+
         return a BucketListResultSet object
         """
-        return BucketListResultSet(self, prefix, delimiter, marker)
+        return BucketListResultSet(self, 
+                                   prefix, 
+                                   delimiter, 
+                                   marker, 
+                                   prefetch_pages=prefetch_pages,
+                                   slim=slim)
+
+    def list_versions(self, 
+                      prefix="", 
+                      delimiter="", 
+                      key_marker="", 
+                      version_id_marker="", 
+                      max_keys=1000,
+                      prefetch_pages=0, 
+                      slim=False):
+        """
+        prefix
+            The prefix of the keys you want to retrieve
+
+        delimiter
+        
+            Keys that contain the same string between the prefix and the 
+            first occurrence of the delimiter will be rolled up into a single 
+            result element. 
+
+        key_marker 
+            where you are in the result set, keys
+
+        version_id_marker 
+            where you are in the result set, versions
+
+        max_keys
+            The number of versions to retrieve in each page
+
+        prefetch_pages
+            if greater than 0, fetch up to this many pages of versions ahead,
+            on a background thread, while you work through the current page
+
+        slim
+            if True, list compact KeyListing records instead of Keys
+
+        return a BucketVersionListResultSet object, which iterates over every
+        version of every key
+        """
+        return BucketVersionListResultSet(self,
+                                          prefix,
+                                          delimiter,
+                                          key_marker,
+                                          version_id_marker,
+                                          max_keys=max_keys,
+                                          prefetch_pages=prefetch_pages,
+                                          slim=slim)
+
+    def parallel_list(self, 
+                      prefix="", 
+                      marker="", 
+                      shard_count=4, 
+                      boundaries=None, 
+                      ordered=True,
+                      slim=False):
+        """
+        prefix
+            The prefix of the keys you want to retrieve
+
+        marker 
+            where you are in the result set
+
+        shard_count
+            the number of marker ranges to split the keyspace into. Each
+            range is listed concurrently, on its own thread.
+
+        boundaries
+            key names or prefixes where the ranges divide, for example 
+            ["b", "m", "t"]. If None, the ranges are chosen by sampling
+            the keyspace, a key at a time, for prefixes that split it 
+            evenly.
+
+        ordered
+            True to return the keys in key order, as list() does. This 
+            holds keys from later ranges in memory until they are reached.
+
+            False to return the keys in the order they arrive, with bounded 
+            memory.
+
+        slim
+            if True, list compact KeyListing records instead of Keys
+
+        return a ParallelBucketListResultSet object
+        """
+        return ParallelBucketListResultSet(self, 
+                                           prefix=prefix, 
+                                           marker=marker, 
+                                           shard_count=shard_count,
+                                           boundaries=boundaries,
+                                           ordered=ordered,
+                                           slim=slim)
     
+    def delete_keys(self, 
+                    keys, 
+                    concurrency=_default_delete_concurrency, 
+                    max_rate=None):
+        """
+        keys
+            an iterable of key names, (key name, version_id) pairs, or Keys.
+            It is read as the keys are deleted, so it can be a generator.
+
+        concurrency
+            the number of DELETEs in flight at once, each on a pooled
+            connection. The pool's max_connections_per_host also limits it.
+
+        max_rate
+            if not None, the most DELETEs to start a second
+
+        return a MultiDelete object, which iterates over a Deleted or an 
+        Error for each key, as each DELETE finishes
+        """
+        return MultiDelete(self, 
+                           keys, 
+                           concurrency=concurrency, 
+                           max_rate=max_rate)
+
+    def get_many(self, 
+                 keys, 
+                 concurrency=_default_get_concurrency, 
+                 max_bytes_in_flight=_default_max_bytes_in_flight):
+        """
+        keys
+            an iterable of key names, (key name, version_id) pairs, or Keys.
+            It is read as the keys are retrieved, so it can be a generator.
+
+        concurrency
+            the number of GETs in flight at once, each on a pooled 
+            connection. The pool's max_connections_per_host also limits it.
+
+        max_bytes_in_flight
+            the most bytes of contents to hold that have not yet been 
+            handed to the caller
+
+        return a MultiGet object, which iterates over (Key, contents) for
+        each key, as each GET finishes. Each GET is retried on a dropped
+        connection or a server error.
+        """
+        return MultiGet(self, 
+                        keys, 
+                        concurrency=concurrency, 
+                        max_bytes_in_flight=max_bytes_in_flight)
+
     def get_key(self, name, version_id=None):
         """
         return a key object for the name
         """
-        return Key(bucket=self, name=name, version_id=version_id)
+        return self._key_class(bucket=self, name=name, version_id=version_id)
     
-    def create_http_connection(self):
+    def _compute_collection_uri(self, **kwargs):
+        """
+        the uri of this collection's entry in the customer's collection list
+        """
+        return compute_uri(
+            "/".join([
+                "customers", 
+                self._identity.user_name, 
+                "collections",
+                self._collection_name
+            ]),
+            **kwargs
+        )
+
+    def create_http_connection(self, dedicated=False):
         """
         create an HTTP connection with our colection name as the host
+
+        The connection comes from the shared pool: close() returns it
+        to the pool for reuse. A dedicated connection does not count against
+        the pool's max_connections_per_host.
         """
-        return HTTPConnection(
+        return self._connection_pool.create_http_connection(
             compute_collection_hostname(self._collection_name),
-            self._identity.user_name,
-            self._identity.auth_key,
-            self._identity.auth_key_id
+            dedicated=dedicated
         )
 
+    @with_deadline
     def get_space_used(self):
         """
         get disk space statistics for this collection
         """
-        http_connection = HTTPConnection(
-            compute_default_hostname(),
-            self._identity.user_name,
-            self._identity.auth_key,
-            self._identity.auth_key_id
+        http_connection = self._connection_pool.create_http_connection(
+            compute_default_hostname()
         )
         method = "GET"
-        uri = compute_uri(
-            "/".join([
-                "customers", 
-                self._identity.user_name, 
-                "collections",
-                self._collection_name
-            ]),
-            action="space_usage"
-        )
+        uri = self._compute_collection_uri(action="space_usage")
 
         response = http_connection.request(method, uri)
         data = response.read()
@@ -387,6 +710,7 @@ class Bucket(object):
     
         return json.loads(data.decode("utf-8"))
 
+    @with_deadline
     def initiate_multipart_upload(self, key_name):
         """
         key_name
@@ -412,5 +736,5 @@ class Bucket(object):
 
         result_dict = json.loads(data.decode("utf-8"))
 
-        return MultiPartUpload(bucket=self, **result_dict)
+        return self._multipart_upload_class(bucket=self, **result_dict)
 
@@ -2,34 +2,511 @@
 """
 BucketListResultSet
 """
+import heapq
 import logging
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+import sys
+import threading
+
+from motoboto.deadline import propagate_deadline
+
+# how often a blocked prefetch thread checks whether it has been abandoned
+_prefetch_poll_interval = 1.0
+
+# sorts after every character that can appear in a key name, so a marker of
+# a prefix followed by this skips every key that starts with the prefix
+_last_character = u"\U0010ffff"
+
+# sampling stops at this many candidate boundaries per shard, or after this
+# many requests
+_sample_candidates_per_shard = 4
+_max_sample_requests = 100
+
+class _PrefetchError(object):
+    """
+    carries an exception from a prefetch thread to the consumer
+    """
+    def __init__(self, exception):
+        self.exception = exception
+
+_end_of_pages = object()
+
+class _BackgroundPages(object):
+    """
+    iterate over pages from one or more generators of pages, each run on its
+    own background thread, in the order the pages arrive.
+
+    The threads start at once. Up to queue_size pages are fetched ahead of
+    the consumer (0 means no limit). close() stops the threads.
+    """
+    def __init__(self, page_generators, queue_size):
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._abandoned = threading.Event()
+        self._active_count = len(page_generators)
+        fetch_pages = propagate_deadline(self._fetch_pages)
+        for pages in page_generators:
+            thread = threading.Thread(target=fetch_pages,
+                                      args=(pages, ),
+                                      name="prefetch")
+            thread.daemon = True
+            thread.start()
+
+    def _put(self, item):
+        while not self._abandoned.is_set():
+            try:
+                self._queue.put(item, timeout=_prefetch_poll_interval)
+            except queue.Full:
+                continue
+            return True
+        return False
+
+    def _fetch_pages(self, pages):
+        try:
+            for page in pages:
+                if not self._put(page):
+                    return
+        except Exception:
+            self._put(_PrefetchError(sys.exc_info()[1]))
+        else:
+            self._put(_end_of_pages)
+
+    def close(self):
+        self._abandoned.set()
+
+    def __iter__(self):
+        try:
+            while self._active_count > 0:
+                item = self._queue.get()
+                if item is _end_of_pages:
+                    self._active_count -= 1
+                    continue
+                if isinstance(item, _PrefetchError):
+                    raise item.exception
+                yield item
+        finally:
+            self.close()
 
 class BucketListResultSet(object):
     """
     The result listmatch
+
+    prefetch_pages
+        if greater than 0, fetch up to this many pages of keys on a
+        background thread while the caller works through the current page.
+        At most prefetch_pages + 2 pages are held in memory.
+
+    slim
+        if True, list compact KeyListing records instead of Keys
     """
-    def __init__(self, bucket, prefix="", delimiter="", marker=""):
+    def __init__(self, 
+                 bucket, 
+                 prefix="", 
+                 delimiter="", 
+                 marker="", 
+                 prefetch_pages=0,
+                 slim=False):
         self._log = logging.getLogger("BucketListResultSet")
         self._bucket = bucket
         self._prefix = prefix
         self._delimiter = delimiter
         self._marker = marker
+        self._prefetch_pages = prefetch_pages
+        self._slim = slim
 
-    def __iter__(self):
+    def _pages(self):
+        marker = self._marker
         more_data = True
         while more_data:
             result = self._bucket.get_all_keys(
-                prefix=self._prefix, 
-                delimiter=self._delimiter, 
-                marker=self._marker
+                prefix=self._prefix,
+                delimiter=self._delimiter,
+                marker=marker,
+                slim=self._slim
             )
 
             if len(result) == 0 or self._delimiter != "":
                 more_data = False
             else:
                 more_data = result.truncated
-                self._marker = result[-1].name
+                marker = result[-1].name
+
+            yield result
 
+    def _streamed_keys(self):
+        """
+        generate keys as they are decoded from each page
+
+        The pages are read through dedicated connections: the caller may make
+        requests of its own through the pool before a page is finished.
+        """
+        marker = self._marker
+        while True:
+            values = dict()
+            last_name = None
+            for key in self._bucket._iter_keys(values,
+                                               prefix=self._prefix,
+                                               marker=marker,
+                                               delimiter=self._delimiter,
+                                               slim=self._slim,
+                                               dedicated=True):
+                last_name = key.name
+                yield key
+
+            if last_name is None or self._delimiter != "" or \
+               not values["truncated"]:
+                return
+            marker = last_name
+
+    def __iter__(self):
+        if self._prefetch_pages == 0:
+            return self._streamed_keys()
+        return self._prefetched_keys()
+
+    def _prefetched_keys(self):
+        pages = _BackgroundPages([self._pages()], self._prefetch_pages)
+        for result in pages:
             for key in result:
                 yield key
 
+class BucketVersionListResultSet(object):
+    """
+    Every version of every key in a bucket, listed page by page with
+    get_all_versions.
+
+    Each page after the first starts at the key name and version_id of the
+    last version in the previous page, so no version is listed twice.
+
+    max_keys
+        the number of versions to ask for in each page
+
+    prefetch_pages
+        if greater than 0, fetch up to this many pages of versions on a
+        background thread while the caller works through the current page.
+        At most prefetch_pages + 2 pages are held in memory.
+
+    slim
+        if True, list compact KeyListing records instead of Keys
+    """
+    def __init__(self, 
+                 bucket, 
+                 prefix="", 
+                 delimiter="", 
+                 key_marker="", 
+                 version_id_marker="", 
+                 max_keys=1000,
+                 prefetch_pages=0,
+                 slim=False):
+        self._log = logging.getLogger("BucketVersionListResultSet")
+        self._bucket = bucket
+        self._prefix = prefix
+        self._delimiter = delimiter
+        self._key_marker = key_marker
+        self._version_id_marker = version_id_marker
+        self._max_keys = max_keys
+        self._prefetch_pages = prefetch_pages
+        self._slim = slim
+
+    def _pages(self):
+        key_marker = self._key_marker
+        version_id_marker = self._version_id_marker
+        while True:
+            result = self._bucket.get_all_versions(
+                max_keys=self._max_keys,
+                prefix=self._prefix,
+                key_marker=key_marker,
+                version_id_marker=version_id_marker,
+                delimiter=self._delimiter,
+                slim=self._slim
+            )
+
+            yield result
+
+            if len(result) == 0 or self._delimiter != "" or \
+               not result.truncated:
+                return
+            key_marker = result[-1].name
+            version_id_marker = result[-1].version_id
+
+    def _streamed_versions(self):
+        """
+        generate versions as they are decoded from each page
+
+        The pages are read through dedicated connections, as in
+        BucketListResultSet.
+        """
+        key_marker = self._key_marker
+        version_id_marker = self._version_id_marker
+        while True:
+            values = dict()
+            last_key = None
+            for key in self._bucket._iter_versions(
+                values,
+                max_keys=self._max_keys,
+                prefix=self._prefix,
+                key_marker=key_marker,
+                version_id_marker=version_id_marker,
+                delimiter=self._delimiter,
+                slim=self._slim,
+                dedicated=True
+            ):
+                last_key = key
+                yield key
+
+            if last_key is None or self._delimiter != "" or \
+               not values["truncated"]:
+                return
+            key_marker = last_key.name
+            version_id_marker = last_key.version_id
+
+    def __iter__(self):
+        if self._prefetch_pages == 0:
+            return self._streamed_versions()
+        return self._prefetched_versions()
+
+    def _prefetched_versions(self):
+        pages = _BackgroundPages([self._pages()], self._prefetch_pages)
+        for result in pages:
+            for key in result:
+                yield key
+
+def _choose_boundaries(candidates, shard_count):
+    """
+    pick up to shard_count - 1 boundaries from the sorted list of
+    (boundary, weight) candidates, where weight is the share of the keys
+    estimated to fall between the boundary and the next one, so that each
+    shard gets about the same share
+    """
+    if len(candidates) < shard_count:
+        return [boundary for boundary, _ in candidates]
+    total_weight = float(sum(weight for _, weight in candidates))
+    shares = list()
+    share = 0.0
+    for boundary, weight in candidates:
+        shares.append((share, boundary, ))
+        share += weight / total_weight
+
+    boundaries = list()
+    for n in range(1, shard_count):
+        target_share = float(n) / shard_count
+        _, boundary = min(shares[1:], 
+                          key=lambda item: abs(item[0] - target_share))
+        if boundary not in boundaries:
+            boundaries.append(boundary)
+    return sorted(boundaries)
+
+class _KeySampler(object):
+    """
+    find prefixes that divide the keys of a bucket into ranges of about
+    the same size, with requests for one key at a time.
+
+    Starting from the whole keyspace, the prefix with the largest estimated
+    share of the keys is split into the prefixes one character longer than
+    the prefix all of its keys have in common. Each of those is estimated 
+    to hold an equal part of its share.
+    """
+    def __init__(self, bucket, prefix, marker):
+        self._bucket = bucket
+        self._prefix = prefix
+        self._marker = marker
+        self.request_count = 0
+
+    def _next_key_name(self, prefix, marker):
+        """
+        return the name of the first key with prefix after marker, or None
+        """
+        self.request_count += 1
+        result = self._bucket.get_all_keys(max_keys=1,
+                                           prefix=prefix,
+                                           marker=max(marker, self._marker))
+        if len(result) == 0:
+            return None
+        return result[0].name
+
+    def _split(self, prefix):
+        """
+        return the list of prefixes one character longer than the common
+        prefix of the keys that start with prefix (a key that is the common
+        prefix stands for itself), or None if we run out of requests
+        """
+        first_name = self._next_key_name(prefix, "")
+        if first_name is None:
+            return []
+
+        # search for the length of the prefix every key has in common
+        low, high = len(prefix), len(first_name)
+        while low < high:
+            if self.request_count >= _max_sample_requests:
+                return None
+            middle = (low + high + 1) // 2
+            if self._next_key_name(
+                prefix, first_name[:middle] + _last_character
+            ) is None:
+                low = middle
+            else:
+                high = middle - 1
+
+        split_prefixes = list()
+        name = first_name
+        while name is not None:
+            if self.request_count >= _max_sample_requests:
+                return None
+            if len(name) > low:
+                split_prefix = name[:low+1]
+                marker = split_prefix + _last_character
+            else:
+                split_prefix = marker = name
+            split_prefixes.append(split_prefix)
+            name = self._next_key_name(prefix, marker)
+        return split_prefixes
+
+    def sample(self, candidate_count):
+        """
+        return a sorted list of about candidate_count (prefix, weight),
+        where weight is the estimated share of the keys that start with
+        prefix
+        """
+        # a heap of (-weight, prefix) still to be split
+        heap = [(-1.0, self._prefix, )]
+        final = list()
+        while len(heap) > 0 and len(heap) + len(final) < candidate_count:
+            if self.request_count >= _max_sample_requests:
+                break
+            negative_weight, prefix = heapq.heappop(heap)
+            split_prefixes = self._split(prefix)
+            if split_prefixes is None:
+                heapq.heappush(heap, (negative_weight, prefix, ))
+                break
+            if len(split_prefixes) <= 1:
+                if prefix != self._prefix:
+                    final.append((prefix, -negative_weight, ))
+                continue
+            weight = -negative_weight / len(split_prefixes)
+            for split_prefix in split_prefixes:
+                heapq.heappush(heap, (-weight, split_prefix, ))
+
+        candidates = final + [(prefix, -negative_weight, ) 
+                              for negative_weight, prefix in heap]
+        return sorted(candidates)
+
+class ParallelBucketListResultSet(object):
+    """
+    Every key in a bucket, listed by several threads at once.
+
+    The keyspace is split at a sorted set of boundaries into shards: the 
+    first shard holds the keys up to and including the first boundary, 
+    the next shard the keys after that up to the second boundary, and so on.
+    Each shard is listed by its own thread, with get_all_keys and a marker 
+    starting at the shard's lower boundary.
+
+    boundaries
+        key names or prefixes to split the keyspace at. If None, the
+        keyspace is sampled for prefixes that split it evenly, with a few
+        requests for one key at a time (see _KeySampler), and shard_count - 1
+        of them are used.
+
+    ordered
+        if True, keys are returned in key order, as BucketListResultSet 
+        returns them. Shards after the one being consumed are held in 
+        memory as they arrive, so a full listing may hold most of the keys
+        in memory.
+
+        if False, pages of keys are returned in the order they arrive, and 
+        at most queue_pages pages are held in memory.
+
+    slim
+        if True, list compact KeyListing records instead of Keys
+    """
+    def __init__(self, 
+                 bucket, 
+                 prefix="", 
+                 marker="", 
+                 shard_count=4,
+                 boundaries=None,
+                 ordered=True,
+                 queue_pages=None,
+                 slim=False):
+        self._log = logging.getLogger("ParallelBucketListResultSet")
+        self._bucket = bucket
+        self._prefix = prefix
+        self._marker = marker
+        self._shard_count = shard_count
+        self._boundaries = boundaries
+        self._ordered = ordered
+        if queue_pages is None:
+            queue_pages = (0 if ordered else 2 * shard_count)
+        self._queue_pages = queue_pages
+        self._slim = slim
+
+    def _compute_boundaries(self):
+        marker = self._marker or ""
+        if self._boundaries is not None:
+            candidates = [(boundary, 1.0, ) 
+                          for boundary in sorted(set(self._boundaries))]
+        else:
+            sampler = _KeySampler(self._bucket, self._prefix, marker)
+            candidates = sampler.sample(
+                self._shard_count * _sample_candidates_per_shard
+            )
+            self._log.debug("sampled {0} prefixes with {1} requests".format(
+                len(candidates), sampler.request_count
+            ))
+        
+        candidates = [(boundary, weight, ) for boundary, weight in candidates
+                      if boundary > marker]
+        return _choose_boundaries(candidates, self._shard_count)
+
+    def _shard_pages(self, lower, upper):
+        """
+        generate pages of keys with lower < key.name <= upper.
+        upper is None for the last shard.
+        """
+        marker = lower
+        while True:
+            result = self._bucket.get_all_keys(prefix=self._prefix, 
+                                               marker=marker,
+                                               slim=self._slim)
+            if upper is not None and len(result) > 0 and \
+               result[-1].name > upper:
+                yield [key for key in result if key.name <= upper]
+                return
+
+            yield result
+
+            if len(result) == 0 or not result.truncated:
+                return
+            marker = result[-1].name
+
+    def shard_ranges(self):
+        """
+        return a list of (lower, upper) marker ranges, one per shard
+        """
+        boundaries = self._compute_boundaries()
+        lowers = [self._marker] + boundaries
+        uppers = boundaries + [None]
+        return list(zip(lowers, uppers))
+
+    def __iter__(self):
+        shard_ranges = self.shard_ranges()
+        self._log.debug("listing {0} shards".format(len(shard_ranges)))
+
+        if self._ordered:
+            # start every shard now; each one buffers until we reach it
+            shards = [_BackgroundPages([self._shard_pages(lower, upper)], 
+                                       self._queue_pages)
+                      for lower, upper in shard_ranges]
+        else:
+            shards = [_BackgroundPages([self._shard_pages(lower, upper)
+                                        for lower, upper in shard_ranges],
+                                       self._queue_pages)]
+
+        try:
+            for shard in shards:
+                for result in shard:
+                    for key in result:
+                        yield key
+        finally:
+            for shard in shards:
+                shard.close()
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+fan_out.py
+
+class FanOut
+
+run a request for each item of an iterable on several threads at once,
+yielding the results as they finish
+"""
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+import logging
+import sys
+import threading
+
+from motoboto.deadline import propagate_deadline
+
+# how long a blocked thread waits before checking whether to stop
+_poll_interval = 0.5
+
+def compute_key_and_version(item):
+    """
+    return (key name, version_id) for a name, a (name, version_id) pair,
+    or a Key
+    """
+    if isinstance(item, tuple):
+        key_name, version_id = item
+        return key_name, version_id
+    if hasattr(item, "name"):
+        return item.name, item.version_id
+    return item, None
+
+class FanOut(object):
+    """
+    Base class for running _process(item) for each item, with up to
+    concurrency calls in flight at once.
+
+    Iterating yields the value of each call as it finishes, in that order,
+    not the order of the items. items is read as the calls go, through a
+    bounded queue, so it can be a generator over millions of items.
+    Closing the iterator early stops the threads.
+
+    If _process raises, or reading items fails, iteration stops after the
+    calls in flight have finished, and the first error is raised.
+    """
+    def __init__(self, items, concurrency):
+        self._log = logging.getLogger(self.__class__.__name__)
+        self._items = items
+        self._concurrency = max(1, concurrency)
+        self._pending = queue.Queue(maxsize=self._concurrency * 2)
+        self._results = queue.Queue()
+        self._stopped = threading.Event()
+
+    def _process(self, item):
+        """
+        called on a worker thread for each item: the value returned is
+        yielded to the caller. Subclasses make their request here.
+        """
+        return item
+
+    def _result_taken(self, result):
+        """
+        called as each result is handed to the caller
+        """
+        pass
+
+    def _put(self, target_queue, item):
+        """
+        put item on a bounded queue, return False if we were stopped first
+        """
+        while not self._stopped.is_set():
+            try:
+                target_queue.put(item, timeout=_poll_interval)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _feed(self):
+        """
+        put each item on the pending queue, then one None for each worker
+        """
+        try:
+            for item in self._items:
+                if not self._put(self._pending, (item, )):
+                    return
+        except Exception:
+            self._log.exception("unable to read items")
+            self._results.put((False, sys.exc_info()[1], ))
+        for _ in range(self._concurrency):
+            if not self._put(self._pending, None):
+                return
+
+    def _work(self):
+        try:
+            while not self._stopped.is_set():
+                try:
+                    pending = self._pending.get(timeout=_poll_interval)
+                except queue.Empty:
+                    continue
+                if pending is None:
+                    return
+                try:
+                    result = self._process(pending[0])
+                except Exception:
+                    self._results.put((False, sys.exc_info()[1], ))
+                    self._stopped.set()
+                    return
+                self._results.put((True, result, ))
+        finally:
+            # tell the caller this thread is finished
+            self._results.put(None)
+
+    def __iter__(self):
+        threads = [threading.Thread(target=propagate_deadline(self._feed),
+                                    name="fan-out-feed")]
+        work = propagate_deadline(self._work)
+        for _ in range(self._concurrency):
+            threads.append(threading.Thread(target=work,
+                                            name="fan-out-work"))
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        error = None
+        finished_count = 0
+        try:
+            while finished_count < self._concurrency:
+                result = self._results.get()
+                if result is None:
+                    finished_count += 1
+                    continue
+                succeeded, value = result
+                if not succeeded:
+                    if error is None:
+                        error = value
+                    self._stopped.set()
+                    continue
+                self._result_taken(value)
+                if error is None:
+                    yield value
+        finally:
+            self._stopped.set()
+
+        if error is not None:
+            raise error
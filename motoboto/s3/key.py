@@ -15,6 +15,7 @@ except ImportError:
     from http.client import NOT_MODIFIED
     from http.client import NOT_FOUND
     from http.client import PRECONDITION_FAILED
+import io
 import json
 import logging
 import os
@@ -24,6 +25,11 @@ from lumberyard.http_connection import LumberyardHTTPError
 from lumberyard.http_util import compute_uri, meta_prefix
 from lumberyard.read_reporter import ReadReporter
 
+from motoboto.deadline import compute_read_size, with_deadline
+from motoboto.file_body import FileBody, compute_file_body
+from motoboto.s3.key_reader import KeyReader
+from motoboto.s3.multipart import ParallelUpload, StreamReader
+from motoboto.s3.parallel_download import ParallelDownload
 from motoboto.s3.util import http_timestamp_str
 from motoboto.s3.archive_callback_wrapper import ArchiveCallbackWrapper
 from motoboto.s3.retrieve_callback_wrapper import NullCallbackWrapper, \
@@ -38,6 +44,18 @@ class KeyUnmodified(KeyModifiedError):
 
 _read_buffer_size = 64 * 1024
 
+# files at least this large are uploaded as a MultiPart Upload, with 
+# several parts in flight at once
+_default_multipart_threshold = 64 * 1024 * 1024
+_default_multipart_part_size = 16 * 1024 * 1024
+_default_multipart_concurrency = 4
+
+# how much Key.open reads ahead of the caller
+_default_readahead = 1024 * 1024
+
+# the size of each range fetched by a parallel download
+_default_download_part_size = 16 * 1024 * 1024
+
 def _convert_slice_to_range_header(headers, slice_offset, slice_size):
     if slice_size is not None:
         if slice_offset is None:
@@ -47,9 +65,94 @@ def _convert_slice_to_range_header(headers, slice_offset, slice_size):
     elif slice_offset is not None:
         headers["Range"] = "bytes={0}-".format(slice_offset)
 
+def _convert_conditions_to_headers(headers, 
+                                   modified_since, 
+                                   unmodified_since):
+    if modified_since is not None:
+        timestamp = datetime.utcfromtimestamp(modified_since)
+        headers["If-Modified-Since"] = http_timestamp_str(timestamp)
+    if unmodified_since is not None:
+        timestamp = datetime.utcfromtimestamp(unmodified_since)
+        headers["If-Unmodified-Since"] = http_timestamp_str(timestamp)
+
+def _convert_retrieve_error(instance, modified_since, unmodified_since):
+    """
+    return the exception to raise for a LumberyardHTTPError on retrieve
+    """
+    if instance.status == NOT_MODIFIED and modified_since is not None:
+        return KeyUnmodified()
+    if instance.status == PRECONDITION_FAILED and \
+        unmodified_since is not None:
+        return KeyModified()
+    return instance
+
+def _compute_remaining_size(file_object):
+    """
+    return the number of bytes from the current position to the end of the
+    file, or None if the file cannot seek
+    """
+    try:
+        position = file_object.tell()
+        file_object.seek(0, os.SEEK_END)
+        end = file_object.tell()
+        file_object.seek(position)
+    except (AttributeError, IOError, OSError, ValueError, ):
+        return None
+    return end - position
+
+def _compute_content_length(response):
+    """
+    return the length of the response body from Content-Length, 
+    or None if the server did not send one
+    """
+    content_length = response.getheader("Content-Length")
+    if content_length is None:
+        return None
+    return int(content_length)
+
+def _read_into(http_connection, response, view):
+    """
+    read the response body into the memoryview until it is full or the body
+    ends, return the number of bytes read
+    """
+    bytes_read = 0
+    while bytes_read < len(view):
+        http_connection.check_deadline()
+        read_size = compute_read_size(len(view) - bytes_read,
+                                      _read_buffer_size)
+        if hasattr(response, "readinto"):
+            chunk_size = response.readinto(
+                view[bytes_read:bytes_read+read_size]
+            )
+        else:
+            data = response.read(min(_read_buffer_size, read_size))
+            chunk_size = len(data)
+            view[bytes_read:bytes_read+chunk_size] = data
+        if chunk_size == 0:
+            break
+        bytes_read += chunk_size
+    return bytes_read
+
+def _compute_archive_kwargs(metadata, multipart_id, part_num):
+    kwargs = {
+        "conjoined_identifier"  : multipart_id,
+    }
+
+    if part_num > 0:
+        kwargs["conjoined_part"] = part_num
+
+    for meta_key, meta_value in metadata.items():
+        kwargs["".join([meta_prefix, meta_key])] = meta_value
+
+    return kwargs
+
 class Key(object):
     """
     wrap a nimbus.io key to simulate a boto Key object
+
+    The methods that make requests, other than open(), also take 
+    total_timeout, connect_timeout and first_byte_timeout, as 
+    motoboto.deadline.deadline_scope does.
     """
     def __init__(
         self, bucket=None, name=None, version_id=None, last_modified=None
@@ -105,6 +208,19 @@ class Key(object):
 
     size = property(_get_size, _set_size)
 
+    def _share_call(self, call_name, function, *args):
+        """
+        return function(*args). If the bucket has a single_flight, the same
+        call for this key made at the same time by other threads shares
+        one request.
+        """
+        single_flight = getattr(self._bucket, "single_flight", None)
+        if single_flight is None:
+            return function(*args)
+        call_key = (self._bucket.name, call_name, self._name, ) + args
+        return single_flight.do(call_key, function, *args)
+
+    @with_deadline
     def exists(self, modified_since=None, unmodified_since=None):
         """
         return True if we can HEAD the key, and it fits one of the
@@ -112,8 +228,6 @@ class Key(object):
 
         Not that you cannot specify both modified_since and unmodified_since
         """  
-        found = False
-
         if self._bucket is None:
             raise ValueError("No bucket")
         if self._name is None:
@@ -122,15 +236,20 @@ class Key(object):
             raise ValueError(
                 "Can't specify both modified_since and unmodified_since")
 
+        return self._share_call("exists", 
+                                self._head, 
+                                modified_since, 
+                                unmodified_since)
+
+    def _head(self, modified_since, unmodified_since):
+        found = False
+
         method = "HEAD"
         uri = compute_uri("data", self._name)
         headers = {}
-        if modified_since is not None:
-            timestamp = datetime.utcfromtimestamp(modified_since)
-            headers["If-Modified-Since"] = http_timestamp_str(timestamp)
-        if unmodified_since is not None:
-            timestamp = datetime.utcfromtimestamp(unmodified_since)
-            headers["If-Unmodified-Since"] = http_timestamp_str(timestamp)
+        _convert_conditions_to_headers(headers, 
+                                       modified_since, 
+                                       unmodified_since)
         
         http_connection = self._bucket.create_http_connection()
 
@@ -159,6 +278,7 @@ class Key(object):
 
         return found
 
+    @with_deadline
     def set_contents_from_string(
         self, 
         data, 
@@ -197,15 +317,9 @@ class Key(object):
         if self._name is None:
             raise ValueError("No name")
 
-        kwargs = {
-            "conjoined_identifier"  : multipart_id,
-        }
-
-        if part_num > 0:
-            kwargs["conjoined_part"] = part_num
-
-        for meta_key, meta_value in self._metadata.items():
-            kwargs["".join([meta_prefix, meta_key])] = meta_value
+        kwargs = _compute_archive_kwargs(self._metadata, 
+                                         multipart_id, 
+                                         part_num)
 
         method = "POST"
         uri = compute_uri("data", self._name, **kwargs)
@@ -221,6 +335,7 @@ class Key(object):
         response_dict = json.loads(response_str.decode("utf-8"))
         self._version_id = response_dict["version_identifier"]
 
+    @with_deadline
     def set_contents_from_file(
         self, 
         file_object, 
@@ -228,7 +343,11 @@ class Key(object):
         cb=None, 
         cb_count=10,
         multipart_id=None,
-        part_num=0
+        part_num=0,
+        multipart_threshold=_default_multipart_threshold,
+        part_size=_default_multipart_part_size,
+        concurrency=_default_multipart_concurrency,
+        res_upload_handler=None
     ):
         """
         file_object
@@ -251,6 +370,28 @@ class Key(object):
         part_num
             part number of multipart upload
 
+        multipart_threshold
+            if the file can seek, and there are at least this many bytes from
+            the current position to the end, archive it as a MultiPart Upload
+            of part_size parts, uploading up to concurrency parts at once.
+            If the upload fails it is cancelled.
+            None to always archive the file in one request.
+
+            Keys with metadata are always archived in one request.
+
+        part_size
+            the size of each part of a MultiPart Upload
+
+        concurrency
+            the number of parts of a MultiPart Upload to upload at once
+
+        res_upload_handler
+            a ResumableUploadHandler, which archives the file as a 
+            MultiPart Upload of part_size parts, whatever its size, and 
+            records the parts uploaded in its tracker file, so an upload 
+            that fails can be continued by a later call. The file must 
+            support seek() and tell().
+
         archive the content of the file in nimbus.io
         """
         if self._bucket is None:
@@ -258,30 +399,75 @@ class Key(object):
         if self._name is None:
             raise ValueError("No name")
 
+        if res_upload_handler is not None:
+            if multipart_id is not None or len(self._metadata) > 0:
+                raise ValueError(
+                    "Can't specify res_upload_handler with multipart_id or "
+                    "metadata")
+            size = _compute_remaining_size(file_object)
+            if size is None:
+                raise ValueError("res_upload_handler needs a seekable file")
+            completed_upload = res_upload_handler.send_file(self, 
+                                                            file_object, 
+                                                            size, 
+                                                            part_size, 
+                                                            concurrency, 
+                                                            cb)
+            self._version_id = completed_upload.version_id
+            return
+
+        if multipart_id is None and \
+           multipart_threshold is not None and \
+           len(self._metadata) == 0:
+            size = _compute_remaining_size(file_object)
+            if size is not None and size >= multipart_threshold:
+                self._set_contents_in_parts(
+                    file_object, size, part_size, concurrency, cb
+                )
+                return
+
+        # a file on disk goes straight from the page cache to the socket
+        file_body = compute_file_body(file_object)
+
         wrapper = None
-        if cb is None:
+        if file_body is not None:
+            body = file_body
+        elif cb is None:
             body = file_object
         else:
             body = ReadReporter(file_object)
+        if cb is not None:
             wrapper = ArchiveCallbackWrapper(body, cb, cb_count) 
 
-        kwargs = {
-            "conjoined_identifier"  : multipart_id,
-        }
+        self._send_contents(body, multipart_id, part_num)
 
-        if part_num > 0:
-            kwargs["conjoined_part"] = part_num
+        if file_body is not None:
+            # leave the file at its end, as if we had read it
+            file_object.seek(file_body.offset + file_body.size)
 
-        for meta_key, meta_value in self._metadata:
-            kwargs["".join([meta_prefix, meta_key])] = meta_value
+    def _send_contents(self, body, multipart_id=None, part_num=0):
+        """
+        POST body, a file-like object or a FileBody, as our contents 
+        (or as one part of a MultiPart Upload)
+        """
+        kwargs = _compute_archive_kwargs(self._metadata, 
+                                         multipart_id, 
+                                         part_num)
 
         method = "POST"
         uri = compute_uri("data", self._name, **kwargs)
 
+        headers = None
+        if isinstance(body, FileBody):
+            headers = {"Content-Length" : str(body.size)}
+
         http_connection = self._bucket.create_http_connection()
 
         self._log.info("requesting POST {0}".format(uri))
-        response = http_connection.request(method, uri, body=body)
+        response = http_connection.request(method, 
+                                           uri, 
+                                           body=body, 
+                                           headers=headers)
         
         response_str = response.read()
         http_connection.close()
@@ -289,6 +475,146 @@ class Key(object):
         response_dict = json.loads(response_str.decode("utf-8"))
         self._version_id = response_dict["version_identifier"]
 
+    @with_deadline
+    def set_contents_from_stream(
+        self,
+        stream,
+        cb=None,
+        cb_count=10,
+        part_size=_default_multipart_part_size,
+        concurrency=_default_multipart_concurrency
+    ):
+        """
+        stream
+            a file-like object with read(), such as a pipe, or an iterable 
+            of byte strings, whose length need not be known
+
+        cb
+            callback function for reporting progress. A stream archived
+            in parts reports its size as None.
+
+        cb_count
+            number of callbacks to be made during the archive process
+
+        part_size
+            the size of each part of a MultiPart Upload
+
+        concurrency
+            the number of parts of a MultiPart Upload to upload at once
+
+        archive the content of the stream in nimbus.io, without holding 
+        all of it in memory. 
+
+        If the stream ends within part_size bytes, it is archived in one 
+        request. Otherwise it is archived as a MultiPart Upload, reading 
+        part_size parts as they arrive, with at most concurrency parts in 
+        memory at once. If the upload fails it is cancelled.
+
+        Keys with metadata can only be archived from a stream that ends
+        within part_size bytes.
+
+        sets version_id attribute after successful archive
+        """
+        if self._bucket is None:
+            raise ValueError("No bucket")
+        if self._name is None:
+            raise ValueError("No name")
+
+        reader = StreamReader(stream)
+        first_part = reader.read(part_size)
+        if len(first_part) < part_size:
+            self.set_contents_from_file(io.BytesIO(first_part), 
+                                        cb=cb, 
+                                        cb_count=cb_count,
+                                        multipart_threshold=None)
+            return
+
+        if len(self._metadata) > 0:
+            raise ValueError(
+                "Can't archive metadata with a stream longer than part_size")
+
+        reader.unread(first_part)
+        first_part = None
+        self._log.info("archiving a stream in parts of {0}".format(part_size))
+        upload = ParallelUpload(self._bucket, 
+                                self._name, 
+                                reader, 
+                                None, 
+                                part_size, 
+                                concurrency,
+                                cb=cb)
+        completed_upload = upload.run()
+        self._version_id = completed_upload.version_id
+
+    def _set_contents_in_parts(
+        self, file_object, size, part_size, concurrency, cb
+    ):
+        """
+        archive size bytes of the file as a MultiPart Upload
+        """
+        self._log.info("archiving {0} bytes in parts of {1}".format(
+            size, part_size
+        ))
+        start_position = file_object.tell()
+        upload = ParallelUpload(self._bucket, 
+                                self._name, 
+                                file_object, 
+                                size, 
+                                part_size, 
+                                concurrency,
+                                cb=cb)
+        completed_upload = upload.run()
+        self._version_id = completed_upload.version_id
+        # parts sent from a file on disk do not move its position
+        file_object.seek(start_position + size)
+
+    def _open_contents(self, 
+                       version_id, 
+                       slice_offset, 
+                       slice_size, 
+                       modified_since, 
+                       unmodified_since,
+                       headers=None):
+        """
+        send a GET for the contents,
+        return (http_connection, response) for reading the body.
+        The caller must close the connection.
+        """
+        kwargs = {
+            "version_identifier"    : version_id,
+        }
+        headers = dict() if headers is None else dict(headers)
+        _convert_slice_to_range_header(headers, slice_offset, slice_size)
+        expected_status = (PARTIAL_CONTENT if "Range" in headers else OK)
+        _convert_conditions_to_headers(headers, 
+                                       modified_since, 
+                                       unmodified_since)
+
+        method = "GET"
+        uri = compute_uri("data", self._name, **kwargs)
+
+        http_connection = self._bucket.create_http_connection()
+
+        self._log.info("requesting GET {0} {1}".format(uri, headers))
+        try:
+            response = http_connection.request(method, 
+                                               uri, 
+                                               body=None, 
+                                               headers=headers,
+                                               expected_status=expected_status)
+        except LumberyardHTTPError:
+            instance = sys.exc_info()[1]
+            http_connection.close()
+            error = _convert_retrieve_error(instance, 
+                                            modified_since, 
+                                            unmodified_since)
+            if error is instance:
+                raise
+            raise error
+
+        return http_connection, response
+
+    @with_deadline
     def get_contents_as_string(self, 
                                cb=None, 
                                cb_count=10, 
@@ -336,6 +662,12 @@ class Key(object):
             Note: you cannot specify both modified_since and unmodified_since
 
         retrieve the contents from nimbus.io as a string
+
+        if the bucket has a block_cache, a slice of a version named by 
+        version_id is served from the cache
+
+        if the bucket has a single_flight, the same retrieve made at the
+        same time by other threads shares one request
         """
         if self._bucket is None:
             raise ValueError("No bucket")
@@ -345,45 +677,47 @@ class Key(object):
             raise ValueError(
                 "Can't specify both modified_since and unmodified_since")
 
-        kwargs = {
-            "version_identifier"    : version_id,
-        }
-        headers = {}
-        _convert_slice_to_range_header(headers, slice_offset, slice_size)
-        expected_status = (PARTIAL_CONTENT if "Range" in headers else OK)
-
-        if modified_since is not None:
-            timestamp = datetime.utcfromtimestamp(modified_since)
-            headers["If-Modified-Since"] = http_timestamp_str(timestamp)
-        if unmodified_since is not None:
-            timestamp = datetime.utcfromtimestamp(unmodified_since)
-            headers["If-Unmodified-Since"] = http_timestamp_str(timestamp)
-
-        method = "GET"
-        uri = compute_uri("data", self._name, **kwargs)
-
-        http_connection = self._bucket.create_http_connection()
-
-        self._log.info("requesting GET {0} {1}".format(uri, headers))
-
-        try:
-            response = http_connection.request(method, 
-                                               uri, 
-                                               body=None, 
-                                               headers=headers,
-                                               expected_status=expected_status)
-        except LumberyardHTTPError:
-            instance = sys.exc_info()[1]
+        # only a named version is cached, the latest may change under us
+        block_cache = getattr(self._bucket, "block_cache", None)
+        if block_cache is not None and \
+           version_id is not None and \
+           (slice_offset is not None or slice_size is not None) and \
+           modified_since is None and \
+           unmodified_since is None:
+            return block_cache.read(self, version_id, slice_offset, slice_size)
+
+        return self._share_call("get_contents", 
+                                self._get_contents, 
+                                version_id, 
+                                slice_offset, 
+                                slice_size, 
+                                modified_since, 
+                                unmodified_since)
+
+    def _get_contents(self, 
+                      version_id, 
+                      slice_offset, 
+                      slice_size, 
+                      modified_since, 
+                      unmodified_since):
+        http_connection, response = self._open_contents(version_id, 
+                                                         slice_offset,
+                                                         slice_size,
+                                                         modified_since,
+                                                         unmodified_since)
+
+        content_length = _compute_content_length(response)
+        if content_length is not None and \
+           compute_read_size(content_length, _read_buffer_size) == \
+           content_length:
+            # with the length known, the body is read into one allocation
+            data = response.read()
             http_connection.close()
-            if instance.status == NOT_MODIFIED and modified_since is not None:
-                raise KeyUnmodified()
-            if instance.status == PRECONDITION_FAILED and \
-                unmodified_since is not None:
-                raise KeyModified()
-            raise
+            return data
             
         body_list = list()
         while True:
+            http_connection.check_deadline()
             data = response.read(_read_buffer_size)
             if len(data) == 0:
                 break
@@ -393,6 +727,148 @@ class Key(object):
 
         return b"".join(body_list)
 
+    @with_deadline
+    def get_contents_into(self, 
+                          buffer, 
+                          version_id=None,
+                          slice_offset=None,
+                          slice_size=None,
+                          modified_since=None, 
+                          unmodified_since=None):
+        """
+        buffer
+            a writable object that supports the buffer protocol, such as a
+            bytearray or memoryview, large enough to hold the contents
+
+        version_id, slice_offset, slice_size, modified_since, unmodified_since
+            as for get_contents_as_string
+
+        retrieve the contents from nimbus.io straight into the buffer, 
+        without intermediate copies. 
+
+        return the number of bytes retrieved
+
+        raise ValueError if the contents do not fit in the buffer
+        """
+        if self._bucket is None:
+            raise ValueError("No bucket")
+        if self._name is None:
+            raise ValueError("No name")
+        if modified_since is not None and unmodified_since is not None:
+            raise ValueError(
+                "Can't specify both modified_since and unmodified_since")
+
+        view = memoryview(buffer)
+        if view.readonly:
+            raise TypeError("buffer is read-only")
+        if view.ndim != 1 or view.itemsize != 1:
+            view = view.cast("B")
+
+        http_connection, response = self._open_contents(version_id, 
+                                                         slice_offset,
+                                                         slice_size,
+                                                         modified_since,
+                                                         unmodified_since)
+        try:
+            content_length = _compute_content_length(response)
+            if content_length is not None and content_length > len(view):
+                raise ValueError(
+                    "{0} bytes will not fit in a buffer of {1}".format(
+                        content_length, len(view)
+                    )
+                )
+
+            bytes_read = _read_into(http_connection, response, view)
+            if bytes_read == len(view) and content_length is None and \
+               len(response.read(1)) > 0:
+                raise ValueError(
+                    "contents will not fit in a buffer of {0}".format(
+                        len(view)
+                    )
+                )
+        finally:
+            http_connection.close()
+
+        return bytes_read
+
+    @with_deadline
+    def get_contents_as_bytearray(self, 
+                                  version_id=None,
+                                  slice_offset=None,
+                                  slice_size=None,
+                                  modified_since=None, 
+                                  unmodified_since=None):
+        """
+        arguments as for get_contents_as_string
+
+        retrieve the contents from nimbus.io into a bytearray, allocated 
+        once at the size given by Content-Length, and return it.
+        """
+        if self._bucket is None:
+            raise ValueError("No bucket")
+        if self._name is None:
+            raise ValueError("No name")
+        if modified_since is not None and unmodified_since is not None:
+            raise ValueError(
+                "Can't specify both modified_since and unmodified_since")
+
+        http_connection, response = self._open_contents(version_id, 
+                                                         slice_offset,
+                                                         slice_size,
+                                                         modified_since,
+                                                         unmodified_since)
+        try:
+            content_length = _compute_content_length(response)
+            if content_length is None:
+                # no way to know the size in advance, so let it grow
+                result = bytearray()
+                while True:
+                    http_connection.check_deadline()
+                    data = response.read(_read_buffer_size)
+                    if len(data) == 0:
+                        break
+                    result.extend(data)
+            else:
+                result = bytearray(content_length)
+                bytes_read = _read_into(http_connection,
+                                        response,
+                                        memoryview(result))
+                if bytes_read != content_length:
+                    raise IOError("expected {0} bytes, read {1}".format(
+                        content_length, bytes_read
+                    ))
+        finally:
+            http_connection.close()
+
+        return result
+
+    def open(self, version_id=None, readahead=_default_readahead):
+        """
+        version_id
+            the identifier of a specific version to read
+
+            None means the most recent version
+
+        readahead
+            the size of the buffer in front of the key. Each read that the
+            buffer cannot satisfy is a ranged GET for at least this many
+            bytes. 0 means no buffer.
+
+        return a seekable, read-only binary file object over the contents,
+        for use with tarfile, zipfile and the like, without retrieving the
+        whole key: an io.BufferedReader, or a KeyReader if readahead is 0.
+        """
+        if self._bucket is None:
+            raise ValueError("No bucket")
+        if self._name is None:
+            raise ValueError("No name")
+
+        reader = KeyReader(self, version_id)
+        if readahead == 0:
+            return reader
+        return io.BufferedReader(reader, buffer_size=readahead)
+
+    @with_deadline
     def get_contents_to_file(self, 
                              file_object, 
                              cb=None, 
@@ -403,7 +879,9 @@ class Key(object):
                              modified_since=None, 
                              unmodified_since=None,
                              resumable=False,
-                             res_download_handler=None):
+                             res_download_handler=None,
+                             concurrency=1,
+                             part_size=_default_download_part_size):
         """
         file_object
             Python file-like object, must support write()
@@ -450,10 +928,21 @@ class Key(object):
             True means append to an existing file if there is one
 
         res_download_handler
-            included for boto compatibility. We have a 
-            ResumeableDownloadHandler object, but actually if you put
-            anything besides None in this argument, it has the same effect
-            as setting resumable to True.
+            a ResumableDownloadHandler, which writes the contents from the
+            start of the file, retries from the last byte written when the
+            connection fails, and records its progress in its tracker file
+            so a later call can resume. The file must support seek(), 
+            tell() and truncate().
+
+        concurrency
+            if greater than 1, and resumable is False, fetch the contents as
+            byte ranges of part_size, up to concurrency at a time, and write 
+            each range at its place in the file. The file must support 
+            seek(), tell() and truncate(). A range that fails is retried, one
+            at a time, after the others have finished.
+
+        part_size
+            the size of each range fetched when concurrency is greater than 1
 
         retrieve the contents from nimbus.io to a file
         """
@@ -465,11 +954,23 @@ class Key(object):
             raise ValueError(
                 "Can't specify both modified_since and unmodified_since")
 
-        kwargs = {
-            "version_identifier" : version_id,
-        }
+        if cb is None:
+            reporter = NullCallbackWrapper()
+        else:
+            reporter = RetrieveCallbackWrapper(self.size, cb, cb_count) 
 
-        if resumable == True or res_download_handler is not None:
+        if res_download_handler is not None:
+            res_download_handler.get_file(self, 
+                                          file_object, 
+                                          reporter, 
+                                          version_id=version_id,
+                                          slice_offset=slice_offset,
+                                          slice_size=slice_size,
+                                          modified_since=modified_since,
+                                          unmodified_since=unmodified_since)
+            return
+
+        if resumable:
             file_object.seek(0, os.SEEK_END)
             current_file_size = file_object.tell()
             if slice_size is not None:
@@ -480,47 +981,36 @@ class Key(object):
             else:
                 slice_offset = current_file_size
 
-        headers = {}
-        _convert_slice_to_range_header(headers, slice_offset, slice_size)
-        expected_status = (PARTIAL_CONTENT if "Range" in headers else OK)
-
-        if modified_since is not None:
-            timestamp = datetime.utcfromtimestamp(modified_since)
-            headers["If-Modified-Since"] = http_timestamp_str(timestamp)
-        if unmodified_since is not None:
-            timestamp = datetime.utcfromtimestamp(unmodified_since)
-            headers["If-Unmodified-Since"] = http_timestamp_str(timestamp)
-
-        method = "GET"
-        uri = compute_uri("data", self._name, **kwargs)
-
-        http_connection = self._bucket.create_http_connection()
-
-        self._log.info("requesting GET {0} {1}".format(uri, headers))
-        try:
-            response = http_connection.request(method, 
-                                               uri, 
-                                               body=None, 
-                                               headers=headers,
-                                               expected_status=expected_status)
-        except LumberyardHTTPError:
-            instance = sys.exc_info()[1]
-            http_connection.close()
-            if instance.status == NOT_MODIFIED and modified_since is not None:
-                raise KeyUnmodified()
-            if instance.status == PRECONDITION_FAILED and \
-                unmodified_since is not None:
-                raise KeyModified()
-            raise
+        if concurrency > 1 and not resumable:
+            download = ParallelDownload(self, 
+                                        file_object, 
+                                        reporter,
+                                        part_size,
+                                        concurrency)
+            try:
+                download.run(version_id, 
+                             slice_offset, 
+                             slice_size, 
+                             modified_since, 
+                             unmodified_since)
+            except LumberyardHTTPError:
+                instance = sys.exc_info()[1]
+                # the key was written over after the first range
+                if instance.status == PRECONDITION_FAILED:
+                    raise KeyModified()
+                raise
+            return
 
-        if cb is None:
-            reporter = NullCallbackWrapper()
-        else:
-            reporter = RetrieveCallbackWrapper(self.size, cb, cb_count) 
+        http_connection, response = self._open_contents(version_id, 
+                                                         slice_offset,
+                                                         slice_size,
+                                                         modified_since,
+                                                         unmodified_since)
         
         self._log.info("reading response")
         reporter.start()
         while True:
+            http_connection.check_deadline()
             data = response.read(_read_buffer_size)
             bytes_read = len(data)
             self._log.debug("read {0} bytes".format(bytes_read))
@@ -531,6 +1021,7 @@ class Key(object):
         reporter.finish()
         http_connection.close()
 
+    @with_deadline
     def delete(self, version_id=None):
         """
         delete this key from the nimbus.io collection
@@ -573,6 +1064,7 @@ class Key(object):
         """
         self._metadata.update(meta_dict)
 
+    @with_deadline
     def get_metadata(self, meta_key):
         """
         return the meta_value associated with the meta_key
@@ -584,13 +1076,25 @@ class Key(object):
         if meta_key in self._metadata:
             return self._metadata[meta_key]
 
-        method = "GET"
-
         if self._bucket is None:
             raise ValueError("No bucket")
         if self._name is None:
             raise ValueError("No name")
 
+        meta_dict = self._share_call("get_metadata", self._get_meta_dict)
+        if meta_dict is None:
+            return None
+
+        self.update_metadata(meta_dict)
+
+        return self._metadata.get(meta_key)
+
+    def _get_meta_dict(self):
+        """
+        return the dict of all meta items, None if the key does not exist
+        """
+        method = "GET"
+
         http_connection = self._bucket.create_http_connection()
 
         kwargs = {
@@ -617,7 +1121,5 @@ class Key(object):
 
         http_connection.close()
 
-        self.update_metadata(json.loads(data.decode("utf-8")))
-
-        return self._metadata.get(meta_key)
+        return json.loads(data.decode("utf-8"))
 
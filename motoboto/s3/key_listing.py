@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+key_listing.py
+
+class KeyListing
+
+a compact record of one key in a bucket listing
+"""
+from motoboto.s3.util import parse_http_timestamp
+
+class KeyListing(object):
+    """
+    A compact record of one entry in a bucket listing.
+
+    get_all_keys(slim=True) and get_all_versions(slim=True) return these
+    instead of full Key objects. They hold only the bucket, key name,
+    version_id and the raw timestamp string from the listing, so a listing
+    of millions of keys takes a fraction of the memory.
+
+    Call to_key() to get a full Key for the entry.
+    """
+    __slots__ = ("bucket", "name", "version_id", "timestamp", )
+
+    def __init__(self, bucket, name, version_id, timestamp=None):
+        self.bucket = bucket
+        self.name = name
+        self.version_id = version_id
+        self.timestamp = timestamp
+
+    @property
+    def key(self):
+        return self.name
+
+    @property
+    def etag(self):
+        return self.version_id
+
+    @property
+    def last_modified(self):
+        """
+        the timestamp as a datetime, parsed each time it is asked for
+        """
+        if self.timestamp is None:
+            return None
+        return parse_http_timestamp(self.timestamp)
+
+    def to_key(self):
+        """
+        return a full Key object for this entry
+        """
+        return self.bucket._key_class(bucket=self.bucket,
+                                      name=self.name,
+                                      version_id=self.version_id,
+                                      last_modified=self.last_modified)
+
+    def __str__(self):
+        return self.name
+
+    def __repr__(self):
+        return "KeyListing({0!r}, {1!r})".format(self.name, self.version_id)
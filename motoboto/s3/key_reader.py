@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+key_reader.py
+
+class KeyReader
+
+a seekable, read-only file object over the contents of a key
+"""
+try:
+    from httplib import REQUESTED_RANGE_NOT_SATISFIABLE
+except ImportError:
+    from http.client import REQUESTED_RANGE_NOT_SATISFIABLE
+import calendar
+import io
+import logging
+import sys
+
+from lumberyard.http_connection import LumberyardHTTPError
+
+from motoboto.deadline import compute_read_size
+from motoboto.s3.util import parse_content_range_size, \
+        parse_http_timestamp
+
+_read_buffer_size = 64 * 1024
+
+class KeyReader(io.RawIOBase):
+    """
+    A raw, seekable, read-only file over the contents of a key.
+
+    Every readinto() is one ranged GET for the bytes asked for, so wrap it
+    in an io.BufferedReader (as Key.open does) to read ahead.
+
+    When version_id is None, every GET after the first is made with
+    If-Unmodified-Since set to the first response's Last-Modified, so if
+    the key is written over while it is open, reads raise KeyModified
+    instead of mixing two versions.
+    """
+    def __init__(self, key, version_id=None):
+        io.RawIOBase.__init__(self)
+        self._log = logging.getLogger("KeyReader({0})".format(key.name))
+        self._key = key
+        self._version_id = version_id
+        self._unmodified_since = None
+        self._position = 0
+        self._size = None
+
+    @property
+    def name(self):
+        return self._key.name
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def _open_range(self, offset, size):
+        """
+        send a GET for size bytes at offset, or to the end if size is None
+        return (http_connection, response), or None past the end of the key
+        """
+        try:
+            http_connection, response = self._key._open_contents(
+                self._version_id, offset, size, None, self._unmodified_since
+            )
+        except LumberyardHTTPError:
+            instance = sys.exc_info()[1]
+            if instance.status == REQUESTED_RANGE_NOT_SATISFIABLE:
+                if self._size is None and offset == 0:
+                    self._size = 0
+                return None
+            raise
+
+        self._size = parse_content_range_size(response)
+        if self._version_id is None and self._unmodified_since is None:
+            last_modified = response.getheader("Last-Modified")
+            if last_modified is not None:
+                self._unmodified_since = calendar.timegm(
+                    parse_http_timestamp(last_modified).timetuple()
+                )
+        return http_connection, response
+
+    def _compute_size(self):
+        if self._size is None:
+            opened = self._open_range(0, 1)
+            if opened is not None:
+                http_connection, response = opened
+                response.read()
+                http_connection.close()
+        return self._size
+
+    @property
+    def size(self):
+        """
+        the size of the key's contents
+        """
+        return self._compute_size()
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        self._checkClosed()
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self._compute_size() + offset
+        else:
+            raise ValueError("invalid whence ({0!r})".format(whence))
+        if position < 0:
+            raise ValueError("negative seek position {0}".format(position))
+        self._position = position
+        return self._position
+
+    def tell(self):
+        self._checkClosed()
+        return self._position
+
+    def _read_range_into(self, view):
+        """
+        fill view with the bytes from the current position,
+        return the number of bytes read
+        """
+        if len(view) == 0:
+            return 0
+        if self._size is not None and self._position >= self._size:
+            return 0
+
+        opened = self._open_range(self._position, len(view))
+        if opened is None:
+            return 0
+        http_connection, response = opened
+
+        bytes_read = 0
+        try:
+            while bytes_read < len(view):
+                http_connection.check_deadline()
+                read_size = compute_read_size(len(view) - bytes_read,
+                                              _read_buffer_size)
+                chunk_size = response.readinto(
+                    view[bytes_read:bytes_read+read_size]
+                )
+                if chunk_size == 0:
+                    break
+                bytes_read += chunk_size
+        finally:
+            http_connection.close()
+
+        self._position += bytes_read
+        return bytes_read
+
+    def readinto(self, buffer):
+        self._checkClosed()
+        view = memoryview(buffer)
+        if view.ndim != 1 or view.itemsize != 1:
+            view = view.cast("B")
+        return self._read_range_into(view)
+
+    def readall(self):
+        """
+        read to the end of the key in one GET
+        """
+        self._checkClosed()
+        if self._size is not None and self._position >= self._size:
+            return b""
+
+        opened = self._open_range(self._position, None)
+        if opened is None:
+            return b""
+        http_connection, response = opened
+        try:
+            if compute_read_size(None, _read_buffer_size) is None:
+                data = response.read()
+            else:
+                data_list = list()
+                while True:
+                    http_connection.check_deadline()
+                    data = response.read(_read_buffer_size)
+                    if len(data) == 0:
+                        break
+                    data_list.append(data)
+                data = b"".join(data_list)
+        finally:
+            http_connection.close()
+
+        self._position += len(data)
+        return data
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+listing_decoder.py
+
+class ListingDecoder
+
+decode a JSON listing page incrementally, as it is read from the response
+"""
+import codecs
+import json
+
+_default_chunk_size = 64 * 1024
+_whitespace = " \t\n\r"
+_number_start = "-0123456789"
+_number_chars = "0123456789.eE+-"
+
+class ListingDecoder(object):
+    """
+    Decode a JSON object such as {"key_data": [...], "truncated": false}
+    from a response, one chunk at a time.
+
+    Iterating yields (list name, entry) for every entry of the top level
+    arrays named in list_names, as soon as the entry has arrived, so only
+    the entry being decoded and one chunk of the response are held in
+    memory. The other top level values are stored in the dict `values`,
+    which is complete when iteration finishes. `streamed` is the set of
+    list names that were found.
+    """
+    def __init__(self, response, list_names, chunk_size=_default_chunk_size):
+        self._response = response
+        self._list_names = frozenset(list_names)
+        self._chunk_size = chunk_size
+        self._json_decoder = json.JSONDecoder()
+        self._text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._position = 0
+        self._eof = False
+        self.values = dict()
+        self.streamed = set()
+
+    def _fill(self):
+        """
+        append the next chunk of the response to the buffer,
+        return False at the end of the response
+        """
+        if self._eof:
+            return False
+        data = self._response.read(self._chunk_size)
+        if not data:
+            self._eof = True
+            text = self._text_decoder.decode(b"", final=True)
+        else:
+            text = self._text_decoder.decode(data)
+        self._buffer = self._buffer[self._position:] + text
+        self._position = 0
+        return len(text) > 0 or not self._eof
+
+    def _next_char(self):
+        """
+        skip whitespace and return the next character, without consuming it
+        """
+        while True:
+            while self._position < len(self._buffer) and \
+                  self._buffer[self._position] in _whitespace:
+                self._position += 1
+            if self._position < len(self._buffer):
+                return self._buffer[self._position]
+            if not self._fill():
+                raise ValueError("JSON listing ends unexpectedly")
+
+    def _expect(self, chars):
+        char = self._next_char()
+        if char not in chars:
+            raise ValueError("expected one of {0!r} in JSON listing, "
+                             "found {1!r}".format(chars, char))
+        self._position += 1
+        return char
+
+    def _decode_value(self):
+        """
+        decode the next complete JSON value, reading more of the response
+        until it has all arrived
+        """
+        first_char = self._next_char()
+        while True:
+            try:
+                value, end = self._json_decoder.raw_decode(self._buffer,
+                                                           self._position)
+            except ValueError:
+                if not self._fill():
+                    raise
+                continue
+            # a number that reaches the end of the buffer, or stops short 
+            # of a number character, may continue in the next chunk
+            if first_char in _number_start and \
+               (end == len(self._buffer) or 
+                self._buffer[end] in _number_chars) and \
+               self._fill():
+                continue
+            self._position = end
+            return value
+
+    def __iter__(self):
+        self._expect("{")
+        if self._next_char() == "}":
+            self._position += 1
+            return
+
+        while True:
+            name = self._decode_value()
+            self._expect(":")
+            if name in self._list_names and self._next_char() == "[":
+                self._position += 1
+                self.streamed.add(name)
+                if self._next_char() == "]":
+                    self._position += 1
+                else:
+                    while True:
+                        yield name, self._decode_value()
+                        if self._expect(",]") == "]":
+                            break
+            else:
+                self.values[name] = self._decode_value()
+
+            if self._expect(",}") == "}":
+                break
+
+        # read to the end of the response, so the connection can be reused
+        while self._fill():
+            pass
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+multidelete.py
+
+class Deleted
+class Error
+class MultiDelete
+
+delete many keys at once, reporting the result for each
+"""
+import sys
+import threading
+import time
+
+from lumberyard.http_connection import LumberyardHTTPError
+
+from motoboto.s3.fan_out import FanOut, compute_key_and_version
+
+_default_delete_concurrency = 8
+
+class Deleted(object):
+    """
+    A key (or version of a key) that was deleted
+    """
+    def __init__(self, key=None, version_id=None):
+        self.key = key
+        self.version_id = version_id
+
+    def __repr__(self):
+        if self.version_id is None:
+            return "<Deleted: {0}>".format(self.key)
+        return "<Deleted: {0}.{1}>".format(self.key, self.version_id)
+
+class Error(object):
+    """
+    A key (or version of a key) that could not be deleted
+
+    code
+        the HTTP status of the failed DELETE, or the name of the exception
+        if there was no response
+
+    error
+        the exception raised by the DELETE
+    """
+    def __init__(self, key=None, version_id=None, error=None):
+        self.key = key
+        self.version_id = version_id
+        self.error = error
+        if isinstance(error, LumberyardHTTPError):
+            self.code = error.status
+        else:
+            self.code = error.__class__.__name__
+        self.message = str(error)
+
+    def __repr__(self):
+        if self.version_id is None:
+            return "<Error: {0} ({1})>".format(self.key, self.code)
+        return "<Error: {0}.{1} ({2})>".format(self.key,
+                                               self.version_id,
+                                               self.code)
+
+class _RateLimiter(object):
+    """
+    space out calls to wait() so there are at most max_rate a second
+    """
+    def __init__(self, max_rate):
+        self._lock = threading.Lock()
+        self._interval = 1.0 / max_rate
+        self._next_time = time.time()
+
+    def wait(self):
+        with self._lock:
+            now = time.time()
+            start_time = max(now, self._next_time)
+            self._next_time = start_time + self._interval
+        if start_time > now:
+            time.sleep(start_time - now)
+
+class MultiDelete(FanOut):
+    """
+    Delete keys from a bucket with up to concurrency DELETEs in flight,
+    each on a connection from the bucket's pool.
+
+    Iterating yields a Deleted or an Error for each key as its DELETE
+    finishes, in that order, not the order of keys. keys is read as the
+    DELETEs go, so it can be a generator over millions of names.
+
+    max_rate
+        if not None, the most DELETEs to start a second
+    """
+    def __init__(self,
+                 bucket,
+                 keys,
+                 concurrency=_default_delete_concurrency,
+                 max_rate=None):
+        FanOut.__init__(self, keys, concurrency)
+        self._bucket = bucket
+        self._rate_limiter = (None if max_rate is None
+                              else _RateLimiter(max_rate))
+
+    def _process(self, item):
+        key_name, version_id = compute_key_and_version(item)
+        if self._rate_limiter is not None:
+            self._rate_limiter.wait()
+        key = self._bucket.get_key(key_name)
+        try:
+            key.delete(version_id=version_id)
+        except Exception:
+            instance = sys.exc_info()[1]
+            self._log.warning("unable to delete {0} {1}: {2}".format(
+                key_name, version_id, instance
+            ))
+            return Error(key_name, version_id, instance)
+        return Deleted(key_name, version_id)
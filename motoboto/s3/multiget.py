@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+multiget.py
+
+class MultiGet
+
+retrieve the contents of many keys at once
+"""
+import sys
+import threading
+import time
+
+from lumberyard.http_util import compute_uri
+
+from motoboto.s3.fan_out import FanOut, compute_key_and_version, \
+        _poll_interval
+from motoboto.s3.key import _compute_content_length
+
+_default_get_concurrency = 8
+_default_max_bytes_in_flight = 64 * 1024 * 1024
+
+class _ByteBudget(object):
+    """
+    hold the number of bytes reserved under max_bytes. A reservation that
+    would go over waits for bytes to be released, unless nothing else is
+    reserved, so one object larger than the budget still gets through.
+    """
+    def __init__(self, max_bytes, stopped):
+        self._max_bytes = max_bytes
+        self._stopped = stopped
+        self._condition = threading.Condition()
+        self._bytes_reserved = 0
+
+    def _is_full(self, size):
+        """
+        call with the condition held
+        """
+        return self._bytes_reserved > 0 and \
+               self._bytes_reserved + size > self._max_bytes
+
+    def try_reserve(self, size):
+        """
+        reserve size bytes if there is room now, return True if we did
+        """
+        with self._condition:
+            if self._is_full(size):
+                return False
+            self._bytes_reserved += size
+        return True
+
+    def wait_for_room(self, size):
+        """
+        wait until there is room for size bytes, without reserving them,
+        return False if we were stopped while waiting
+        """
+        with self._condition:
+            while self._is_full(size):
+                if self._stopped.is_set():
+                    return False
+                self._condition.wait(_poll_interval)
+        return True
+
+    def add(self, size):
+        """
+        reserve size bytes without waiting
+        """
+        with self._condition:
+            self._bytes_reserved += size
+
+    def release(self, size):
+        with self._condition:
+            self._bytes_reserved -= size
+            self._condition.notify_all()
+
+class _Stopped(Exception):
+    pass
+
+class _ReadFailed(Exception):
+    """
+    the GET was answered, but reading its body failed with error
+    """
+    def __init__(self, error):
+        Exception.__init__(self, str(error))
+        self.error = error
+
+class MultiGet(FanOut):
+    """
+    Retrieve the contents of keys with up to concurrency GETs in flight,
+    each on a connection from the bucket's pool.
+
+    Iterating yields (Key, contents) for each key as its GET finishes, in
+    that order, not the order of keys.
+
+    A GET is retried as the pool's RetryPolicy allows, and so is reading
+    its body when the connection drops partway, out of the same retry 
+    budget. Any other error, or one that persists, stops the iteration 
+    and is raised.
+
+    The contents fetched but not yet handed to the caller are kept under
+    max_bytes_in_flight. A GET whose response would go over the budget
+    is closed unread, and sent again once the caller has caught up, so 
+    no connection is held while we wait: the caller may need one.
+    """
+    def __init__(self,
+                 bucket,
+                 keys,
+                 concurrency=_default_get_concurrency,
+                 max_bytes_in_flight=_default_max_bytes_in_flight):
+        FanOut.__init__(self, keys, concurrency)
+        self._bucket = bucket
+        self._byte_budget = _ByteBudget(max_bytes_in_flight, self._stopped)
+
+    def _open_contents(self, key):
+        """
+        start the GET of the key, with room for its contents reserved:
+        return (http_connection, response, reserved_size), where 
+        reserved_size is None if the length of the contents is not known
+        """
+        while True:
+            http_connection, response = key._open_contents(
+                key.version_id, None, None, None, None
+            )
+            reserved_size = _compute_content_length(response)
+            if reserved_size is None or \
+               self._byte_budget.try_reserve(reserved_size):
+                return http_connection, response, reserved_size
+            # don't hold the connection while we wait: the caller may need
+            # it to catch up
+            http_connection.close()
+            if not self._byte_budget.wait_for_room(reserved_size):
+                raise _Stopped()
+
+    def _get_contents(self, key):
+        """
+        return the contents of the key, and the number of bytes reserved
+        for them
+        """
+        http_connection, response, reserved_size = self._open_contents(key)
+        try:
+            data = response.read()
+        except Exception:
+            if reserved_size is not None:
+                self._byte_budget.release(reserved_size)
+            raise _ReadFailed(sys.exc_info()[1])
+        finally:
+            http_connection.close()
+
+        if reserved_size is None:
+            # we learn the size too late to wait, but it still counts
+            reserved_size = len(data)
+            self._byte_budget.add(reserved_size)
+        return data, reserved_size
+
+    def _process(self, item):
+        key_name, version_id = compute_key_and_version(item)
+        key = self._bucket.get_key(key_name, version_id=version_id)
+        # the pool retries the GET itself; we retry reading the body
+        retry_policy = self._bucket.retry_policy
+        uri = compute_uri("data", key_name)
+        attempt = 0
+        while True:
+            try:
+                data, reserved_size = self._get_contents(key)
+            except _Stopped:
+                return None
+            except _ReadFailed:
+                error = sys.exc_info()[1].error
+                delay = retry_policy.compute_retry_delay("GET", 
+                                                         uri, 
+                                                         error, 
+                                                         attempt)
+                if delay is None or self._stopped.is_set():
+                    raise error
+                attempt += 1
+                self._log.warning("reading {0} failed, retry {1} in "
+                                  "{2:.3f} seconds: {3}".format(key_name,
+                                                                attempt,
+                                                                delay,
+                                                                error))
+                time.sleep(delay)
+                continue
+            return key, data, reserved_size
+
+    def _result_taken(self, result):
+        if result is not None:
+            self._byte_budget.release(result[2])
+
+    def __iter__(self):
+        for result in FanOut.__iter__(self):
+            if result is not None:
+                key, data, _ = result
+                yield key, data
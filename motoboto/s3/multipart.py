@@ -3,22 +3,35 @@
 multipart.py
 
 """
+import io
+import json
 import logging
+import os
+import sys
+import threading
 import uuid
 
 from lumberyard.http_util import compute_uri
 
+from motoboto.deadline import propagate_deadline, with_deadline
+from motoboto.file_body import FileBody, compute_file_body
 from motoboto.s3.util import parse_http_timestamp
 
 class CompleteMultiPartUpload(object):
     """
     Represents a completed MultiPart Upload.
     """
-    pass
+    def __init__(self, key_name=None, version_id=None):
+        self.key_name = key_name
+        self.version_id = version_id
 
 class MultiPartUpload(object):
     """
     Represents a MultiPart Upload operation.
+
+    The methods that make requests also take total_timeout, 
+    connect_timeout and first_byte_timeout, as 
+    motoboto.deadline.deadline_scope does.
     """
 
     def __init__(self, bucket=None, **kwargs):
@@ -52,10 +65,14 @@ class MultiPartUpload(object):
         else:
             self.delete_timestamp = None
 
+        self.is_truncated = False
+        self.next_part_number_marker = None
+
     @property
     def id(self):
         return self._conjoined_identifier
 
+    @with_deadline
     def cancel_upload(self):
         """
         Cancels a MultiPart Upload operation. The storage consumed by any 
@@ -78,6 +95,7 @@ class MultiPartUpload(object):
 
         http_connection.close()
 
+    @with_deadline
     def complete_upload(self):
         """
         Complete the MultiPart Upload operation. 
@@ -98,16 +116,82 @@ class MultiPartUpload(object):
         self._log.info("posting {0}".format(uri))
         response = http_connection.request(method, uri)
         
-        response.read()
+        data = response.read()
 
         http_connection.close()
 
+        result_dict = json.loads(data.decode("utf-8")) if data else dict()
+        version_id = result_dict.get("version_identifier")
+        if version_id is None:
+            version_id = self._find_latest_version()
+        return CompleteMultiPartUpload(
+            key_name=self.key_name,
+            version_id=version_id
+        )
+
+    def _find_latest_version(self):
+        """
+        nimbus.io does not tell us the version a finished upload made: 
+        return the newest version of our key from the version listing.
 
+        If another client archives the key between our finish and the
+        listing, this is the version it made.
+        """
+        version_id = None
+        for version in self._bucket.list_versions(prefix=self.key_name, 
+                                                  slim=True):
+            # the versions of keys that only start with our name come after 
+            # ours
+            if version.name != self.key_name:
+                break
+            version_id = version.version_id
+        return version_id
+
+    def __iter__(self):
+        return part_lister(self)
+
+    @with_deadline
     def get_all_parts(self, max_parts=None, part_number_marker=None):
         """
-        Return the uploaded parts of this MultiPart Upload.
+        max_parts
+            the most parts to return, None for the server's limit
+
+        part_number_marker
+            return only the parts numbered after this one
+
+        Return the uploaded parts of this MultiPart Upload, in part number
+        order. Sets is_truncated, and next_part_number_marker for the next
+        call when there are more parts.
         """
+        kwargs = {
+            "conjoined_identifier"  : self._conjoined_identifier,
+        }
+        if max_parts is not None:
+            kwargs["max_parts"] = max_parts
+        if part_number_marker is not None:
+            kwargs["part_number_marker"] = part_number_marker
+
+        method = "GET"
+        uri = compute_uri("conjoined", self.key_name, **kwargs)
+
+        http_connection = self._bucket.create_http_connection()
+
+        self._log.info("requesting {0}".format(uri))
+        response = http_connection.request(method, uri)
+        
+        data = response.read()
 
+        http_connection.close()
+
+        result_dict = json.loads(data.decode("utf-8"))
+        parts = [Part(self._bucket, **part_dict) 
+                 for part_dict in result_dict["part_list"]]
+        self.is_truncated = result_dict.get("truncated", False)
+        self.next_part_number_marker = \
+            (parts[-1].part_number if parts else part_number_marker)
+        return parts
+
+    @with_deadline
     def upload_part_from_file(
         self, fp, part_num, replace=True, cb=None, num_cb=10
     ):
@@ -143,25 +227,310 @@ class MultiPartUpload(object):
 class Part(object):
     """
     Represents a single part in a MultiPart upload. Attributes include:
-    """
-    def __init__(self, bucket=None):
-        """
-        part_number
-            The integer part number
 
-        last_modified
-            The last modified date of this part
+    part_number
+        The integer part number
+
+    last_modified
+        The last modified date of this part
+
+    etag
+        The version identifier of this part (nimbus.io has no MD5 hash)
+        
+    size
+        The size, in bytes, of this part
+    """
+    def __init__(self, bucket=None, **kwargs):
+        self.bucket = bucket
+        self.part_number = int(kwargs["conjoined_part"])
+        self.size = kwargs.get("size")
+        self.etag = kwargs.get("version_identifier")
+        if kwargs.get("timestamp"):
+            self.last_modified = parse_http_timestamp(kwargs["timestamp"])
+        else:
+            self.last_modified = None
 
-        etag
-            The MD5 hash of this part
-            
-        size
-            The size, in bytes, of this part
-        """        
+    def __repr__(self):
+        return "<Part {0}>".format(self.part_number)
 
 def part_lister(mpupload, part_number_marker=None):
     """
     A generator function for listing parts of a multipart upload.
     """
+    more_results = True
+    while more_results:
+        parts = mpupload.get_all_parts(None, part_number_marker)
+        for part in parts:
+            yield part
+        part_number_marker = mpupload.next_part_number_marker
+        more_results = mpupload.is_truncated and len(parts) > 0
+
+def _compute_part_size(size, part_size, part_num):
+    """
+    return the size of part part_num (counting from 1) of a file of size
+    bytes uploaded in parts of part_size
+    """
+    return max(0, min(part_size, size - (part_num - 1) * part_size))
+
+class StreamReader(object):
+    """
+    A file-like read() over a file object or an iterable of byte strings,
+    whose length we do not know. read(size) returns size bytes unless the 
+    source has ended, however the source splits them up.
+    """
+    def __init__(self, source):
+        self._pending = b""
+        if hasattr(source, "read"):
+            self._read_source = source.read
+            self._iterator = None
+        else:
+            self._read_source = None
+            self._iterator = iter(source)
+        self._eof = False
 
+    def _next_chunk(self, size):
+        if self._read_source is not None:
+            return self._read_source(size)
+        return next(self._iterator, b"")
 
+    def unread(self, data):
+        """
+        put data back, to be read again before the rest of the source
+        """
+        self._pending = data + self._pending
+
+    def read(self, size):
+        pieces = list()
+        length = 0
+        if len(self._pending) > 0:
+            piece = self._pending[:size]
+            self._pending = self._pending[size:]
+            pieces.append(piece)
+            length += len(piece)
+        while length < size and not self._eof:
+            chunk = self._next_chunk(size - length)
+            if len(chunk) == 0:
+                self._eof = True
+                break
+            if len(chunk) > size - length:
+                self._pending = chunk[size - length:]
+                chunk = chunk[:size - length]
+            pieces.append(chunk)
+            length += len(chunk)
+        if len(pieces) == 1:
+            return bytes(pieces[0])
+        return b"".join(pieces)
+
+class _PartReader(object):
+    """
+    hand out the parts of a file, in order, to the upload threads,
+    skipping the parts numbered in skip_parts.
+
+    A part of a regular file is handed out as a FileBody, to be sent from
+    the file without reading it, otherwise it is read into memory.
+
+    If size is None, parts are read until the file ends.
+    """
+    def __init__(self, file_object, size, part_size, skip_parts=frozenset()):
+        self._lock = threading.Lock()
+        self._file_object = file_object
+        self._remaining = size
+        self._part_size = part_size
+        self._part_num = 0
+        self._skip_parts = skip_parts
+        self._file_body = None
+        if size is not None:
+            self._file_body = compute_file_body(file_object, size)
+        if self._file_body is not None:
+            self._offset = self._file_body.offset
+
+    def next_part(self):
+        """
+        return (part_num, data) for the next part, or None at the end.
+        data is bytes or a FileBody.
+        """
+        with self._lock:
+            if self._remaining is None:
+                data = self._file_object.read(self._part_size)
+                if len(data) == 0:
+                    return None
+                self._part_num += 1
+                return self._part_num, data
+
+            while self._remaining > 0 and \
+                  self._part_num + 1 in self._skip_parts:
+                skip_size = min(self._part_size, self._remaining)
+                self._skip(skip_size)
+                self._remaining -= skip_size
+                self._part_num += 1
+            if self._remaining == 0:
+                return None
+            read_size = min(self._part_size, self._remaining)
+            if self._file_body is not None:
+                data = FileBody(self._file_object, self._offset, read_size)
+                self._offset += read_size
+                self._remaining -= read_size
+                self._part_num += 1
+                return self._part_num, data
+            data = self._file_object.read(read_size)
+            if len(data) != read_size:
+                raise IOError("file ended {0} bytes early".format(
+                    self._remaining - len(data)
+                ))
+            self._remaining -= read_size
+            self._part_num += 1
+            return self._part_num, data
+
+    def _skip(self, skip_size):
+        if self._file_body is not None:
+            self._offset += skip_size
+        else:
+            self._file_object.seek(skip_size, os.SEEK_CUR)
+
+class ParallelUpload(object):
+    """
+    Upload size bytes of a file, from its current position, as a MultiPart
+    Upload with up to concurrency parts in flight at once.
+
+    Each thread reads its next part into memory and uploads it with 
+    upload_part_from_file, so at most concurrency * part_size bytes are 
+    held in memory. If any part fails, the upload is cancelled and the 
+    first error is raised. Parts of a regular file are sent straight from
+    the file instead, at their offsets, without moving its position.
+
+    If size is None, parts are read until the file ends, which need not 
+    support seek().
+
+    cb
+        if not None, called as cb(bytes uploaded, size) as each part finishes
+
+    multipart_upload
+        if not None, an upload already in progress, which is continued 
+        rather than started. It is not cancelled when a part fails, so it 
+        can be continued again.
+
+    completed_parts
+        the numbers of the parts of multipart_upload already uploaded, 
+        which are skipped over in the file
+
+    part_done
+        if not None, called as part_done(part_num) as each part finishes
+    """
+    def __init__(self, 
+                 bucket, 
+                 key_name, 
+                 file_object, 
+                 size, 
+                 part_size, 
+                 concurrency, 
+                 cb=None,
+                 multipart_upload=None,
+                 completed_parts=frozenset(),
+                 part_done=None):
+        self._log = logging.getLogger("ParallelUpload({0})".format(key_name))
+        self._bucket = bucket
+        self._key_name = key_name
+        self._part_reader = _PartReader(file_object, 
+                                        size, 
+                                        part_size, 
+                                        frozenset(completed_parts))
+        self._size = size
+        if size is None:
+            self._part_count = None
+            self._concurrency = max(1, concurrency)
+        else:
+            self._part_count = max(1, (size + part_size - 1) // part_size)
+            self._concurrency = max(1, min(concurrency, 
+                                           self._part_count - 
+                                           len(completed_parts)))
+        self._cb = cb
+        self._multipart_upload = multipart_upload
+        self._part_done = part_done
+        self._lock = threading.Lock()
+        self._bytes_uploaded = sum([_compute_part_size(size, part_size, n) 
+                                    for n in completed_parts])
+        self._failed = threading.Event()
+        self._errors = list()
+
+    def _upload_parts(self, multipart_upload):
+        while not self._failed.is_set():
+            try:
+                part = self._part_reader.next_part()
+                if part is None:
+                    return
+                part_num, data = part
+                self._log.debug("uploading part {0} of {1}".format(
+                    part_num, self._part_count
+                ))
+                if isinstance(data, FileBody):
+                    key = self._bucket.get_key(self._key_name)
+                    key._send_contents(data, multipart_upload.id, part_num)
+                    part_size = data.size
+                else:
+                    multipart_upload.upload_part_from_file(io.BytesIO(data), 
+                                                           part_num)
+                    part_size = len(data)
+            except Exception:
+                instance = sys.exc_info()[1]
+                self._log.error("part upload failed: {0}".format(instance))
+                with self._lock:
+                    self._errors.append(instance)
+                self._failed.set()
+                return
+
+            with self._lock:
+                self._bytes_uploaded += part_size
+                if self._part_done is not None:
+                    self._part_done(part_num)
+                if self._cb is not None:
+                    self._cb(self._bytes_uploaded, self._size)
+
+    def _cancel(self, multipart_upload):
+        try:
+            multipart_upload.cancel_upload()
+        except Exception:
+            self._log.exception("unable to cancel upload {0}".format(
+                multipart_upload.id
+            ))
+
+    def run(self):
+        """
+        upload every part and return a CompleteMultiPartUpload
+        """
+        multipart_upload = self._multipart_upload
+        if multipart_upload is None:
+            multipart_upload = \
+                self._bucket.initiate_multipart_upload(self._key_name)
+        if self._size is None:
+            self._log.info("uploading a stream in parts, {0} at a time".format(
+                self._concurrency
+            ))
+        else:
+            self._log.info(
+                "uploading {0} bytes in {1} parts, {2} at a time".format(
+                    self._size, self._part_count, self._concurrency
+                )
+            )
+
+        threads = list()
+        upload_parts = propagate_deadline(self._upload_parts)
+        try:
+            for _ in range(self._concurrency):
+                thread = threading.Thread(target=upload_parts,
+                                          args=(multipart_upload, ),
+                                          name="upload-part")
+                thread.daemon = True
+                thread.start()
+                threads.append(thread)
+            for thread in threads:
+                thread.join()
+
+            if self._errors:
+                raise self._errors[0]
+
+            return multipart_upload.complete_upload()
+        except BaseException:
+            self._failed.set()
+            if self._multipart_upload is None:
+                self._cancel(multipart_upload)
+            raise
@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+"""
+parallel_download.py
+
+class ParallelDownload
+
+retrieve a key as byte ranges fetched by several threads at once
+"""
+try:
+    from httplib import IncompleteRead, REQUESTED_RANGE_NOT_SATISFIABLE
+except ImportError:
+    from http.client import IncompleteRead, REQUESTED_RANGE_NOT_SATISFIABLE
+import logging
+import os
+import sys
+import threading
+import time
+
+from lumberyard.http_connection import LumberyardHTTPError
+from lumberyard.http_util import compute_uri
+
+from motoboto.deadline import propagate_deadline
+from motoboto.s3.util import parse_content_range_size
+
+_read_buffer_size = 64 * 1024
+
+def _compute_fileno(file_object):
+    """
+    return the file descriptor for positional writes, or None if the file
+    has none, or this python has no os.pwrite
+    """
+    if not hasattr(os, "pwrite"):
+        return None
+    try:
+        return file_object.fileno()
+    except (AttributeError, IOError, OSError, ValueError, ):
+        return None
+
+class _RangeFailed(Exception):
+    """
+    the part of a range that has not been written when its fetch failed.
+    read_failed is True if the GET was answered and its body broke off.
+    """
+    def __init__(self, offset, size, error, read_failed):
+        Exception.__init__(self, str(error))
+        self.offset = offset
+        self.size = size
+        self.error = error
+        self.read_failed = read_failed
+
+class ParallelDownload(object):
+    """
+    Retrieve the contents of a key, or a slice of them, into a file as byte
+    ranges of part_size, with up to concurrency ranges in flight at once.
+
+    The first range tells us the size of the key. The file is extended to
+    its final size, then each range is written at its own place, starting
+    at the file's current position, with os.pwrite where the file has a
+    descriptor, or seek() and write() under a lock where it does not.
+
+    When version_id is None, every range after the first is fetched with
+    If-Unmodified-Since set to the first response's Last-Modified, so a key
+    written over during the download fails with PRECONDITION_FAILED rather
+    than mixing two versions.
+    """
+    def __init__(self, key, file_object, reporter, part_size, concurrency):
+        self._log = logging.getLogger("ParallelDownload({0})".format(
+            key.name
+        ))
+        self._key = key
+        self._file_object = file_object
+        self._reporter = reporter
+        self._part_size = part_size
+        self._concurrency = concurrency
+        self._lock = threading.Lock()
+        self._abandoned = threading.Event()
+        self._fileno = None
+        self._base = 0
+        self._start = 0
+        self._version_id = None
+        self._headers = dict()
+        self._ranges = list()
+        self._failed_ranges = list()
+
+    def _write_at(self, offset, data):
+        """
+        write data for the key offset at its place in the file
+        """
+        position = self._base + offset - self._start
+        if self._fileno is None:
+            with self._lock:
+                self._file_object.seek(position)
+                self._file_object.write(data)
+            return
+        view = memoryview(data)
+        while len(view) > 0:
+            bytes_written = os.pwrite(self._fileno, view, position)
+            view = view[bytes_written:]
+            position += bytes_written
+
+    def _read_range(self, http_connection, response, offset, size):
+        """
+        copy size bytes of the response into the file at offset,
+        raise _RangeFailed with whatever is left on error
+        """
+        try:
+            while size > 0 and not self._abandoned.is_set():
+                http_connection.check_deadline()
+                data = response.read(min(_read_buffer_size, size))
+                if len(data) == 0:
+                    # the connection dropped: worth retrying, unlike an
+                    # IOError from writing the file
+                    raise IncompleteRead(b"", size)
+                self._write_at(offset, data)
+                offset += len(data)
+                size -= len(data)
+                with self._lock:
+                    self._reporter.bytes_written(len(data))
+        except Exception:
+            raise _RangeFailed(offset, size, sys.exc_info()[1], True)
+
+    def _fetch_range(self, offset, size):
+        try:
+            http_connection, response = self._key._open_contents(
+                self._version_id, offset, size, None, None, self._headers
+            )
+        except Exception:
+            raise _RangeFailed(offset, size, sys.exc_info()[1], False)
+        try:
+            self._read_range(http_connection, response, offset, size)
+        finally:
+            http_connection.close()
+
+    def _next_range(self):
+        with self._lock:
+            if len(self._ranges) == 0 or self._abandoned.is_set():
+                return None
+            return self._ranges.pop(0)
+
+    def _fetch_ranges(self):
+        while True:
+            next_range = self._next_range()
+            if next_range is None:
+                return
+            try:
+                self._fetch_range(*next_range)
+            except _RangeFailed:
+                instance = sys.exc_info()[1]
+                self._log.warning("range at {0} failed: {1}".format(
+                    instance.offset, instance.error
+                ))
+                with self._lock:
+                    self._failed_ranges.append(instance)
+
+    def _retry_range(self, failed_range):
+        """
+        the pool has already retried the GET of the range. If its body
+        broke off, fetch the rest again as the pool's RetryPolicy allows.
+        """
+        retry_policy = self._key._bucket.retry_policy
+        uri = compute_uri("data", self._key.name)
+        attempt = 0
+        while failed_range.read_failed:
+            delay = retry_policy.compute_retry_delay("GET", 
+                                                     uri, 
+                                                     failed_range.error, 
+                                                     attempt)
+            if delay is None:
+                break
+            attempt += 1
+            self._log.info("retrying range at {0} ({1} bytes), "
+                           "attempt {2} in {3:.3f} seconds".format(
+                            failed_range.offset,
+                            failed_range.size,
+                            attempt,
+                            delay))
+            time.sleep(delay)
+            try:
+                self._fetch_range(failed_range.offset, failed_range.size)
+            except _RangeFailed:
+                failed_range = sys.exc_info()[1]
+            else:
+                return
+        raise failed_range.error
+
+    def _extend_file(self, size):
+        """
+        make the file at least size bytes long, so every range can be
+        written in place
+        """
+        self._file_object.seek(0, os.SEEK_END)
+        if self._file_object.tell() >= size:
+            return
+        if self._fileno is not None and hasattr(os, "posix_fallocate"):
+            self._file_object.flush()
+            try:
+                os.posix_fallocate(self._fileno, 0, size)
+                return
+            except OSError:
+                pass
+        self._file_object.truncate(size)
+
+    def run(self,
+            version_id,
+            slice_offset,
+            slice_size,
+            modified_since,
+            unmodified_since):
+        """
+        retrieve the contents, leaving the file positioned after them
+        """
+        self._version_id = version_id
+        self._start = (0 if slice_offset is None else slice_offset)
+        self._base = self._file_object.tell()
+
+        first_size = self._part_size
+        if slice_size is not None:
+            first_size = min(first_size, slice_size)
+        try:
+            http_connection, response = self._key._open_contents(
+                version_id, self._start, first_size,
+                modified_since, unmodified_since
+            )
+        except LumberyardHTTPError:
+            instance = sys.exc_info()[1]
+            # an empty key has no range to satisfy
+            if instance.status == REQUESTED_RANGE_NOT_SATISFIABLE and \
+               slice_offset is None:
+                self._reporter.start()
+                self._reporter.finish()
+                return
+            raise
+
+        try:
+            end = parse_content_range_size(response)
+            if slice_size is not None:
+                end = min(end, self._start + slice_size)
+            first_size = min(first_size, end - self._start)
+
+            self._fileno = _compute_fileno(self._file_object)
+            self._extend_file(self._base + end - self._start)
+            if self._fileno is not None:
+                self._file_object.flush()
+
+            last_modified = response.getheader("Last-Modified")
+            if version_id is None and last_modified is not None:
+                self._headers["If-Unmodified-Since"] = last_modified
+
+            self._ranges = [
+                (offset, min(self._part_size, end - offset), )
+                for offset in range(self._start + first_size,
+                                    end,
+                                    self._part_size)
+            ]
+            self._log.info("retrieving {0} bytes in {1} ranges".format(
+                end - self._start, len(self._ranges) + 1
+            ))
+
+            self._reporter.start()
+            threads = list()
+            fetch_ranges = propagate_deadline(self._fetch_ranges)
+            for _ in range(min(self._concurrency - 1, len(self._ranges))):
+                thread = threading.Thread(target=fetch_ranges,
+                                          name="retrieve-range")
+                thread.daemon = True
+                thread.start()
+                threads.append(thread)
+
+            try:
+                # the first range is read here, while the others are fetched
+                try:
+                    self._read_range(http_connection,
+                                     response,
+                                     self._start,
+                                     first_size)
+                except _RangeFailed:
+                    self._failed_ranges.append(sys.exc_info()[1])
+                finally:
+                    http_connection.close()
+                    http_connection = None
+
+                self._fetch_ranges()
+                for thread in threads:
+                    thread.join()
+            except BaseException:
+                self._abandoned.set()
+                raise
+
+            for failed_range in sorted(self._failed_ranges,
+                                       key=lambda r: r.offset):
+                self._retry_range(failed_range)
+            self._reporter.finish()
+        finally:
+            if http_connection is not None:
+                http_connection.close()
+
+        self._file_object.seek(self._base + end - self._start)
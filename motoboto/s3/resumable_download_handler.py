@@ -5,24 +5,364 @@ resumable_download_handler.py
 simulates the boto resumable download handler which originally came from
 google gsutil
 """
+try:
+    from httplib import IncompleteRead, REQUESTED_RANGE_NOT_SATISFIABLE
+except ImportError:
+    from http.client import IncompleteRead, REQUESTED_RANGE_NOT_SATISFIABLE
+import calendar
+import json
 import logging
+import os
+import sys
+import time
+
+from lumberyard.http_connection import LumberyardHTTPError
+
+from motoboto.retry import is_retryable_error
+from motoboto.s3.key import KeyModified
+from motoboto.s3.util import parse_http_timestamp
+
+_read_buffer_size = 64 * 1024
+
+# boto's default
+_default_num_retries = 6
+
+# the tracker file is brought up to date after this many bytes are written
+_tracker_save_interval = 1024 * 1024
+
+class _VersionChanged(Exception):
+    """
+    the version we were resuming is no longer the one we would retrieve
+    """
+    pass
 
 class ResumableDownloadHandler(object):
     """
     Handler for resumable downloads
 
-    This class exists for boto compatiblilty. 
+    Pass one to Key.get_contents_to_file as res_download_handler. The
+    contents are written from the start of the file, and the tracker file
+    records the key, the version being retrieved and the number of bytes
+    written so far.
+
+    A dropped connection is retried from the last byte written, waiting
+    longer after each attempt in a row that makes no progress, and giving
+    up after num_retries such attempts. Each retry is taken from the 
+    retry budget of the pool's RetryPolicy, and waits as it says.
+
+    A later download with the same tracker file resumes from where the last
+    one stopped, if the file still holds those bytes and the key still has
+    the same version. Otherwise the file is truncated and the download
+    starts again from the beginning, rather than mixing two versions.
     """
     def __init__(self, tracker_file_name=None, num_retries=None):
         """
         tracker_file_name
             path to tracker file
 
+            None means a download is only resumed within one call
+
         num_retries
             limit to the number of times we will retry
         """
         self._log = logging.getLogger("ResumeableDownloadHandler")
+        self.tracker_file_name = tracker_file_name
+        self.num_retries = (_default_num_retries if num_retries is None
+                            else num_retries)
+        self._tracker_info = None
+        if tracker_file_name is not None:
+            self._tracker_info = self._load_tracker_info()
+
+    def _load_tracker_info(self):
+        """
+        return the dict in the tracker file, or None if there is no usable
+        tracker file
+        """
+        try:
+            with open(self.tracker_file_name, "r") as tracker_file:
+                tracker_info = json.load(tracker_file)
+        except (IOError, OSError, ):
+            return None
+        except ValueError:
+            self._log.warning("ignoring unreadable tracker file {0}: "
+                              "{1}".format(self.tracker_file_name,
+                                           sys.exc_info()[1]))
+            return None
+        if not isinstance(tracker_info, dict):
+            return None
+        return tracker_info
+
+    def _save_tracker_info(self,
+                           key,
+                           bytes_completed=0,
+                           version_id=None,
+                           last_modified=None,
+                           slice_offset=None,
+                           slice_size=None):
+        """
+        record the download in progress in the tracker file
+        """
+        self._tracker_info = {
+            "collection_name"   : key._bucket.name,
+            "key_name"          : key.name,
+            "version_id"        : (key.version_id if version_id is None
+                                   else version_id),
+            "last_modified"     : last_modified,
+            "slice_offset"      : slice_offset,
+            "slice_size"        : slice_size,
+            "bytes_completed"   : bytes_completed,
+        }
+        if self.tracker_file_name is None:
+            return
+
+        temp_file_name = "{0}.{1}".format(self.tracker_file_name, os.getpid())
+        try:
+            with open(temp_file_name, "w") as tracker_file:
+                json.dump(self._tracker_info, tracker_file)
+            os.rename(temp_file_name, self.tracker_file_name)
+        except (IOError, OSError, ):
+            self._log.warning("unable to write tracker file {0}: {1}".format(
+                self.tracker_file_name, sys.exc_info()[1]
+            ))
+
+    def _remove_tracker_file(self):
+        self._tracker_info = None
+        if self.tracker_file_name is None:
+            return
+        try:
+            os.unlink(self.tracker_file_name)
+        except OSError:
+            pass
+
+    def _compute_resume_point(self,
+                              key,
+                              file_object,
+                              version_id,
+                              slice_offset,
+                              slice_size):
+        """
+        return (bytes_completed, version_id, last_modified) for the download
+        in the tracker, or None if it is not this download
+        """
+        tracker_info = self._tracker_info
+        if tracker_info is None:
+            return None
+        if tracker_info.get("collection_name") != key._bucket.name or \
+           tracker_info.get("key_name") != key.name or \
+           tracker_info.get("slice_offset") != slice_offset or \
+           tracker_info.get("slice_size") != slice_size:
+            self._log.info("tracker file is for another download")
+            return None
+        tracked_version_id = tracker_info.get("version_id")
+        if version_id is not None and tracked_version_id != version_id:
+            self._log.info("tracker file is for version {0}, "
+                           "not {1}".format(tracked_version_id, version_id))
+            return None
+
+        last_modified = tracker_info.get("last_modified")
+        if version_id is None and last_modified is None:
+            version_id = tracked_version_id
+            if version_id is None:
+                return None
+
+        # the file may have lost whatever was written after the tracker
+        # was last saved, or never had it
+        file_object.seek(0, os.SEEK_END)
+        bytes_completed = min(file_object.tell(),
+                              tracker_info.get("bytes_completed", 0))
+        return bytes_completed, version_id, last_modified
+
+    def _restart(self, file_object):
+        file_object.seek(0)
+        file_object.truncate()
+        self._remove_tracker_file()
+
+    def _retrieve(self,
+                  key,
+                  file_object,
+                  reporter,
+                  bytes_completed,
+                  version_id,
+                  last_modified,
+                  slice_offset,
+                  slice_size,
+                  modified_since,
+                  unmodified_since):
+        """
+        retrieve the contents after the bytes_completed already in the
+        file, return (bytes_completed, last_modified) so far, raise
+        _VersionChanged if the pinned version is no longer there
+        """
+        if slice_size is not None and bytes_completed >= slice_size:
+            return bytes_completed, last_modified
+
+        offset = (0 if slice_offset is None else slice_offset) + \
+                 bytes_completed
+        size = (None if slice_size is None
+                else slice_size - bytes_completed)
+
+        pinned = version_id is not None or last_modified is not None
+        if last_modified is not None:
+            modified_since = None
+            unmodified_since = calendar.timegm(
+                parse_http_timestamp(last_modified).timetuple()
+            )
+
+        try:
+            http_connection, response = key._open_contents(
+                version_id,
+                (None if offset == 0 else offset),
+                size,
+                modified_since,
+                unmodified_since
+            )
+        except KeyModified:
+            if last_modified is not None:
+                raise _VersionChanged()
+            raise
+        except LumberyardHTTPError:
+            instance = sys.exc_info()[1]
+            if instance.status == REQUESTED_RANGE_NOT_SATISFIABLE and \
+               offset > 0:
+                # everything has been written
+                return bytes_completed, last_modified
+            raise
+
+        try:
+            if not pinned:
+                last_modified = response.getheader("Last-Modified")
+
+            file_object.seek(bytes_completed)
+            file_object.truncate()
+            unsaved_bytes = 0
+            try:
+                while True:
+                    http_connection.check_deadline()
+                    data = response.read(_read_buffer_size)
+                    if len(data) == 0:
+                        break
+                    file_object.write(data)
+                    bytes_completed += len(data)
+                    unsaved_bytes += len(data)
+                    reporter.bytes_written(len(data))
+                    if unsaved_bytes >= _tracker_save_interval:
+                        file_object.flush()
+                        self._save_tracker_info(key,
+                                                bytes_completed,
+                                                version_id,
+                                                last_modified,
+                                                slice_offset,
+                                                slice_size)
+                        unsaved_bytes = 0
+            finally:
+                file_object.flush()
+                self._save_tracker_info(key,
+                                        bytes_completed,
+                                        version_id,
+                                        last_modified,
+                                        slice_offset,
+                                        slice_size)
+        finally:
+            http_connection.close()
+
+        if size is not None and bytes_completed < slice_size:
+            raise IncompleteRead(b"", slice_size - bytes_completed)
+
+        return bytes_completed, last_modified
+
+    def get_file(self,
+                 key,
+                 file_object,
+                 reporter,
+                 version_id=None,
+                 slice_offset=None,
+                 slice_size=None,
+                 modified_since=None,
+                 unmodified_since=None):
+        """
+        retrieve the contents of key into file_object, which must support
+        seek(), tell() and truncate(), resuming and retrying as needed
+        """
+        requested_version_id = version_id
+        resume_point = self._compute_resume_point(key,
+                                                  file_object,
+                                                  version_id,
+                                                  slice_offset,
+                                                  slice_size)
+        if resume_point is None:
+            self._restart(file_object)
+            bytes_completed, last_modified = 0, None
+        else:
+            bytes_completed, version_id, last_modified = resume_point
+            self._log.info("resuming {0} after {1} bytes".format(
+                key.name, bytes_completed
+            ))
+
+        reporter.start()
+        if bytes_completed > 0:
+            reporter.bytes_written(bytes_completed)
+
+        retry_policy = key._bucket.retry_policy
+        progress_less_attempts = 0
+        while True:
+            start_bytes = bytes_completed
+            try:
+                bytes_completed, last_modified = self._retrieve(
+                    key,
+                    file_object,
+                    reporter,
+                    bytes_completed,
+                    version_id,
+                    last_modified,
+                    slice_offset,
+                    slice_size,
+                    modified_since,
+                    unmodified_since
+                )
+                break
+            except _VersionChanged:
+                self._log.warning("{0} has changed since the download "
+                                  "started, starting again".format(key.name))
+                error = None
+            except Exception:
+                error = sys.exc_info()[1]
+                if not is_retryable_error(error):
+                    raise
+
+            # keep what was written, if we got that far
+            if self._tracker_info is not None:
+                bytes_completed = self._tracker_info["bytes_completed"]
+                last_modified = self._tracker_info["last_modified"]
+
+            if error is None:
+                self._restart(file_object)
+                bytes_completed, last_modified = 0, None
+                version_id = requested_version_id
+
+            if bytes_completed > start_bytes:
+                progress_less_attempts = 0
+            else:
+                progress_less_attempts += 1
+            if progress_less_attempts > self.num_retries:
+                self._log.error("giving up on {0} after {1} attempts with "
+                                "no progress".format(key.name,
+                                                     progress_less_attempts))
+                if error is None:
+                    raise KeyModified()
+                raise error
 
-    def _save_tracker_info(self, key):
-        pass
+            if error is not None:
+                delay = retry_policy.compute_delay(
+                    error, max(0, progress_less_attempts - 1)
+                )
+                if delay is None:
+                    self._log.error("retry budget spent, giving up on "
+                                    "{0}".format(key.name))
+                    raise error
+                self._log.warning("retrieve of {0} failed after {1} bytes, "
+                                  "retrying in {2:.3f} seconds: {3}".format(
+                                    key.name, bytes_completed, delay, error))
+                time.sleep(delay)
 
+        reporter.finish()
+        self._remove_tracker_file()
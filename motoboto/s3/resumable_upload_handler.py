@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""
+resumable_upload_handler.py
+
+class ResumableUploadHandler
+
+a MultiPart Upload whose progress is kept in a tracker file, so an upload
+that dies partway can be continued, counterpart of the boto resumable
+upload handler
+"""
+import json
+import logging
+import os
+import sys
+import time
+
+from lumberyard.http_connection import LumberyardHTTPError
+
+from motoboto.s3.multipart import ParallelUpload, part_lister, \
+        _compute_part_size
+from motoboto.retry import is_retryable_error
+from motoboto.s3.resumable_download_handler import _default_num_retries
+from motoboto.s3.util import http_timestamp_str
+
+class ResumableUploadHandler(object):
+    """
+    Handler for resumable uploads
+
+    Pass one to Key.set_contents_from_file as res_upload_handler. The file
+    is archived as a MultiPart Upload, and the tracker file records the
+    conjoined identifier, the part size and the numbers of the parts that
+    have been uploaded.
+
+    A part that fails is uploaded again, waiting longer after each attempt
+    in a row that uploads no parts, and giving up after num_retries such
+    attempts. Each retry is taken from the retry budget of the pool's 
+    RetryPolicy, and waits as it says. The upload is left open, not 
+    cancelled.
+
+    A later upload of the same file with the same tracker file continues
+    the same MultiPart Upload, uploading only the parts that both the
+    tracker file and the server's list of parts do not have, before
+    completing it.
+    """
+    def __init__(self, tracker_file_name=None, num_retries=None):
+        """
+        tracker_file_name
+            path to tracker file
+
+            None means an upload is only continued within one call
+
+        num_retries
+            limit to the number of times we will retry
+        """
+        self._log = logging.getLogger("ResumableUploadHandler")
+        self.tracker_file_name = tracker_file_name
+        self.num_retries = (_default_num_retries if num_retries is None
+                            else num_retries)
+        self._tracker_info = None
+        if tracker_file_name is not None:
+            self._tracker_info = self._load_tracker_info()
+
+    def _load_tracker_info(self):
+        """
+        return the dict in the tracker file, or None if there is no usable
+        tracker file
+        """
+        try:
+            with open(self.tracker_file_name, "r") as tracker_file:
+                tracker_info = json.load(tracker_file)
+        except (IOError, OSError, ):
+            return None
+        except ValueError:
+            self._log.warning("ignoring unreadable tracker file {0}: "
+                              "{1}".format(self.tracker_file_name,
+                                           sys.exc_info()[1]))
+            return None
+        if not isinstance(tracker_info, dict):
+            return None
+        return tracker_info
+
+    def _save_tracker_info(self):
+        if self.tracker_file_name is None:
+            return
+
+        temp_file_name = "{0}.{1}".format(self.tracker_file_name, os.getpid())
+        try:
+            with open(temp_file_name, "w") as tracker_file:
+                json.dump(self._tracker_info, tracker_file)
+            os.rename(temp_file_name, self.tracker_file_name)
+        except (IOError, OSError, ):
+            self._log.warning("unable to write tracker file {0}: {1}".format(
+                self.tracker_file_name, sys.exc_info()[1]
+            ))
+
+    def _remove_tracker_file(self):
+        self._tracker_info = None
+        if self.tracker_file_name is None:
+            return
+        try:
+            os.unlink(self.tracker_file_name)
+        except OSError:
+            pass
+
+    def _part_done(self, part_num):
+        """
+        called by ParallelUpload, under its lock, as each part finishes
+        """
+        self._tracker_info["completed_parts"].append(part_num)
+        self._save_tracker_info()
+
+    def _resume_upload(self, bucket, key_name, size, part_size):
+        """
+        return (multipart_upload, completed part numbers) for the upload in
+        the tracker file, or None if it is not this upload, or is gone
+        """
+        tracker_info = self._tracker_info
+        if tracker_info is None:
+            return None
+        if tracker_info.get("collection_name") != bucket.name or \
+           tracker_info.get("key_name") != key_name or \
+           tracker_info.get("size") != size or \
+           tracker_info.get("part_size") != part_size:
+            self._log.info("tracker file is for another upload")
+            return None
+
+        multipart_upload = bucket._multipart_upload_class(
+            bucket=bucket,
+            conjoined_identifier=tracker_info["conjoined_identifier"],
+            key=key_name,
+            create_timestamp=tracker_info["create_timestamp"]
+        )
+
+        try:
+            server_parts = dict([(part.part_number, part.size, )
+                                 for part in part_lister(multipart_upload)])
+        except LumberyardHTTPError:
+            instance = sys.exc_info()[1]
+            if instance.status >= 500:
+                raise
+            self._log.warning("upload {0} is gone: {1}".format(
+                multipart_upload.id, instance
+            ))
+            return None
+
+        # trust only the parts both we and the server know are complete
+        completed_parts = set()
+        for part_num in tracker_info.get("completed_parts", []):
+            expected_size = _compute_part_size(size, part_size, part_num)
+            if server_parts.get(part_num) == expected_size:
+                completed_parts.add(part_num)
+            else:
+                self._log.warning("part {0} of upload {1} is not on the "
+                                  "server, uploading it again".format(
+                                    part_num, multipart_upload.id))
+        return multipart_upload, completed_parts
+
+    def send_file(self, key, file_object, size, part_size, concurrency, cb):
+        """
+        archive size bytes of file_object, from its current position, as
+        key. The file must support seek() and tell().
+
+        return a CompleteMultiPartUpload
+        """
+        bucket = key._bucket
+        start_position = file_object.tell()
+
+        resumed = self._resume_upload(bucket, key.name, size, part_size)
+        if resumed is None:
+            multipart_upload = bucket.initiate_multipart_upload(key.name)
+            completed_parts = set()
+        else:
+            multipart_upload, completed_parts = resumed
+            self._log.info("continuing upload {0} with {1} parts "
+                           "done".format(multipart_upload.id,
+                                         len(completed_parts)))
+
+        self._tracker_info = {
+            "collection_name"       : bucket.name,
+            "key_name"              : key.name,
+            "size"                  : size,
+            "part_size"             : part_size,
+            "conjoined_identifier"  : multipart_upload.id,
+            "create_timestamp"      : 
+                http_timestamp_str(multipart_upload.create_timestamp),
+            "completed_parts"       : sorted(completed_parts),
+        }
+        self._save_tracker_info()
+
+        retry_policy = bucket.retry_policy
+        progress_less_attempts = 0
+        while True:
+            completed_count = len(self._tracker_info["completed_parts"])
+            file_object.seek(start_position)
+            upload = ParallelUpload(
+                bucket,
+                key.name,
+                file_object,
+                size,
+                part_size,
+                concurrency,
+                cb=cb,
+                multipart_upload=multipart_upload,
+                completed_parts=frozenset(
+                    self._tracker_info["completed_parts"]
+                ),
+                part_done=self._part_done
+            )
+            try:
+                completed_upload = upload.run()
+                break
+            except Exception:
+                error = sys.exc_info()[1]
+                if not is_retryable_error(error):
+                    raise
+
+            if len(self._tracker_info["completed_parts"]) > completed_count:
+                progress_less_attempts = 0
+            else:
+                progress_less_attempts += 1
+            if progress_less_attempts > self.num_retries:
+                self._log.error("giving up on upload {0} after {1} attempts "
+                                "with no progress".format(
+                                    multipart_upload.id,
+                                    progress_less_attempts))
+                raise error
+
+            delay = retry_policy.compute_delay(
+                error, max(0, progress_less_attempts - 1)
+            )
+            if delay is None:
+                self._log.error("retry budget spent, giving up on upload "
+                                "{0}".format(multipart_upload.id))
+                raise error
+            self._log.warning("upload {0} failed with {1} parts done, "
+                              "retrying in {2:.3f} seconds: {3}".format(
+                                multipart_upload.id,
+                                len(self._tracker_info["completed_parts"]),
+                                delay,
+                                error))
+            time.sleep(delay)
+
+        file_object.seek(start_position + size)
+        self._remove_tracker_file()
+        return completed_upload
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+single_flight.py
+
+class SingleFlight
+
+share one request among the threads that make the same read at once
+"""
+import logging
+import sys
+import threading
+
+from motoboto.deadline import DeadlineExceeded, current_deadline
+
+class _Call(object):
+    """
+    a call in flight, and its outcome once it has finished
+    """
+    def __init__(self):
+        self.finished = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight(object):
+    """
+    While a read is in flight, the same read from another thread waits for
+    it and gets its result (or its error) instead of making a request of
+    its own. A read that starts after the first has finished makes a new
+    request, so no result is kept beyond the request that produced it.
+
+    Pass a SingleFlight to S3Emulator (or Bucket) as single_flight, and
+    Key.exists, Key.get_metadata and Key.get_contents_as_string share
+    requests for the same collection, key, version, slice and conditions.
+
+    calls_made
+        the number of requests made
+
+    calls_shared
+        the number of reads that waited for another thread's request
+    """
+    def __init__(self):
+        self._log = logging.getLogger("SingleFlight")
+        self._lock = threading.Lock()
+        self._calls = dict()
+        self.calls_made = 0
+        self.calls_shared = 0
+
+    def do(self, call_key, function, *args):
+        """
+        return function(*args), or the result of the call with the same
+        call_key that is already in flight. call_key must be hashable.
+
+        A waiting thread is bound by its own deadline. If the call it
+        waited for ran out of its deadline, the thread makes its own call.
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(call_key)
+                if call is None:
+                    call = _Call()
+                    self._calls[call_key] = call
+                    self.calls_made += 1
+                    leader = True
+                else:
+                    self.calls_shared += 1
+                    leader = False
+
+            if leader:
+                return self._make_call(call_key, call, function, args)
+
+            self._wait(call)
+            if call.error is None:
+                return call.result
+            if not isinstance(call.error, DeadlineExceeded):
+                raise call.error
+            self._log.debug("shared call ran out of time, "
+                            "calling again: {0}".format(call_key))
+
+    def _make_call(self, call_key, call, function, args):
+        try:
+            call.result = function(*args)
+        except BaseException:
+            call.error = sys.exc_info()[1]
+            raise
+        finally:
+            with self._lock:
+                del self._calls[call_key]
+            call.finished.set()
+        return call.result
+
+    def _wait(self, call):
+        deadline = current_deadline()
+        if deadline is None:
+            call.finished.wait()
+            return
+        if not call.finished.wait(deadline.compute_timeout()):
+            raise DeadlineExceeded("deadline exceeded waiting for a "
+                                   "shared request")
@@ -5,12 +5,116 @@ util.py
 utility functions used by motoboto
 """
 from datetime import datetime
+import re
 
 _http_timestamp_format = "%a, %d %b %Y %H:%M:%S GMT"
 
+# "Sun, 06 Nov 1994 08:49:37 GMT"
+_http_timestamp_length = 29
+_http_timestamp_day_names = frozenset(
+    ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun", ]
+)
+_http_timestamp_months = dict(
+    (name, "-{0:02}-".format(number)) for number, name in enumerate(
+        ["Jan", "Feb", "Mar", "Apr", "May", "Jun", 
+         "Jul", "Aug", "Sep", "Oct", "Nov", "Dec", ], start=1
+    )
+)
+
+# parsed timestamps are remembered, because a listing page usually repeats
+# the same few timestamps many times. The memo is emptied when it is full.
+_http_timestamp_memo_size = 4096
+_http_timestamp_memo = dict()
+
+# "bytes 0-999/12345" or "bytes */12345"
+_content_range_re = re.compile(r"bytes\s+\S+/(\d+)\s*$")
+
 def http_timestamp_str(timestamp):
     return timestamp.strftime(_http_timestamp_format)
 
+def _datetime_from_iso_str(iso_str):
+    """
+    datetime.fromisoformat for the "YYYY-MM-DDTHH:MM:SS" layout, for pythons
+    older than 3.7
+    """
+    digits = iso_str[0:4] + iso_str[5:7] + iso_str[8:10] + \
+        iso_str[11:13] + iso_str[14:16] + iso_str[17:19]
+    if len(digits) != 14 or digits.strip("0123456789") != "":
+        raise ValueError(iso_str)
+    return datetime(int(iso_str[0:4]), 
+                    int(iso_str[5:7]), 
+                    int(iso_str[8:10]), 
+                    int(iso_str[11:13]), 
+                    int(iso_str[14:16]), 
+                    int(iso_str[17:19]))
+
+_from_iso_str = getattr(datetime, "fromisoformat", _datetime_from_iso_str)
+
+def _parse_fixed_http_timestamp(timestamp_str):
+    """
+    parse a timestamp in the exact fixed RFC 1123 layout nimbus.io sends.
+    return None if the string is in any other layout, or is not a valid
+    date, so the caller can fall back to strptime.
+    """
+    if len(timestamp_str) != _http_timestamp_length or \
+       timestamp_str[25:] != " GMT" or \
+       timestamp_str[3:5] != ", " or \
+       timestamp_str[7] != " " or \
+       timestamp_str[11] != " " or \
+       timestamp_str[16] != " " or \
+       timestamp_str[19] != ":" or \
+       timestamp_str[22] != ":" or \
+       timestamp_str[:3] not in _http_timestamp_day_names:
+        return None
+    month = _http_timestamp_months.get(timestamp_str[8:11])
+    if month is None:
+        return None
+
+    # the C parser behind fromisoformat is much faster than building the
+    # datetime from sliced integers
+    try:
+        return _from_iso_str(timestamp_str[12:16] + 
+                             month + 
+                             timestamp_str[5:7] + 
+                             "T" + 
+                             timestamp_str[17:25])
+    except ValueError:
+        return None
+
 def parse_http_timestamp(timestamp_str):
-    return datetime.strptime(timestamp_str, _http_timestamp_format)
+    """
+    return a datetime for an HTTP timestamp string such as
+    "Sun, 06 Nov 1994 08:49:37 GMT"
+
+    The common fixed layout is parsed directly; anything else goes to 
+    strptime, so the results and errors are the same as strptime's.
+    """
+    try:
+        timestamp = _http_timestamp_memo.get(timestamp_str)
+        if timestamp is not None:
+            return timestamp
+        timestamp = _parse_fixed_http_timestamp(timestamp_str)
+    except (TypeError, AttributeError, ):
+        timestamp = None
+    if timestamp is None:
+        return datetime.strptime(timestamp_str, _http_timestamp_format)
+
+    if _http_timestamp_memo_size > 0:
+        if len(_http_timestamp_memo) >= _http_timestamp_memo_size:
+            _http_timestamp_memo.clear()
+        _http_timestamp_memo[timestamp_str] = timestamp
+    return timestamp
 
+def parse_content_range_size(response):
+    """
+    return the size of the whole object from the Content-Range header of a
+    ranged response
+    """
+    content_range = response.getheader("Content-Range")
+    match_object = (None if content_range is None
+                    else _content_range_re.match(content_range))
+    if match_object is None:
+        raise ValueError(
+            "unable to parse Content-Range {0!r}".format(content_range)
+        )
+    return int(match_object.group(1))
@@ -13,16 +13,38 @@ import json
 import logging
 import sys
 
-from lumberyard.http_connection import HTTPConnection, LumberyardHTTPError
+from lumberyard.http_connection import LumberyardHTTPError
 from lumberyard.http_util import compute_default_hostname, \
         compute_default_collection_name, \
         compute_reserved_collection_name, \
         compute_uri
 
+from motoboto.connection_pool import ConnectionPool, \
+        _default_max_connections_per_host, \
+        _default_idle_timeout
+from motoboto.deadline import with_deadline
 from motoboto.identity import load_identity_from_environment, \
         load_identity_from_file
 from motoboto.s3.bucket import Bucket
 
+def _load_identity(identity):
+    """
+    return identity if it is not None, otherwise the identity from the 
+    environment or the identity file
+    """
+    if identity is not None:
+        return identity
+
+    identity = load_identity_from_environment()
+    if identity is not None:
+        return identity
+
+    identity = load_identity_from_file()
+    if identity is not None:
+        return identity
+
+    raise ValueError("You must specify identity in environment or file")
+
 class S3Emulator(object):
     """
     Emulate the functions of the object returned by boto.connect_s3
@@ -30,47 +52,120 @@ class S3Emulator(object):
     if identity is None
     * first look for environment variables
     * then look for an identity fiel in a standard location
+
+    max_connections_per_host
+        limit on the keep-alive connections held open to each nimbus.io host
+
+    idle_timeout
+        seconds an idle keep-alive connection is kept before it is closed
+
+    block_cache
+        if not None, a motoboto.s3.block_cache.BlockCache shared by every
+        bucket, which serves slices of versions read with 
+        get_contents_as_string
+
+    retry_policy
+        the motoboto.retry.RetryPolicy for every request we make, None for
+        a default RetryPolicy of our own, with its own retry budget
+
+    hedge_policy
+        if not None, a motoboto.hedge.HedgePolicy: a GET or HEAD slower
+        than its hedge delay gets a copy sent on another connection
+
+    circuit_breaker_policy
+        if not None, a motoboto.circuit_breaker.CircuitBreakerPolicy: while
+        a collection's host is failing, requests to it fail at once with
+        CircuitOpenError. circuit_breaker_states shows the state for each
+        host.
+
+    single_flight
+        if not None, a motoboto.s3.single_flight.SingleFlight shared by 
+        every bucket: identical exists, get_metadata and 
+        get_contents_as_string calls made at the same time by several 
+        threads share one request
+
+    create_bucket, create_unique_bucket, get_all_buckets and delete_bucket
+    also take total_timeout, connect_timeout and first_byte_timeout, as 
+    motoboto.deadline.deadline_scope does. Wrap other work in a 
+    deadline_scope to bound it.
     """
-    def __init__(self, identity=None):
+    def __init__(self, 
+                 identity=None, 
+                 max_connections_per_host=_default_max_connections_per_host,
+                 idle_timeout=_default_idle_timeout,
+                 block_cache=None,
+                 retry_policy=None,
+                 hedge_policy=None,
+                 circuit_breaker_policy=None,
+                 single_flight=None):
         self._log = logging.getLogger("S3Emulator")
-
-        if identity is not None:
-            self._identity = identity
-        else:
-            identity = load_identity_from_environment()
-            if identity is not None:
-                self._identity = identity
-            else:
-                identity = load_identity_from_file()
-                if identity is not None:
-                    self._identity = identity
-                else:
-                    raise ValueError(
-                        "You must specify identity in environment or file"
-                    )
+        self._identity = _load_identity(identity)
+        self._block_cache = block_cache
+        self._single_flight = single_flight
+
+        self._connection_pool = ConnectionPool(
+            self._identity,
+            max_connections_per_host=max_connections_per_host,
+            idle_timeout=idle_timeout,
+            retry_policy=retry_policy,
+            hedge_policy=hedge_policy,
+            circuit_breaker_policy=circuit_breaker_policy
+        )
 
         self._default_bucket = Bucket(
             self._identity, 
-            compute_default_collection_name(self._identity.user_name)
+            compute_default_collection_name(self._identity.user_name),
+            connection_pool=self._connection_pool,
+            block_cache=self._block_cache,
+            single_flight=self._single_flight
         )
 
     @property
     def default_bucket(self):
         return self._default_bucket
 
+    @property
+    def retry_policy(self):
+        return self._connection_pool.retry_policy
+
+    @property
+    def hedge_policy(self):
+        return self._connection_pool.hedge_policy
+
+    @property
+    def circuit_breaker_policy(self):
+        return self._connection_pool.circuit_breaker_policy
+
+    @property
+    def circuit_breaker_states(self):
+        """
+        a dict of the state of the circuit breaker ("closed", "open" or 
+        "half-open") for each host we have sent requests to
+        """
+        circuit_breaker_policy = self._connection_pool.circuit_breaker_policy
+        if circuit_breaker_policy is None:
+            return dict()
+        return circuit_breaker_policy.states()
+
     def close(self):
         """
         close connection to motoboto
         """
         self._log.debug("closing")
+        self._connection_pool.close()
 
     def get_bucket(self, bucket_name):
         """
         get the contents of an existing nimbus.io collection, 
         similar to an s3 bucket
         """
-        return Bucket(self._identity, bucket_name)
+        return Bucket(self._identity, 
+                      bucket_name, 
+                      connection_pool=self._connection_pool,
+                      block_cache=self._block_cache,
+                      single_flight=self._single_flight)
 
+    @with_deadline
     def create_bucket(self, bucket_name, access_control=None):
         """
         create a nimbus.io collection, similar to an s3 bucket
@@ -111,11 +206,8 @@ class S3Emulator(object):
         """
         method = "POST"
 
-        http_connection = HTTPConnection(
-            compute_default_hostname(),
-            self._identity.user_name,
-            self._identity.auth_key,
-            self._identity.auth_key_id
+        http_connection = self._connection_pool.create_http_connection(
+            compute_default_hostname()
         )
         uri = compute_uri(
             "/".join(["customers", self._identity.user_name, "collections"]), 
@@ -146,8 +238,13 @@ class S3Emulator(object):
         response.read()
         http_connection.close()
 
-        return Bucket(self._identity, bucket_name)
+        return Bucket(self._identity, 
+                      bucket_name, 
+                      connection_pool=self._connection_pool,
+                      block_cache=self._block_cache,
+                      single_flight=self._single_flight)
 
+    @with_deadline
     def create_unique_bucket(self, access_control=None):
         """
         create a nimbus.io collection, similar to an s3 bucket
@@ -165,6 +262,7 @@ class S3Emulator(object):
 
         return self.create_bucket(bucket_name, access_control)
  
+    @with_deadline
     def get_all_buckets(self):
         """
         List all collections for the user
@@ -173,11 +271,8 @@ class S3Emulator(object):
         """
         method = "GET"
 
-        http_connection = HTTPConnection(
-            compute_default_hostname(),
-            self._identity.user_name,
-            self._identity.auth_key,
-            self._identity.auth_key_id
+        http_connection = self._connection_pool.create_http_connection(
+            compute_default_hostname()
         )
         uri = compute_uri(
             "/".join(["customers", self._identity.user_name, "collections"]), 
@@ -202,11 +297,15 @@ class S3Emulator(object):
             bucket = Bucket(
                 self._identity, 
                 collection_dict["name"], 
-                versioning=collection_dict["versioning"]
+                versioning=collection_dict["versioning"],
+                connection_pool=self._connection_pool,
+                block_cache=self._block_cache,
+                single_flight=self._single_flight
             )
             bucket_list.append(bucket)
         return bucket_list
 
+    @with_deadline
     def delete_bucket(self, bucket_name):
         """
         remove (an empty) bucket from nimbus.io
@@ -218,11 +317,8 @@ class S3Emulator(object):
         """
         method = "DELETE"
 
-        http_connection = HTTPConnection(
-            compute_default_hostname(),
-            self._identity.user_name,
-            self._identity.auth_key,
-            self._identity.auth_key_id
+        http_connection = self._connection_pool.create_http_connection(
+            compute_default_hostname()
         )
 
         if bucket_name.startswith("/"):
@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+"""
+transfer.py
+
+class TransferManager
+
+upload and download many files at once on a bounded pool of threads
+"""
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+import logging
+import os
+import os.path
+import sys
+import threading
+import time
+
+from motoboto.s3.key import _default_multipart_threshold, \
+        _default_multipart_part_size, \
+        _default_multipart_concurrency
+
+_default_max_workers = 4
+
+_upload = "upload"
+_download = "download"
+
+class TransferFuture(object):
+    """
+    The pending result of one upload or download job
+
+    kind
+        "upload" or "download"
+
+    bucket_name, key_name, path
+        what is being transferred
+
+    bytes_transferred
+        the bytes sent or received so far
+    """
+    def __init__(self, kind, bucket, key_name, path):
+        self.kind = kind
+        self.bucket_name = bucket.name
+        self.key_name = key_name
+        self.path = path
+        self.bytes_transferred = 0
+        self._condition = threading.Condition()
+        self._done = False
+        self._result = None
+        self._exception = None
+        self._callbacks = list()
+
+    def __repr__(self):
+        return "<TransferFuture {0} {1}/{2} {3}>".format(self.kind,
+                                                         self.bucket_name,
+                                                         self.key_name,
+                                                         self.path)
+
+    def done(self):
+        with self._condition:
+            return self._done
+
+    def _wait(self, timeout):
+        with self._condition:
+            if not self._done:
+                self._condition.wait(timeout)
+            if not self._done:
+                raise RuntimeError("timed out waiting for {0!r}".format(self))
+
+    def result(self, timeout=None):
+        """
+        wait for the job, and return the Key transferred, or raise the
+        exception that stopped it
+        """
+        self._wait(timeout)
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def exception(self, timeout=None):
+        """
+        wait for the job, and return the exception that stopped it, or None
+        """
+        self._wait(timeout)
+        return self._exception
+
+    def add_done_callback(self, callback):
+        """
+        call callback(future) when the job is done, at once if it already is
+        """
+        with self._condition:
+            if not self._done:
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def _finish(self, result, exception):
+        with self._condition:
+            self._result = result
+            self._exception = exception
+            self._done = True
+            callbacks = self._callbacks
+            self._callbacks = list()
+            self._condition.notify_all()
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception:
+                logging.getLogger("TransferFuture").exception(
+                    "done callback failed for {0!r}".format(self)
+                )
+
+class TransferManager(object):
+    """
+    Run upload and download jobs on up to max_workers threads.
+
+    Each job moves one file. A file of at least multipart_threshold bytes
+    is uploaded as a MultiPart Upload of part_size parts, part_concurrency
+    at a time, and smaller files in one request. Downloads fetch byte
+    ranges of part_size, part_concurrency at a time, so a key no larger
+    than part_size is retrieved in one request.
+
+    upload() and download() queue a job and return a TransferFuture at
+    once. bytes_transferred and throughput report on all the jobs together.
+
+    Use as a context manager, or call shutdown(), to wait for the jobs and
+    stop the threads.
+    """
+    def __init__(self,
+                 max_workers=_default_max_workers,
+                 multipart_threshold=_default_multipart_threshold,
+                 part_size=_default_multipart_part_size,
+                 part_concurrency=_default_multipart_concurrency):
+        self._log = logging.getLogger("TransferManager")
+        self._multipart_threshold = multipart_threshold
+        self._part_size = part_size
+        self._part_concurrency = part_concurrency
+        self._jobs = queue.Queue()
+        self._lock = threading.Lock()
+        self._bytes_transferred = 0
+        self._start_time = None
+        self._pending_count = 0
+        self._completed_count = 0
+        self._failed_count = 0
+        self._shutdown = False
+        self._threads = list()
+        for _ in range(max(1, max_workers)):
+            thread = threading.Thread(target=self._run_jobs,
+                                      name="transfer-worker")
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+        return False
+
+    @property
+    def bytes_transferred(self):
+        """
+        the bytes sent and received by all the jobs so far
+        """
+        with self._lock:
+            return self._bytes_transferred
+
+    @property
+    def throughput(self):
+        """
+        bytes a second, from the start of the first job
+        """
+        with self._lock:
+            if self._start_time is None:
+                return 0.0
+            elapsed_time = time.time() - self._start_time
+            if elapsed_time <= 0.0:
+                return 0.0
+            return self._bytes_transferred / elapsed_time
+
+    @property
+    def pending_count(self):
+        """
+        the number of jobs queued or running
+        """
+        with self._lock:
+            return self._pending_count
+
+    @property
+    def completed_count(self):
+        with self._lock:
+            return self._completed_count
+
+    @property
+    def failed_count(self):
+        with self._lock:
+            return self._failed_count
+
+    def _submit(self, kind, bucket, key_name, path):
+        future = TransferFuture(kind, bucket, key_name, path)
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("TransferManager has been shut down")
+            self._pending_count += 1
+        self._jobs.put((future, bucket, ))
+        return future
+
+    def upload(self, bucket, path, key_name=None):
+        """
+        queue an upload of the file at path to key_name (the file's name
+        if None) in bucket, return a TransferFuture
+        """
+        if key_name is None:
+            key_name = os.path.basename(path)
+        return self._submit(_upload, bucket, key_name, path)
+
+    def download(self, bucket, key_name, path):
+        """
+        queue a download of key_name in bucket to the file at path,
+        creating its directory if need be, return a TransferFuture
+        """
+        return self._submit(_download, bucket, key_name, path)
+
+    def _progress_callback(self, future):
+        """
+        return a boto style callback that adds each job's progress to ours
+        """
+        def _callback(bytes_so_far, _size):
+            with self._lock:
+                self._bytes_transferred += \
+                    bytes_so_far - future.bytes_transferred
+                future.bytes_transferred = bytes_so_far
+        return _callback
+
+    def _upload_file(self, future, bucket):
+        key = bucket.get_key(future.key_name)
+        with open(future.path, "rb") as input_file:
+            key.set_contents_from_file(
+                input_file,
+                cb=self._progress_callback(future),
+                multipart_threshold=self._multipart_threshold,
+                part_size=self._part_size,
+                concurrency=self._part_concurrency
+            )
+        return key
+
+    def _download_file(self, future, bucket):
+        key = bucket.get_key(future.key_name)
+        dir_name = os.path.dirname(future.path)
+        if dir_name != "" and not os.path.isdir(dir_name):
+            try:
+                os.makedirs(dir_name)
+            except OSError:
+                # another job made it first
+                if not os.path.isdir(dir_name):
+                    raise
+        with open(future.path, "wb") as output_file:
+            key.get_contents_to_file(
+                output_file,
+                cb=self._progress_callback(future),
+                concurrency=self._part_concurrency,
+                part_size=self._part_size
+            )
+        return key
+
+    def _run_jobs(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            future, bucket = job
+            with self._lock:
+                if self._start_time is None:
+                    self._start_time = time.time()
+
+            self._log.debug("starting {0!r}".format(future))
+            result, exception = None, None
+            try:
+                if future.kind == _upload:
+                    result = self._upload_file(future, bucket)
+                else:
+                    result = self._download_file(future, bucket)
+            except Exception:
+                exception = sys.exc_info()[1]
+                self._log.error("{0!r} failed: {1}".format(future, exception))
+
+            with self._lock:
+                self._pending_count -= 1
+                if exception is None:
+                    self._completed_count += 1
+                else:
+                    self._failed_count += 1
+            future._finish(result, exception)
+
+    def shutdown(self, wait=True):
+        """
+        stop taking jobs. The jobs already queued still run. If wait is
+        True, return when they have finished.
+        """
+        with self._lock:
+            if self._shutdown:
+                return
+            self._shutdown = True
+        for _ in self._threads:
+            self._jobs.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
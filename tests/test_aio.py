@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+test_aio.py
+
+test the asyncio interface to nimbus.io
+"""
+import asyncio
+import io
+import logging
+import os
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+assert os.environ.get("USE_BOTO", "0") == "0"
+
+import motoboto.aio
+
+from tests.test_util import initialize_logging
+
+_key_count = 50
+
+async def _clear_bucket(s3_connection, bucket):
+    async for key in bucket.list():
+        await key.delete()
+    await s3_connection.delete_bucket(bucket.name)
+
+class TestAIO(unittest.TestCase):
+    """
+    test AsyncS3Emulator, AsyncBucket and AsyncKey
+    """
+
+    def setUp(self):
+        log = logging.getLogger("setUp")
+        log.debug("start")
+        self._loop = asyncio.new_event_loop()
+        log.debug("finish")
+
+    def tearDown(self):
+        log = logging.getLogger("tearDown")
+        log.debug("start")
+        self._loop.close()
+        log.debug("finish")
+
+    def _run(self, coroutine_function, **kwargs):
+        async def _with_connection():
+            s3_connection = motoboto.aio.connect_s3(**kwargs)
+            try:
+                await coroutine_function(s3_connection)
+            finally:
+                s3_connection.close()
+        self._loop.run_until_complete(_with_connection())
+
+    def test_key_round_trip(self):
+        """
+        archive, test, retrieve and delete a key
+        """
+        key_name = "test-key"
+        test_string = b"test string" * 1000
+
+        async def _test(s3_connection):
+            bucket = await s3_connection.create_unique_bucket()
+
+            write_key = bucket.get_key(key_name)
+            await write_key.set_contents_from_string(test_string)
+            self.assertTrue(await write_key.exists())
+
+            read_key = bucket.get_key(key_name)
+            data = await read_key.get_contents_as_string()
+            self.assertEqual(data, test_string)
+
+            data = await read_key.get_contents_as_string(slice_offset=11,
+                                                         slice_size=11)
+            self.assertEqual(data, test_string[11:22])
+
+            await read_key.delete()
+            self.assertFalse(await read_key.exists())
+
+            await _clear_bucket(s3_connection, bucket)
+
+        self._run(_test)
+
+    def test_concurrent_requests(self):
+        """
+        archive and retrieve many keys concurrently on one event loop
+        """
+        async def _test(s3_connection):
+            bucket = await s3_connection.create_unique_bucket()
+            key_names = ["test-key-{0:04}".format(n)
+                         for n in range(_key_count)]
+
+            await asyncio.gather(*[
+                bucket.get_key(key_name).set_contents_from_string(
+                    key_name.encode("utf-8")
+                ) for key_name in key_names
+            ])
+
+            results = await asyncio.gather(*[
+                bucket.get_key(key_name).get_contents_as_string()
+                for key_name in key_names
+            ])
+            self.assertEqual(results,
+                             [key_name.encode("utf-8")
+                              for key_name in key_names])
+
+            listed_names = [key.name async for key in bucket.list()]
+            self.assertEqual(listed_names, key_names)
+
+            await _clear_bucket(s3_connection, bucket)
+
+        self._run(_test)
+
+    def test_failed_reads_release_connections(self):
+        """
+        reads that fail or are cancelled part way through the body must 
+        not keep their connections from the pool
+        """
+        key_name = "test-key"
+        test_string = os.urandom(1024 * 1024)
+        max_connections_per_host = 2
+
+        class _FailingFile(object):
+            """
+            a file that fails the first write, or cancels the read
+            """
+            def __init__(self, task=None):
+                self.task = task
+
+            def write(self, data):
+                if self.task is None:
+                    raise IOError("disk full")
+                self.task.cancel()
+
+        async def _test(s3_connection):
+            bucket = await s3_connection.create_unique_bucket()
+            key = bucket.get_key(key_name)
+            await key.set_contents_from_string(test_string)
+
+            for _ in range(max_connections_per_host + 1):
+                with self.assertRaises(IOError):
+                    await key.get_contents_to_file(_FailingFile(),
+                                                   total_timeout=10.0)
+
+                output_file = _FailingFile()
+                output_file.task = asyncio.ensure_future(
+                    key.get_contents_to_file(output_file, total_timeout=10.0)
+                )
+                with self.assertRaises(asyncio.CancelledError):
+                    await output_file.task
+
+            # with the slots of the pool still taken, these would wait
+            # until their deadlines
+            data = await key.get_contents_as_string(total_timeout=10.0)
+            self.assertEqual(data, test_string)
+
+            await _clear_bucket(s3_connection, bucket)
+
+        self._run(_test, max_connections_per_host=max_connections_per_host)
+
+    def test_multipart_upload(self):
+        """
+        upload a key in parts
+        """
+        key_name = "test-key"
+        part_data = [b"a" * 1024, b"b" * 1024, b"c" * 1024, ]
+
+        async def _test(s3_connection):
+            bucket = await s3_connection.create_unique_bucket()
+
+            multipart_upload = await bucket.initiate_multipart_upload(key_name)
+            for part_num, data in enumerate(part_data, start=1):
+                await multipart_upload.upload_part_from_file(io.BytesIO(data),
+                                                             part_num)
+            parts = await multipart_upload.get_all_parts()
+            self.assertEqual([part.part_number for part in parts], 
+                             [1, 2, 3, ])
+            await multipart_upload.complete_upload()
+
+            read_key = bucket.get_key(key_name)
+            data = await read_key.get_contents_as_string()
+            self.assertEqual(data, b"".join(part_data))
+
+            await _clear_bucket(s3_connection, bucket)
+
+        self._run(_test)
+
+if __name__ == "__main__":
+    initialize_logging()
+    unittest.main()
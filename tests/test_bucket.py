@@ -13,6 +13,7 @@ import os
 import os.path
 import shutil
 import sys
+import time
 try:
     import unittest2 as unittest
 except ImportError:
@@ -22,6 +23,7 @@ if os.environ.get("USE_BOTO", "0") == "1":
     import boto
 else:
     import motoboto as boto
+    from motoboto.s3.multidelete import Deleted, Error
 
 from tests.test_util import test_dir_path, initialize_logging
 
@@ -90,6 +92,136 @@ class TestBucket(unittest.TestCase):
                 bucket_in_list = True
         self.assertFalse(bucket_in_list)
 
+    @unittest.skipIf(os.environ.get("USE_BOTO", "0") == "1", 
+                     "streaming delete_keys is motoboto only")
+    def test_delete_keys(self):
+        """
+        test deleting many keys at once
+        """
+        key_names = ["test-key-{0:03}".format(n) for n in range(20)]
+        missing_key_name = "no-such-key"
+
+        # create the bucket
+        bucket = self._s3_connection.create_unique_bucket()
+        self.assertTrue(bucket is not None)
+
+        versions = dict()
+        for key_name in key_names:
+            key = bucket.get_key(key_name)
+            key.set_contents_from_string(key_name.encode("utf-8"))
+            versions[key_name] = key.version_id
+
+        # names, (name, version_id) pairs and a key that does not exist
+        keys_to_delete = [(key_name, versions[key_name], ) 
+                          for key_name in key_names[:10]]
+        keys_to_delete.extend(key_names[10:])
+        keys_to_delete.append(missing_key_name)
+
+        start_time = time.time()
+        results = list(bucket.delete_keys(iter(keys_to_delete), 
+                                          concurrency=4,
+                                          max_rate=50))
+        elapsed_time = time.time() - start_time
+
+        deleted = [r for r in results if isinstance(r, Deleted)]
+        errors = [r for r in results if isinstance(r, Error)]
+        self.assertEqual(sorted([r.key for r in deleted]), key_names)
+        self.assertEqual([r.version_id for r in deleted 
+                          if r.key in key_names[:10]],
+                         [versions[r.key] for r in deleted 
+                          if r.key in key_names[:10]])
+        self.assertEqual([r.key for r in errors], [missing_key_name, ])
+        self.assertEqual(errors[0].code, 404)
+
+        # 21 DELETEs at 50 a second take at least 0.4 seconds
+        self.assertTrue(elapsed_time >= 0.38, elapsed_time)
+
+        self.assertEqual(len(bucket.get_all_keys()), 0)
+
+        # delete the bucket
+        self._s3_connection.delete_bucket(bucket.name)
+
+    @unittest.skipIf(os.environ.get("USE_BOTO", "0") == "1", 
+                     "get_many is motoboto only")
+    def test_get_many(self):
+        """
+        test retrieving many keys at once
+        """
+        key_names = ["test-key-{0:03}".format(n) for n in range(30)]
+
+        # create the bucket
+        bucket = self._s3_connection.create_unique_bucket()
+        self.assertTrue(bucket is not None)
+
+        contents = dict()
+        for key_name in key_names:
+            key = bucket.get_key(key_name)
+            contents[key_name] = os.urandom(1024)
+            key.set_contents_from_string(contents[key_name])
+
+        # a budget smaller than the keys makes the GETs wait for us
+        results = dict()
+        for key, data in bucket.get_many(iter(key_names), 
+                                          concurrency=4,
+                                          max_bytes_in_flight=4096):
+            self.assertFalse(key.name in results)
+            results[key.name] = data
+        self.assertEqual(results, contents)
+
+        # a key that does not exist stops the iteration
+        def _gather():
+            return list(bucket.get_many(key_names[:3] + ["no-such-key", ]))
+        self.assertRaises(Exception, _gather)
+
+        self.assertEqual(
+            len(list(bucket.delete_keys(key_names))), len(key_names)
+        )
+
+        # delete the bucket
+        self._s3_connection.delete_bucket(bucket.name)
+
+    @unittest.skipIf(os.environ.get("USE_BOTO", "0") == "1", 
+                     "get_many is motoboto only")
+    def test_requests_while_getting_many(self):
+        """
+        test that GETs waiting for the caller to catch up do not hold the
+        connections the caller needs
+        """
+        key_names = ["test-key-{0:03}".format(n) for n in range(10)]
+        test_string = os.urandom(1024)
+
+        s3_connection = boto.connect_s3(max_connections_per_host=1)
+        bucket = s3_connection.create_unique_bucket()
+        self.assertTrue(bucket is not None)
+
+        for key_name in key_names:
+            key = bucket.get_key(key_name)
+            key.set_contents_from_string(test_string)
+
+        # with one connection, a GET holding it while it waited for room
+        # would keep our copies waiting until their deadlines
+        copied_names = list()
+        for key, data in bucket.get_many(key_names, 
+                                          max_bytes_in_flight=1536):
+            copy_key = bucket.get_key("copy-" + key.name)
+            copy_key.set_contents_from_string(data, total_timeout=10.0)
+            copied_names.append(copy_key.name)
+
+        for copied_name in copied_names:
+            self.assertEqual(
+                bucket.get_key(copied_name).get_contents_as_string(),
+                test_string
+            )
+
+        self.assertEqual(
+            len(list(bucket.delete_keys(key_names + copied_names))), 
+            2 * len(key_names)
+        )
+
+        # delete the bucket
+        s3_connection.delete_bucket(bucket.name)
+        s3_connection.close()
+
 if __name__ == "__main__":
     initialize_logging()
     unittest.main()
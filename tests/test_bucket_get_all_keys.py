@@ -237,6 +237,42 @@ class TestBucketGetAllKeys(unittest.TestCase):
         self.assertEqual(set(result_names), set(key_names))
 
         _clear_bucket(self._s3_connection, bucket)
+
+    @unittest.skipIf(os.environ.get("USE_BOTO", "0") == "1", 
+                     "slim listings are a motoboto extension")
+    def test_get_all_keys_slim(self):
+        """
+        test that slim listings match full listings, and become full keys
+        """
+        key_names = ["test_key1", "test_key2", "test_key3", ]
+
+        # create the bucket
+        bucket = self._s3_connection.create_unique_bucket()
+        self.assertTrue(bucket is not None)
+        _clear_keys(bucket)
+        
+        _ = _create_some_keys(bucket, key_names)
+
+        full_result = bucket.get_all_keys()
+        slim_result = bucket.get_all_keys(slim=True)
+        self.assertEqual(slim_result.truncated, full_result.truncated)
+        self.assertEqual(len(slim_result), len(full_result))
+        for listing, key in zip(slim_result, full_result):
+            self.assertFalse(hasattr(listing, "__dict__"))
+            self.assertEqual(listing.name, key.name)
+            self.assertEqual(listing.version_id, key.version_id)
+            self.assertEqual(listing.last_modified, key.last_modified)
+
+            full_key = listing.to_key()
+            self.assertTrue(isinstance(full_key, Key))
+            self.assertEqual(full_key.name, key.name)
+            self.assertEqual(full_key.version_id, key.version_id)
+            self.assertTrue(full_key.exists())
+
+        self.assertEqual([listing.name for listing in bucket.list(slim=True)],
+                         key_names)
+
+        _clear_bucket(self._s3_connection, bucket)
         
 if __name__ == "__main__":
     initialize_logging()
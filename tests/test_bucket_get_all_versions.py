@@ -254,6 +254,50 @@ class TestBucketGetAllVersions(unittest.TestCase):
         self.assertEqual(len(result_names), len(key_names))
         self.assertEqual(set(result_names), set(key_names))
 
+        _clear_bucket(self._s3_connection, bucket)
+    @unittest.skipIf(os.environ.get("USE_BOTO", "0") == "1", 
+                     "list_versions parameters are motoboto only")
+    def test_list_versions(self):
+        """
+        test listing every version, a page at a time
+        """
+        key_names = ["aaa/{0:02}".format(n) for n in range(10)]
+        test_max = 3
+
+        # create the bucket
+        bucket = self._s3_connection.create_unique_bucket()
+        bucket.configure_versioning(True)
+        self.assertTrue(bucket is not None)
+        _clear_keys(bucket)
+
+        # two versions of every key
+        keys = _create_some_keys(bucket, key_names) + \
+               _create_some_keys(bucket, key_names)
+        expected = set((key.name, key.version_id, ) for key in keys)
+
+        for prefetch_pages in [0, 2, ]:
+            result = [(key.name, key.version_id, ) 
+                      for key in bucket.list_versions(
+                          max_keys=test_max, prefetch_pages=prefetch_pages
+                      )]
+            self.assertEqual(len(result), len(expected))
+            self.assertEqual(set(result), expected)
+
+        # start after the first page
+        first_page = bucket.get_all_versions(max_keys=test_max)
+        result = [(key.name, key.version_id, ) 
+                  for key in bucket.list_versions(
+                      key_marker=first_page[-1].name,
+                      version_id_marker=first_page[-1].version_id,
+                      max_keys=test_max
+                  )]
+        self.assertEqual(len(result), len(expected) - test_max)
+        self.assertEqual(
+            set(result), 
+            expected - set((key.name, key.version_id, ) 
+                           for key in first_page)
+        )
+
         _clear_bucket(self._s3_connection, bucket)
         
 if __name__ == "__main__":
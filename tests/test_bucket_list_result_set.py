@@ -232,6 +232,205 @@ class TestBucketGetAllKeys(unittest.TestCase):
         
         # delete the bucket
         self._s3_connection.delete_bucket(bucket.name)
+
+    @unittest.skipIf(os.environ.get("USE_BOTO", "0") == "1", 
+                     "prefetch is a motoboto extension")
+    def test_prefetch(self):
+        """
+        test that listing with prefetch returns the same keys, in order
+        """
+        key_names = ["test-key{0:03}".format(n) for n in range(20)]
+
+        # create the bucket
+        bucket = self._s3_connection.create_unique_bucket()
+        self.assertTrue(bucket is not None)
+        for key in bucket.list():
+            key.delete()
+        
+        # create some keys
+        for key_name in key_names:
+            key = Key(bucket)
+            key.name = key_name
+            key.set_contents_from_string(os.urandom(1024))        
+
+        result_set = BucketListResultSet(bucket, prefetch_pages=2)
+        self.assertEqual([key.name for key in result_set], key_names)
+
+        result_set = bucket.list(prefix="test-key01", prefetch_pages=1)
+        self.assertEqual([key.name for key in result_set], key_names[10:20])
+
+        # abandoning a prefetching listing part way must not hang
+        result_set = iter(bucket.list(prefetch_pages=1))
+        self.assertEqual(next(result_set).name, key_names[0])
+        del result_set
+
+        # delete the keys
+        for key in bucket.list():
+            key.delete()
+        
+        # delete the bucket
+        self._s3_connection.delete_bucket(bucket.name)
+
+    @unittest.skipIf(os.environ.get("USE_BOTO", "0") == "1", 
+                     "max_connections_per_host is a motoboto extension")
+    def test_requests_while_listing(self):
+        """
+        test that the caller can make requests through the pool while it
+        works through a listing page
+        """
+        key_names = ["test-key{0:03}".format(n) for n in range(5)]
+        test_string = b"test string"
+
+        s3_connection = boto.connect_s3(max_connections_per_host=1)
+        bucket = s3_connection.create_unique_bucket()
+        self.assertTrue(bucket is not None)
+        
+        # create some keys
+        for key_name in key_names:
+            key = Key(bucket)
+            key.name = key_name
+            key.set_contents_from_string(test_string)        
+
+        # with one connection, a request made while the listing still had
+        # it would wait forever
+        for key in bucket.list():
+            self.assertEqual(key.get_contents_as_string(total_timeout=10.0),
+                             test_string)
+            key.delete()
+        
+        # delete the bucket
+        s3_connection.delete_bucket(bucket.name)
+        s3_connection.close()
+
+    @unittest.skipIf(os.environ.get("USE_BOTO", "0") == "1", 
+                     "_iter_keys is a motoboto internal")
+    def test_listing_streams_entries(self):
+        """
+        test that the first key of a page is generated before the page
+        has been read
+        """
+        # long names, so the page is larger than one read of the decoder
+        key_names = ["test-key{0:03}-".format(n) + "x" * 1000 
+                     for n in range(100)]
+        test_string = b"test string"
+
+        s3_connection = boto.connect_s3(max_connections_per_host=1)
+        bucket = s3_connection.create_unique_bucket()
+        self.assertTrue(bucket is not None)
+        hostname = bucket.create_http_connection().hostname
+        
+        for key_name in key_names:
+            key = Key(bucket)
+            key.name = key_name
+            key.set_contents_from_string(test_string)        
+        pool = s3_connection._connection_pool
+        self.assertEqual(pool.idle_count(hostname), 1)
+
+        values = dict()
+        keys = bucket._iter_keys(values, dedicated=True)
+        key = next(keys)
+        self.assertEqual(key.name, key_names[0])
+
+        # the listing still has its connection, and has not yet reached
+        # the end of the page
+        self.assertEqual(pool.idle_count(hostname), 0)
+        self.assertEqual(values, dict())
+
+        self.assertEqual([key.name for key in keys], key_names[1:])
+        self.assertEqual(values["truncated"], False)
+        self.assertEqual(pool.idle_count(hostname), 1)
+
+        for key in bucket.list():
+            key.delete()
+        s3_connection.delete_bucket(bucket.name)
+        s3_connection.close()
+
+    @unittest.skipIf(os.environ.get("USE_BOTO", "0") == "1", 
+                     "parallel_list is a motoboto extension")
+    def test_parallel_list(self):
+        """
+        test that a sharded parallel listing returns every key, in order
+        """
+        key_names = ["{0}/{1:03}".format(directory, n) 
+                     for directory in ["aaa", "bbb", "ccc", "ddd", "eee", ]
+                     for n in range(5)]
+
+        # create the bucket
+        bucket = self._s3_connection.create_unique_bucket()
+        self.assertTrue(bucket is not None)
+        for key in bucket.list():
+            key.delete()
+        
+        # create some keys
+        for key_name in key_names:
+            key = Key(bucket)
+            key.name = key_name
+            key.set_contents_from_string(os.urandom(1024))        
+
+        # boundaries sampled from the bucket
+        result_set = bucket.parallel_list(shard_count=3)
+        self.assertEqual(len(result_set.shard_ranges()), 3)
+        self.assertEqual([key.name for key in result_set], key_names)
+
+        # boundaries from a seed set, some falling between keys
+        result_set = bucket.parallel_list(boundaries=["bbb/002", "c", "ddd/"])
+        self.assertEqual([key.name for key in result_set], key_names)
+
+        # starting from a marker
+        result_set = bucket.parallel_list(marker="bbb/002")
+        self.assertEqual([key.name for key in result_set], key_names[8:])
+
+        # in arrival order
+        result_set = bucket.parallel_list(shard_count=4, ordered=False)
+        self.assertEqual(sorted(key.name for key in result_set), key_names)
+
+        # delete the keys
+        for key in bucket.list():
+            key.delete()
+        
+        # delete the bucket
+        self._s3_connection.delete_bucket(bucket.name)
+
+    @unittest.skipIf(os.environ.get("USE_BOTO", "0") == "1", 
+                     "parallel_list is a motoboto extension")
+    def test_parallel_list_flat_keyspace(self):
+        """
+        test that sampled boundaries spread a flat keyspace of more keys 
+        than one page over all the shards
+        """
+        shard_count = 4
+        key_names = ["key-{0:04}".format(n) for n in range(1200)]
+
+        # create the bucket
+        bucket = self._s3_connection.create_unique_bucket()
+        self.assertTrue(bucket is not None)
+        for key in bucket.list():
+            key.delete()
+        
+        # create some keys
+        for key_name in key_names:
+            key = Key(bucket)
+            key.name = key_name
+            key.set_contents_from_string(b"x")        
+
+        result_set = bucket.parallel_list(shard_count=shard_count)
+        shard_ranges = result_set.shard_ranges()
+        self.assertEqual(len(shard_ranges), shard_count)
+        for lower, upper in shard_ranges:
+            shard_size = len([key_name for key_name in key_names 
+                              if key_name > lower and 
+                              (upper is None or key_name <= upper)])
+            self.assertTrue(shard_size > 0, (lower, upper, ))
+            self.assertTrue(shard_size <= len(key_names) // 2, 
+                            (lower, upper, shard_size, ))
+        self.assertEqual([key.name for key in result_set], key_names)
+
+        # delete the keys
+        for key in bucket.list():
+            key.delete()
+        
+        # delete the bucket
+        self._s3_connection.delete_bucket(bucket.name)
         
 if __name__ == "__main__":
     initialize_logging()
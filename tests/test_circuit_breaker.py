@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+test_circuit_breaker.py
+
+test the states of the circuit breaker
+"""
+import errno
+import socket
+import time
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+from lumberyard.http_connection import LumberyardHTTPError
+
+from motoboto.circuit_breaker import CircuitBreaker, CircuitBreakerPolicy, \
+        CircuitOpenError, is_failure
+
+from tests.test_util import initialize_logging
+
+_open_time = 0.1
+
+class TestCircuitBreaker(unittest.TestCase):
+    """
+    test CircuitBreaker without a server
+    """
+
+    def _make_breaker(self):
+        return CircuitBreaker("test-host",
+                              failure_rate=0.5,
+                              min_requests=4,
+                              window=60.0,
+                              open_time=_open_time)
+
+    def test_failures(self):
+        """
+        only a sick host counts as a failure
+        """
+        self.assertTrue(is_failure(LumberyardHTTPError(503, "unavailable")))
+        self.assertTrue(is_failure(
+            socket.error(errno.ECONNREFUSED, "connection refused")
+        ))
+        self.assertFalse(is_failure(LumberyardHTTPError(404, "not found")))
+        self.assertFalse(is_failure(ValueError("bad argument")))
+        self.assertFalse(is_failure(IOError(errno.ENOSPC, "disk full")))
+
+    def test_opens_on_failure_rate(self):
+        """
+        the circuit opens when failure_rate of at least min_requests fail
+        """
+        breaker = self._make_breaker()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_success()
+        self.assertEqual(breaker.state, "closed")
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+        self.assertRaises(CircuitOpenError, breaker.before_request)
+
+    def test_stays_closed_under_failure_rate(self):
+        breaker = self._make_breaker()
+        for _ in range(10):
+            breaker.record_success()
+            breaker.record_success()
+            breaker.record_failure()
+            breaker.before_request()
+        self.assertEqual(breaker.state, "closed")
+
+    def test_half_open_probe(self):
+        """
+        after open_time one probe is let through, and its result closes or
+        opens the circuit again
+        """
+        breaker = self._make_breaker()
+        for _ in range(4):
+            breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+
+        time.sleep(_open_time)
+        self.assertEqual(breaker.state, "half-open")
+        probe = breaker.before_request()
+        self.assertNotEqual(probe, None)
+        # only one probe at a time
+        self.assertRaises(CircuitOpenError, breaker.before_request)
+        breaker.record_failure(probe)
+        self.assertEqual(breaker.state, "open")
+        self.assertRaises(CircuitOpenError, breaker.before_request)
+
+        time.sleep(_open_time)
+        probe = breaker.before_request()
+        breaker.record_success(probe)
+        self.assertEqual(breaker.state, "closed")
+        self.assertEqual(breaker.before_request(), None)
+
+    def test_results_while_open(self):
+        """
+        while the circuit is open, only the probe's result counts: not
+        that of a request sent before it opened
+        """
+        breaker = self._make_breaker()
+        for _ in range(4):
+            breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+
+        # a request that was in flight when the circuit opened
+        breaker.record_success()
+        self.assertEqual(breaker.state, "open")
+        self.assertRaises(CircuitOpenError, breaker.before_request)
+
+        time.sleep(_open_time)
+        probe = breaker.before_request()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "half-open")
+        self.assertRaises(CircuitOpenError, breaker.before_request)
+        breaker.record_success(probe)
+        self.assertEqual(breaker.state, "closed")
+
+    def test_lost_probe(self):
+        """
+        a probe that never reports is given up after open_time
+        """
+        breaker = self._make_breaker()
+        for _ in range(4):
+            breaker.record_failure()
+        time.sleep(_open_time)
+        lost_probe = breaker.before_request()
+        self.assertRaises(CircuitOpenError, breaker.before_request)
+        time.sleep(_open_time)
+        probe = breaker.before_request()
+        breaker.record_success(lost_probe)
+        self.assertEqual(breaker.state, "half-open")
+        breaker.record_success(probe)
+        self.assertEqual(breaker.state, "closed")
+
+    def test_policy_states(self):
+        """
+        the policy keeps a breaker for each host
+        """
+        policy = CircuitBreakerPolicy(min_requests=1)
+        policy.breaker("good-host").record_success()
+        policy.breaker("bad-host").record_failure()
+        self.assertTrue(policy.breaker("good-host") is
+                        policy.breaker("good-host"))
+        self.assertEqual(policy.states(), {"good-host" : "closed",
+                                           "bad-host"  : "open", })
+
+if __name__ == "__main__":
+    initialize_logging()
+    unittest.main()
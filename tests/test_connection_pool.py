@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+test_connection_pool.py
+
+test that motoboto reuses keep-alive connections to nimbus.io
+"""
+import logging
+import os
+import threading
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+assert os.environ.get("USE_BOTO", "0") == "0"
+
+from lumberyard.http_util import compute_collection_hostname
+
+import motoboto
+from motoboto.s3.key import Key
+
+from tests.test_util import initialize_logging
+
+_max_connections_per_host = 3
+
+def _clear_keys(bucket):
+    for key in bucket.get_all_keys():
+        key.delete()
+
+def _clear_bucket(s3_connection, bucket):
+    _clear_keys(bucket)
+    s3_connection.delete_bucket(bucket.name)
+
+class TestConnectionPool(unittest.TestCase):
+    """
+    test the keep-alive connection pool shared by the objects of an
+    S3Emulator
+    """
+
+    def setUp(self):
+        log = logging.getLogger("setUp")
+        log.debug("start")
+        self.tearDown()
+        self._s3_connection = motoboto.connect_s3(
+            max_connections_per_host=_max_connections_per_host
+        )
+        self._pool = self._s3_connection._connection_pool
+        log.debug("finish")
+
+    def tearDown(self):
+        log = logging.getLogger("tearDown")
+        log.debug("start")
+        if hasattr(self, "_s3_connection") \
+        and self._s3_connection is not None:
+            log.debug("closing s3 connection")
+            self._s3_connection.close()
+            self._s3_connection = None
+        log.debug("finish")
+
+    def test_sequential_requests_reuse_connection(self):
+        """
+        a series of requests to one collection should use one connection
+        """
+        key_name = "test-key"
+        test_string = b"test string" * 100
+
+        bucket = self._s3_connection.create_unique_bucket()
+        hostname = compute_collection_hostname(bucket.name)
+
+        write_key = Key(bucket)
+        write_key.name = key_name
+        write_key.set_contents_from_string(test_string)
+        self.assertEqual(self._pool.idle_count(hostname), 1)
+
+        for _ in range(10):
+            read_key = Key(bucket, key_name)
+            self.assertTrue(read_key.exists())
+            self.assertEqual(read_key.get_contents_as_string(), test_string)
+            self.assertEqual(self._pool.idle_count(hostname), 1)
+
+        # a missing key is an error response, but it should not cost us
+        # the connection
+        missing_key = Key(bucket, "no-such-key")
+        self.assertFalse(missing_key.exists())
+        self.assertEqual(self._pool.idle_count(hostname), 1)
+
+        _clear_bucket(self._s3_connection, bucket)
+
+    def test_concurrent_requests_are_capped(self):
+        """
+        concurrent requests should never hold more connections than the cap
+        """
+        key_name = "test-key"
+        test_string = b"test string" * 100
+        thread_count = 3 * _max_connections_per_host
+
+        bucket = self._s3_connection.create_unique_bucket()
+        hostname = compute_collection_hostname(bucket.name)
+
+        write_key = Key(bucket)
+        write_key.name = key_name
+        write_key.set_contents_from_string(test_string)
+
+        errors = list()
+        def _read_key():
+            try:
+                for _ in range(10):
+                    read_key = Key(bucket, key_name)
+                    data = read_key.get_contents_as_string()
+                    self.assertEqual(data, test_string)
+            except Exception as instance:
+                errors.append(instance)
+
+        threads = [threading.Thread(target=_read_key)
+                   for _ in range(thread_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertTrue(
+            self._pool.idle_count(hostname) <= _max_connections_per_host
+        )
+
+        _clear_bucket(self._s3_connection, bucket)
+
+    def test_checkout_without_waiting(self):
+        """
+        a checkout that may not wait gets nothing when the cap is reached
+        """
+        hostname = "no-such-host.nimbus.io"
+        checked_out = [self._pool._checkout(hostname)
+                       for _ in range(_max_connections_per_host)]
+        self.assertEqual(self._pool._checkout(hostname, wait=False), None)
+
+        connection, _ = checked_out.pop()
+        self._pool._checkin(hostname, connection, False)
+        self.assertTrue(self._pool._checkout(hostname, wait=False) is not None)
+
+    def test_dedicated_checkout(self):
+        """
+        a dedicated checkout does not wait when the cap is reached, and its 
+        connection is only kept if there is room for it under the cap
+        """
+        hostname = "no-such-host.nimbus.io"
+        checked_out = [self._pool._checkout(hostname)
+                       for _ in range(_max_connections_per_host)]
+        connection, reused = self._pool._checkout(hostname, 
+                                                  wait=False, 
+                                                  dedicated=True)
+        self.assertFalse(reused)
+        self._pool._checkin(hostname, connection, True, dedicated=True)
+        self.assertEqual(self._pool.idle_count(hostname), 0)
+
+        connection, _ = checked_out.pop()
+        self._pool._checkin(hostname, connection, True)
+        self.assertEqual(self._pool.idle_count(hostname), 1)
+        connection, reused = self._pool._checkout(hostname, dedicated=True)
+        self.assertTrue(reused)
+        self._pool._checkin(hostname, connection, True, dedicated=True)
+        self.assertEqual(self._pool.idle_count(hostname), 1)
+
+    def test_close_drains_pool(self):
+        """
+        S3Emulator.close() should close all idle connections
+        """
+        self._s3_connection.get_all_buckets()
+        self.assertTrue(self._pool.idle_count() > 0)
+        self._s3_connection.close()
+        self.assertEqual(self._pool.idle_count(), 0)
+        self._s3_connection = None
+
+if __name__ == "__main__":
+    initialize_logging()
+    unittest.main()
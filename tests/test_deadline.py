@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+test_deadline.py
+
+test deadline scopes, and how they combine
+"""
+import socket
+import threading
+import time
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+from motoboto.deadline import Deadline, DeadlineExceeded, check_deadline, \
+        compute_read_size, current_deadline, deadline_scope, \
+        propagate_deadline, with_deadline
+from motoboto.retry import is_retryable_error
+
+from tests.test_util import initialize_logging
+
+class _Target(object):
+    @with_deadline
+    def method(self, value):
+        return value, current_deadline()
+
+class TestDeadline(unittest.TestCase):
+    """
+    test deadlines without a server
+    """
+
+    def test_no_scope(self):
+        self.assertEqual(current_deadline(), None)
+        check_deadline()
+
+    def test_compute_timeout(self):
+        """
+        a step gets the smaller of its own timeout and the time left
+        """
+        deadline = Deadline()
+        self.assertEqual(deadline.compute_timeout(), None)
+        self.assertEqual(deadline.compute_timeout(5.0), 5.0)
+
+        deadline = Deadline(expires=time.time() + 10.0)
+        self.assertEqual(deadline.compute_timeout(5.0), 5.0)
+        self.assertTrue(deadline.compute_timeout(20.0) <= 10.0)
+
+        deadline = Deadline(expires=time.time() - 1.0)
+        self.assertRaises(DeadlineExceeded, deadline.compute_timeout, 5.0)
+        self.assertRaises(DeadlineExceeded, deadline.check)
+
+    def test_nested_scopes(self):
+        """
+        an inner scope is bound by the outer one's limits too
+        """
+        with deadline_scope(total_timeout=10.0, connect_timeout=1.0):
+            outer_deadline = current_deadline()
+            with deadline_scope(total_timeout=60.0,
+                                first_byte_timeout=2.0) as inner_deadline:
+                self.assertTrue(current_deadline() is inner_deadline)
+                self.assertEqual(inner_deadline.expires,
+                                 outer_deadline.expires)
+                self.assertEqual(inner_deadline.connect_timeout, 1.0)
+                self.assertEqual(inner_deadline.first_byte_timeout, 2.0)
+            self.assertTrue(current_deadline() is outer_deadline)
+        self.assertEqual(current_deadline(), None)
+
+    def test_expired_scope(self):
+        with deadline_scope(total_timeout=0.0):
+            self.assertRaises(DeadlineExceeded, check_deadline)
+
+    def test_compute_read_size(self):
+        """
+        a body is read in chunks only when there is a total deadline to
+        check between them
+        """
+        self.assertEqual(compute_read_size(1000, 10), 1000)
+        self.assertEqual(compute_read_size(None, 10), None)
+        with deadline_scope(first_byte_timeout=1.0):
+            self.assertEqual(compute_read_size(1000, 10), 1000)
+        with deadline_scope(total_timeout=10.0):
+            self.assertEqual(compute_read_size(1000, 10), 10)
+            self.assertEqual(compute_read_size(5, 10), 5)
+            self.assertEqual(compute_read_size(None, 10), 10)
+
+    def test_timeout_after_deadline(self):
+        """
+        a socket timeout once the deadline has passed is DeadlineExceeded
+        """
+        def _time_out(total_timeout):
+            with deadline_scope(total_timeout=total_timeout):
+                raise socket.timeout("timed out")
+        self.assertRaises(DeadlineExceeded, _time_out, 0.0)
+        try:
+            _time_out(10.0)
+        except DeadlineExceeded:
+            self.fail("deadline has not passed")
+        except socket.timeout:
+            pass
+
+    def test_with_deadline(self):
+        """
+        the decorated method takes the timeouts, and runs in a scope only
+        when one is given
+        """
+        target = _Target()
+        self.assertEqual(target.method(42), (42, None, ))
+        value, deadline = target.method(42, first_byte_timeout=3.0)
+        self.assertEqual(value, 42)
+        self.assertEqual(deadline.first_byte_timeout, 3.0)
+        self.assertEqual(deadline.expires, None)
+        self.assertEqual(current_deadline(), None)
+
+    def test_propagate_deadline(self):
+        """
+        a thread started for work in a scope runs in the scope
+        """
+        results = list()
+        def _run():
+            results.append(current_deadline())
+
+        with deadline_scope(total_timeout=10.0) as deadline:
+            thread = threading.Thread(target=propagate_deadline(_run))
+            thread.start()
+            thread.join()
+        self.assertTrue(results[0] is deadline)
+
+        thread = threading.Thread(target=propagate_deadline(_run))
+        thread.start()
+        thread.join()
+        self.assertEqual(results[1], None)
+
+    def test_not_retried(self):
+        """
+        there is no point retrying when the deadline has run out
+        """
+        self.assertFalse(is_retryable_error(DeadlineExceeded("expired")))
+
+if __name__ == "__main__":
+    initialize_logging()
+    unittest.main()
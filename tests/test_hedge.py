@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+test_hedge.py
+
+test the decisions of the hedge policy
+"""
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+from motoboto.hedge import HedgePolicy
+
+from tests.test_util import initialize_logging
+
+class TestHedge(unittest.TestCase):
+    """
+    test HedgePolicy without a server
+    """
+
+    def test_no_hedging_without_samples(self):
+        """
+        we don't hedge until we have seen min_samples latencies
+        """
+        policy = HedgePolicy(min_samples=10)
+        for _ in range(9):
+            policy.record_latency(0.01)
+        self.assertEqual(policy.compute_hedge_delay(), None)
+        policy.record_latency(0.01)
+        self.assertEqual(policy.compute_hedge_delay(), 0.01)
+
+    def test_percentile_delay(self):
+        """
+        the hedge delay is the percentile latency of the window
+        """
+        policy = HedgePolicy(percentile=90.0, min_samples=10,
+                             window_size=100)
+        # the delay is brought up to date every 50 latencies
+        for _ in range(10):
+            policy.record_latency(0.0)
+        for n in range(100):
+            policy.record_latency(n / 1000.0)
+        self.assertEqual(policy.compute_hedge_delay(), 0.09)
+
+        # old latencies leave the window
+        for _ in range(100):
+            policy.record_latency(1.0)
+        self.assertEqual(policy.compute_hedge_delay(), 1.0)
+
+    def test_hedges_are_capped(self):
+        """
+        no more than max_hedge_ratio of the requests are hedged
+        """
+        policy = HedgePolicy(max_hedge_ratio=0.1)
+        hedge_count = 0
+        for _ in range(1000):
+            policy.request_sent()
+            if policy.start_hedge():
+                hedge_count += 1
+        self.assertTrue(hedge_count <= 101, hedge_count)
+        self.assertEqual(policy.hedges_sent, hedge_count)
+
+if __name__ == "__main__":
+    initialize_logging()
+    unittest.main()
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+test_http_timestamp.py
+
+test parsing HTTP timestamps
+"""
+from datetime import datetime
+from email.utils import formatdate
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+from motoboto.s3 import util
+from motoboto.s3.util import http_timestamp_str, parse_http_timestamp
+
+from tests.test_util import initialize_logging
+
+_timestamp_count = 10 * 1000
+_invalid_timestamp_strs = [
+    "",
+    "not a timestamp",
+    "Sun, 06 Nov 1994 08:49:37",
+    "Sun, 06 Nov 1994 08:49:37 UTC",
+    "Sun, 31 Nov 1994 08:49:37 GMT",
+    "Sun, 06 Nov 1994 24:49:37 GMT",
+    "Sun, 06 Nov 1994 08:49:60 GMT",
+    "Sun, 06 Nov 0000 08:49:37 GMT",
+    "Sun, 06 Xyz 1994 08:49:37 GMT",
+    "Sun, 06 Nov 1994 084937.5 GMT",
+]
+
+def _strptime(timestamp_str):
+    return datetime.strptime(timestamp_str, util._http_timestamp_format)
+
+def _result_or_error(function, timestamp_str):
+    try:
+        return function(timestamp_str)
+    except Exception as instance:
+        return (type(instance), str(instance), )
+
+class TestHTTPTimestamp(unittest.TestCase):
+    """
+    test that parse_http_timestamp matches strptime
+    """
+
+    def setUp(self):
+        util._http_timestamp_memo.clear()
+
+    def tearDown(self):
+        util._http_timestamp_memo.clear()
+
+    def test_fixed_layout(self):
+        """
+        timestamps in the layout nimbus.io sends parse the same as strptime
+        """
+        for n in range(_timestamp_count):
+            timestamp_str = formatdate(n * 123457.0, usegmt=True)
+            self.assertEqual(parse_http_timestamp(timestamp_str), 
+                             _strptime(timestamp_str), timestamp_str)
+            # a second time, from the memo
+            self.assertEqual(parse_http_timestamp(timestamp_str), 
+                             _strptime(timestamp_str), timestamp_str)
+
+    def test_round_trip(self):
+        """
+        parse what http_timestamp_str formats
+        """
+        timestamp = datetime(2012, 2, 29, 23, 59, 59)
+        self.assertEqual(parse_http_timestamp(http_timestamp_str(timestamp)),
+                         timestamp)
+
+    def test_other_layouts(self):
+        """
+        layouts strptime accepts, other than the fixed one, still parse
+        """
+        for timestamp_str in ["Sun,  6 Nov 1994 08:49:37 GMT",
+                              "Sun, 6 Nov 1994 08:49:37 GMT",
+                              "sun, 06 nov 1994 08:49:37 GMT", ]:
+            self.assertEqual(parse_http_timestamp(timestamp_str),
+                             _strptime(timestamp_str), timestamp_str)
+
+    def test_invalid_timestamps(self):
+        """
+        invalid timestamps raise the same errors as strptime
+        """
+        for timestamp_str in _invalid_timestamp_strs + [None, b"bytes", ]:
+            self.assertEqual(
+                _result_or_error(parse_http_timestamp, timestamp_str),
+                _result_or_error(_strptime, timestamp_str),
+                repr(timestamp_str)
+            )
+
+    def test_memo_is_bounded(self):
+        """
+        the memo never holds more than its maximum size
+        """
+        for n in range(util._http_timestamp_memo_size * 2):
+            parse_http_timestamp(formatdate(n, usegmt=True))
+            self.assertTrue(
+                len(util._http_timestamp_memo) <= \
+                    util._http_timestamp_memo_size
+            )
+
+if __name__ == "__main__":
+    initialize_logging()
+    unittest.main()
@@ -9,11 +9,13 @@ note that you need credentials for both AWS and nimbus.io
 from __future__ import print_function
 
 import filecmp
+import io
 import logging
 import os
 import os.path
 import shutil
 import sys
+import zipfile
 try:
     import unittest2 as unittest
 except ImportError:
@@ -121,6 +123,105 @@ class TestKey(unittest.TestCase):
         # delete the bucket
         self._s3_connection.delete_bucket(bucket.name)
         
+    @unittest.skipIf(os.environ.get("USE_BOTO", "0") == "1", 
+                     "get_contents_into is motoboto only")
+    def test_key_with_buffers(self):
+        """
+        test retrieving into a caller's buffer and into a bytearray
+        """
+        key_name = "test-key"
+        test_string = os.urandom(1024 * 1024 + 17)
+
+        # create the bucket
+        bucket = self._s3_connection.create_unique_bucket()
+        self.assertTrue(bucket is not None)
+
+        write_key = Key(bucket, key_name)
+        write_key.set_contents_from_string(test_string)        
+
+        read_key = Key(bucket, key_name)
+
+        buffer = bytearray(len(test_string) + 100)
+        bytes_read = read_key.get_contents_into(buffer)
+        self.assertEqual(bytes_read, len(test_string))
+        self.assertEqual(buffer[:bytes_read], test_string)
+
+        view = memoryview(buffer)[10:]
+        bytes_read = read_key.get_contents_into(view, 
+                                                slice_offset=1000, 
+                                                slice_size=2000)
+        self.assertEqual(bytes_read, 2000)
+        self.assertEqual(buffer[10:2010], test_string[1000:3000])
+
+        self.assertRaises(ValueError, 
+                          read_key.get_contents_into, 
+                          bytearray(len(test_string) - 1))
+
+        result = read_key.get_contents_as_bytearray()
+        self.assertTrue(isinstance(result, bytearray))
+        self.assertEqual(result, test_string)
+
+        # delete the key
+        read_key.delete()
+        
+        # delete the bucket
+        self._s3_connection.delete_bucket(bucket.name)
+        
+    @unittest.skipIf(os.environ.get("USE_BOTO", "0") == "1", 
+                     "Key.open is motoboto only")
+    def test_key_open(self):
+        """
+        test reading a key as a seekable file
+        """
+        key_name = "test-key.zip"
+        member_names = ["member-{0:02}".format(n) for n in range(10)]
+        members = dict((name, os.urandom(64 * 1024), ) 
+                       for name in member_names)
+
+        zip_file = io.BytesIO()
+        with zipfile.ZipFile(zip_file, "w") as archive:
+            for name in member_names:
+                archive.writestr(name, members[name])
+        test_string = zip_file.getvalue()
+
+        # create the bucket
+        bucket = self._s3_connection.create_unique_bucket()
+        self.assertTrue(bucket is not None)
+
+        write_key = Key(bucket, key_name)
+        write_key.set_contents_from_string(test_string)        
+
+        read_key = Key(bucket, key_name)
+
+        # zipfile seeks to the central directory at the end, then to the
+        # member
+        with read_key.open(readahead=16 * 1024) as key_file:
+            with zipfile.ZipFile(key_file) as archive:
+                self.assertEqual(archive.namelist(), member_names)
+                self.assertEqual(archive.read(member_names[5]), 
+                                 members[member_names[5]])
+
+        with read_key.open() as key_file:
+            self.assertTrue(key_file.seekable())
+            self.assertEqual(key_file.seek(0, os.SEEK_END), len(test_string))
+            key_file.seek(1000)
+            self.assertEqual(key_file.read(10), test_string[1000:1010])
+            self.assertEqual(key_file.tell(), 1010)
+            key_file.seek(-10, os.SEEK_CUR)
+            self.assertEqual(key_file.read(), test_string[1000:])
+            self.assertEqual(key_file.read(1), b"")
+
+        with read_key.open(readahead=0) as key_file:
+            buffer = bytearray(100)
+            self.assertEqual(key_file.readinto(buffer), 100)
+            self.assertEqual(buffer, test_string[:100])
+
+        # delete the key
+        read_key.delete()
+        
+        # delete the bucket
+        self._s3_connection.delete_bucket(bucket.name)
+        
     def test_key_with_files(self):
         """
         test simple key 'from_file' and 'to_file' functions
@@ -247,6 +348,47 @@ class TestKey(unittest.TestCase):
         # delete the bucket
         self._s3_connection.delete_bucket(bucket.name)
         
+    @unittest.skipIf(os.environ.get("USE_BOTO", "0") == "1", 
+                     "sending files from disk is motoboto only")
+    def test_key_with_file_from_position(self):
+        """
+        test that a file on disk is archived from its current position,
+        and left at its end
+        """
+        key_name = "test_key_with_file_from_position"
+        test_file_path = os.path.join(
+            test_dir_path, "test_key_with_file_from_position"
+        )
+        test_blob = os.urandom(3 * 1024 ** 2 + 1234)
+        start_position = 12345
+        with open(test_file_path, "wb") as output_file:
+            output_file.write(test_blob)
+
+        # create the bucket
+        bucket = self._s3_connection.create_unique_bucket()
+        self.assertTrue(bucket is not None)
+
+        progress = list()
+        write_key = Key(bucket, key_name)
+        with open(test_file_path, "rb") as archive_file:
+            archive_file.seek(start_position)
+            write_key.set_contents_from_file(
+                archive_file, 
+                cb=lambda bytes_sent, _: progress.append(bytes_sent)
+            )
+            self.assertEqual(archive_file.tell(), len(test_blob))
+        self.assertEqual(progress[-1], len(test_blob) - start_position)
+
+        read_key = Key(bucket, key_name)
+        self.assertEqual(read_key.get_contents_as_string(), 
+                         test_blob[start_position:])
+
+        # delete the key
+        read_key.delete()
+        
+        # delete the bucket
+        self._s3_connection.delete_bucket(bucket.name)
+
     def test_key_with_meta(self):
         """
         test simple key with metadata added
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+test_listing_decoder.py
+
+test decoding JSON listing pages incrementally
+"""
+import io
+import json
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+from motoboto.s3.listing_decoder import ListingDecoder
+
+from tests.test_util import initialize_logging
+
+_entry_count = 100
+
+class _ChunkRecorder(io.BytesIO):
+    """
+    a response that counts how many bytes have been read from it
+    """
+    def __init__(self, data):
+        io.BytesIO.__init__(self, data)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = io.BytesIO.read(self, size)
+        self.bytes_read += len(data)
+        return data
+
+def _listing_page(entry_count, truncated=True):
+    return {
+        "truncated" : truncated,
+        "key_data" : [
+            {"key" : u"key-é-{0:04}".format(n),
+             "version_identifier" : "{0:032x}".format(n),
+             "timestamp" : "Sun, 06 Nov 1994 08:49:37 GMT", }
+            for n in range(entry_count)
+        ],
+        "count" : -12345.678e-2,
+    }
+
+class TestListingDecoder(unittest.TestCase):
+    """
+    test ListingDecoder
+    """
+
+    def test_every_chunk_size(self):
+        """
+        the decoded page is the same however the response is chunked
+        """
+        page = _listing_page(10)
+        data = json.dumps(page, indent=1).encode("utf-8")
+        for chunk_size in range(1, 64):
+            decoder = ListingDecoder(io.BytesIO(data), 
+                                     ["key_data", "prefixes", ],
+                                     chunk_size=chunk_size)
+            entries = [entry for _, entry in decoder]
+            self.assertEqual(entries, page["key_data"], chunk_size)
+            self.assertEqual(decoder.values["truncated"], True)
+            self.assertEqual(decoder.values["count"], page["count"])
+            self.assertEqual(decoder.streamed, set(["key_data"]))
+
+    def test_entries_arrive_early(self):
+        """
+        the first entry is decoded before the whole page has been read
+        """
+        data = json.dumps(_listing_page(_entry_count)).encode("utf-8")
+        response = _ChunkRecorder(data)
+        decoder = ListingDecoder(response, ["key_data", ], chunk_size=1024)
+        _, entry = next(iter(decoder))
+        self.assertEqual(entry["version_identifier"], "{0:032x}".format(0))
+        self.assertTrue(response.bytes_read < len(data) // 2, 
+                        response.bytes_read)
+
+    def test_empty_lists(self):
+        """
+        empty lists and an empty page
+        """
+        data = b'{"prefixes": [], "truncated": false}'
+        decoder = ListingDecoder(io.BytesIO(data), ["key_data", "prefixes", ])
+        self.assertEqual(list(decoder), [])
+        self.assertEqual(decoder.values, {"truncated" : False})
+        self.assertEqual(decoder.streamed, set(["prefixes"]))
+
+        decoder = ListingDecoder(io.BytesIO(b"{}"), ["key_data", ])
+        self.assertEqual(list(decoder), [])
+        self.assertEqual(decoder.streamed, set())
+
+    def test_invalid_pages(self):
+        """
+        invalid and incomplete pages raise ValueError
+        """
+        for data in [b"", 
+                     b"[]", 
+                     b'{"key_data": [{"key": "a"}', 
+                     b'{"key_data" [], "truncated": false}', 
+                     b'{"key_data": [1 2], "truncated": false}', ]:
+            decoder = ListingDecoder(io.BytesIO(data), 
+                                     ["key_data", ], 
+                                     chunk_size=3)
+            self.assertRaises(ValueError, list, decoder)
+
+if __name__ == "__main__":
+    initialize_logging()
+    unittest.main()
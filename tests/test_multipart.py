@@ -6,6 +6,7 @@ test that motoboto can replace boto for s3 functions
 
 note that you need credentials for both AWS and nimbus.io
 """
+import io
 import logging
 import os
 import os.path
@@ -22,6 +23,8 @@ if os.environ.get("USE_BOTO", "0") == "1":
 else:
     import motoboto as boto
     from motoboto.s3.key import Key
+    from motoboto.s3.multipart import part_lister
+    from motoboto.s3.resumable_upload_handler import ResumableUploadHandler
 
 from tests.test_util import test_dir_path, initialize_logging
 
@@ -116,9 +119,214 @@ class TestMultipart(unittest.TestCase):
         # delete the key
         key.delete()
         
+        # delete the bucket
+        self._s3_connection.delete_bucket(bucket.name)
+    @unittest.skipIf(os.environ.get("USE_BOTO", "0") == "1", 
+                     "automatic multipart upload is motoboto only")
+    def test_parallel_set_contents_from_file(self):
+        """
+        test that set_contents_from_file uploads a large file in parts
+        """
+        key_name = "test_key"
+        part_size = 1024 ** 2
+        test_file_path = os.path.join(test_dir_path, "test_parallel_upload")
+        retrieve_path = os.path.join(test_dir_path, "retrieve_parallel")
+        test_blob = os.urandom(part_size * 5 + 1234)
+        with open(test_file_path, "wb") as output_file:
+            output_file.write(test_blob)
+
+        # create the bucket
+        bucket = self._s3_connection.create_unique_bucket()
+        self.assertTrue(bucket is not None)
+
+        # a key whose versions are listed after ours
+        other_key = Key(bucket, key_name + "-other")
+        other_key.set_contents_from_string(b"other")
+
+        progress = list()
+        key = Key(bucket, key_name)
+        with open(test_file_path, "rb") as input_file:
+            key.set_contents_from_file(
+                input_file, 
+                cb=lambda uploaded, size: progress.append((uploaded, size, )),
+                multipart_threshold=part_size,
+                part_size=part_size,
+                concurrency=3
+            )
+
+        # the key knows the version the upload made
+        versions = [version for version in bucket.get_all_versions()
+                    if version.name == key_name]
+        self.assertEqual(len(versions), 1)
+        self.assertEqual(key.version_id, versions[0].version_id)
+
+        # one progress report for each part
+        self.assertEqual(len(progress), 6)
+        self.assertEqual(progress[-1], (len(test_blob), len(test_blob), ))
+
+        # no upload left in progress
+        upload_list = bucket.get_all_multipart_uploads()
+        self.assertEqual(len(upload_list), 0)
+
+        key = Key(bucket, key_name)
+        with open(retrieve_path, "wb") as output_file:
+            key.get_contents_to_file(output_file)
+        with open(retrieve_path, "rb") as input_file:
+            self.assertEqual(input_file.read(), test_blob, "compare files")
+
+        # delete the key
+        key.delete()
+        other_key.delete()
+        
         # delete the bucket
         self._s3_connection.delete_bucket(bucket.name)
         
+    @unittest.skipIf(os.environ.get("USE_BOTO", "0") == "1", 
+                     "set_contents_from_stream is motoboto only")
+    def test_set_contents_from_stream(self):
+        """
+        test archiving streams of unknown length, shorter and longer than 
+        one part
+        """
+        key_name = "test_key"
+        part_size = 1024 ** 2
+        small_blob = os.urandom(1234)
+        large_blob = os.urandom(part_size * 3 + 1234)
+
+        def _chunks(data, chunk_size):
+            for offset in range(0, len(data), chunk_size):
+                yield data[offset:offset+chunk_size]
+
+        # create the bucket
+        bucket = self._s3_connection.create_unique_bucket()
+        self.assertTrue(bucket is not None)
+
+        key = Key(bucket, key_name)
+        key.set_contents_from_stream(_chunks(small_blob, 100), 
+                                     part_size=part_size)
+        self.assertEqual(key.get_contents_as_string(), small_blob)
+
+        progress = list()
+        key = Key(bucket, key_name)
+        key.set_contents_from_stream(
+            _chunks(large_blob, 64 * 1024 + 7), 
+            cb=lambda uploaded, size: progress.append((uploaded, size, )),
+            part_size=part_size,
+            concurrency=2
+        )
+        self.assertEqual(len(progress), 4)
+        self.assertEqual(progress[-1], (len(large_blob), None, ))
+
+        # no upload left in progress
+        upload_list = bucket.get_all_multipart_uploads()
+        self.assertEqual(len(upload_list), 0)
+
+        key = Key(bucket, key_name)
+        self.assertEqual(key.get_contents_as_string(), large_blob)
+
+        # a file object works as well
+        key = Key(bucket, key_name)
+        key.set_contents_from_stream(io.BytesIO(large_blob), 
+                                     part_size=part_size)
+        key = Key(bucket, key_name)
+        self.assertEqual(key.get_contents_as_string(), large_blob)
+
+        # delete the key
+        key.delete()
+        
+        # delete the bucket
+        self._s3_connection.delete_bucket(bucket.name)
+
+    @unittest.skipIf(os.environ.get("USE_BOTO", "0") == "1", 
+                     "ResumableUploadHandler is motoboto only")
+    def test_resumable_upload(self):
+        """
+        test that an upload which fails partway is continued from its 
+        tracker file, uploading only the missing parts
+        """
+        key_name = "test_key"
+        part_size = 1024 ** 2
+        failing_size = part_size * 2 + 10
+        test_file_path = os.path.join(test_dir_path, "test_resumable_upload")
+        tracker_file_path = os.path.join(test_dir_path, "tracker-file")
+        test_blob = os.urandom(part_size * 4 + 1234)
+        with open(test_file_path, "wb") as output_file:
+            output_file.write(test_blob)
+
+        class _FailingFile(object):
+            """
+            a file that fails after the first failing_size bytes
+            """
+            def __init__(self, file_object):
+                self._file_object = file_object
+
+            def read(self, size):
+                if self._file_object.tell() + size > failing_size:
+                    raise IOError("simulated read failure")
+                return self._file_object.read(size)
+
+            def seek(self, offset, whence=os.SEEK_SET):
+                return self._file_object.seek(offset, whence)
+
+            def tell(self):
+                return self._file_object.tell()
+
+        # create the bucket
+        bucket = self._s3_connection.create_unique_bucket()
+        self.assertTrue(bucket is not None)
+
+        key = Key(bucket, key_name)
+        with open(test_file_path, "rb") as input_file:
+            upload_handler = ResumableUploadHandler(tracker_file_path, 
+                                                    num_retries=0)
+            self.assertRaises(IOError, 
+                              key.set_contents_from_file,
+                              _FailingFile(input_file),
+                              part_size=part_size,
+                              concurrency=1,
+                              res_upload_handler=upload_handler)
+        self.assertTrue(os.path.exists(tracker_file_path))
+
+        # the upload is still in progress, with the first two parts
+        upload_list = bucket.get_all_multipart_uploads()
+        self.assertEqual(len(upload_list), 1)
+        parts = upload_list[0].get_all_parts()
+        self.assertEqual([part.part_number for part in parts], [1, 2, ])
+        self.assertEqual([part.size for part in parts], 
+                         [part_size, part_size, ])
+        parts = list(part_lister(upload_list[0]))
+        self.assertEqual([part.part_number for part in parts], [1, 2, ])
+
+        # continue it
+        progress = list()
+        key = Key(bucket, key_name)
+        with open(test_file_path, "rb") as input_file:
+            upload_handler = ResumableUploadHandler(tracker_file_path)
+            key.set_contents_from_file(
+                input_file, 
+                cb=lambda uploaded, size: progress.append((uploaded, size, )),
+                part_size=part_size,
+                res_upload_handler=upload_handler
+            )
+            self.assertEqual(input_file.tell(), len(test_blob))
+        self.assertFalse(os.path.exists(tracker_file_path))
+
+        # only the last three parts were uploaded
+        self.assertEqual(len(progress), 3)
+        self.assertEqual(progress[-1], (len(test_blob), len(test_blob), ))
+
+        upload_list = bucket.get_all_multipart_uploads()
+        self.assertEqual(len(upload_list), 0)
+
+        key = Key(bucket, key_name)
+        self.assertEqual(key.get_contents_as_string(), test_blob)
+
+        # delete the key
+        key.delete()
+        
+        # delete the bucket
+        self._s3_connection.delete_bucket(bucket.name)
+
 if __name__ == "__main__":
     initialize_logging()
     unittest.main()
@@ -207,6 +207,86 @@ class TestResumableDownloadHandler(unittest.TestCase):
         # delete the bucket
         self._s3_connection.delete_bucket(bucket.name)
         
+    @unittest.skipIf(not _motoboto, "motoboto only")
+    def test_resume_from_tracker_file(self):
+        """
+        test get_contents_to_file resuming from the bytes recorded in the
+        tracker file, and starting again when the key has been written over
+        """
+        key_name = "test-key"
+        test_file_size = 1024 ** 2
+        interrupted_size = 1024 * 42
+
+        test_data = os.urandom(test_file_size)
+
+        # create the bucket
+        bucket = self._s3_connection.create_unique_bucket()
+        self.assertTrue(bucket is not None)
+
+        write_key = Key(bucket)
+        write_key.name = key_name
+        write_key.set_contents_from_string(test_data)
+        self.assertTrue(write_key.exists())
+
+        tracker_file_path = os.path.join(
+            test_dir_path, "tracker-file"
+        )
+        retrieve_file_path = os.path.join(
+            test_dir_path, "test_resume_from_tracker_file"
+        )
+
+        # a download interrupted after interrupted_size bytes
+        with open(retrieve_file_path, "wb") as output_file:
+            output_file.write(test_data[:interrupted_size])
+        download_handler = ResumableDownloadHandler(
+            tracker_file_name=tracker_file_path
+        )
+        download_handler._save_tracker_info(write_key, 
+                                            bytes_completed=interrupted_size)
+        self.assertTrue(os.path.exists(tracker_file_path))
+
+        # a new handler picks up the tracker file
+        download_handler = ResumableDownloadHandler(
+            tracker_file_name=tracker_file_path
+        )
+        with open(retrieve_file_path, "ab") as retrieve_file:
+            write_key.get_contents_to_file(retrieve_file, 
+                                           res_download_handler=\
+                                            download_handler)      
+
+        with open(retrieve_file_path, "rb") as retrieve_file:
+            retrieved_data = retrieve_file.read()
+        self.assertEqual(len(retrieved_data), len(test_data))
+        self.assertTrue(retrieved_data == test_data)
+        self.assertFalse(os.path.exists(tracker_file_path))
+
+        # the tracker names a version other than the one we ask for,
+        # so the partial file is not trusted
+        with open(retrieve_file_path, "wb") as output_file:
+            output_file.write(b"x" * interrupted_size)
+        download_handler = ResumableDownloadHandler(
+            tracker_file_name=tracker_file_path
+        )
+        download_handler._save_tracker_info(write_key, 
+                                            bytes_completed=interrupted_size,
+                                            version_id="not-a-version")
+        with open(retrieve_file_path, "ab") as retrieve_file:
+            write_key.get_contents_to_file(retrieve_file, 
+                                           version_id=write_key.version_id,
+                                           res_download_handler=\
+                                            download_handler)      
+
+        with open(retrieve_file_path, "rb") as retrieve_file:
+            retrieved_data = retrieve_file.read()
+        self.assertTrue(retrieved_data == test_data)
+
+        # delete the key
+        write_key.delete()
+        self.assertFalse(write_key.exists())
+        
+        # delete the bucket
+        self._s3_connection.delete_bucket(bucket.name)
+
 if __name__ == "__main__":
     initialize_logging()
     unittest.main()
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+test_retry.py
+
+test the decisions of the retry policy
+"""
+from email.utils import formatdate
+import errno
+import socket
+import tempfile
+import time
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+from lumberyard.http_connection import LumberyardHTTPError
+
+from motoboto.file_body import FileBody
+from motoboto.retry import RetryBudget, RetryPolicy, is_idempotent, \
+        parse_retry_after
+
+from tests.test_util import initialize_logging
+
+_part_uri = "/data/key?conjoined_identifier=abc&conjoined_part=2"
+
+class TestRetry(unittest.TestCase):
+    """
+    test RetryPolicy without a server
+    """
+
+    def test_idempotent_requests(self):
+        """
+        only requests that can safely be sent twice are idempotent
+        """
+        self.assertTrue(is_idempotent("GET", "/data/key"))
+        self.assertTrue(is_idempotent("HEAD", "/data/key"))
+        self.assertTrue(is_idempotent("DELETE", "/data/key"))
+        self.assertTrue(is_idempotent("POST", _part_uri))
+        self.assertFalse(is_idempotent("POST", "/data/key"))
+        self.assertFalse(is_idempotent("POST", "/conjoined/key?action=start"))
+
+    def test_retryable_errors(self):
+        """
+        server errors and dropped connections are retried, others are not
+        """
+        policy = RetryPolicy(base_delay=0.0)
+        for error in [LumberyardHTTPError(503, "Service Unavailable"),
+                      LumberyardHTTPError(500, "Internal Server Error"),
+                      socket.error(errno.ECONNRESET, "connection reset"),
+                      socket.timeout("timed out"), ]:
+            self.assertEqual(
+                policy.compute_retry_delay("GET", "/data/key", error, 0),
+                0.0,
+                repr(error)
+            )
+        for error in [LumberyardHTTPError(404, "Not Found"),
+                      LumberyardHTTPError(403, "Forbidden"),
+                      ValueError("bad argument"), 
+                      IOError(errno.ENOSPC, "No space left on device"),
+                      IOError(errno.EACCES, "Permission denied"), ]:
+            self.assertEqual(
+                policy.compute_retry_delay("GET", "/data/key", error, 0),
+                None,
+                repr(error)
+            )
+
+        # a POST that is not idempotent is never retried
+        error = LumberyardHTTPError(503, "Service Unavailable")
+        self.assertEqual(
+            policy.compute_retry_delay("POST", "/data/key", error, 0), None
+        )
+        self.assertEqual(
+            policy.compute_retry_delay("POST", _part_uri, error, 0), 0.0
+        )
+
+    def test_local_body_error(self):
+        """
+        a body file that ends early is our problem, not the connection's:
+        the request is not sent again
+        """
+        policy = RetryPolicy(base_delay=0.0)
+        client, server = socket.socketpair()
+        try:
+            with tempfile.TemporaryFile() as file_object:
+                file_object.write(b"short file")
+                file_object.flush()
+                body = FileBody(file_object, 0, 1024)
+                with self.assertRaises(IOError) as context:
+                    body.send(client)
+        finally:
+            client.close()
+            server.close()
+
+        self.assertEqual(
+            policy.compute_retry_delay("POST", 
+                                       _part_uri, 
+                                       context.exception, 
+                                       0), 
+            None
+        )
+
+    def test_backoff(self):
+        """
+        the delay is jittered below an exponential limit, and attempts stop
+        at num_retries
+        """
+        policy = RetryPolicy(num_retries=5, base_delay=1.0, max_delay=8.0,
+                             budget_reserve=1000.0)
+        error = LumberyardHTTPError(503, "Service Unavailable")
+        for attempt in range(5):
+            limit = min(8.0, 2 ** attempt)
+            for _ in range(20):
+                delay = policy.compute_retry_delay("GET", "/data/key",
+                                                   error, attempt)
+                self.assertTrue(0.0 <= delay <= limit, (attempt, delay, ))
+        self.assertEqual(
+            policy.compute_retry_delay("GET", "/data/key", error, 5), None
+        )
+
+    def test_retry_after(self):
+        """
+        Retry-After is waited out, unless it is longer than max_delay
+        """
+        self.assertEqual(parse_retry_after("7"), 7.0)
+        self.assertEqual(parse_retry_after("soon"), None)
+        delay = parse_retry_after(formatdate(time.time() + 60, usegmt=True))
+        self.assertTrue(55.0 <= delay <= 60.0, delay)
+
+        policy = RetryPolicy(base_delay=0.0, max_delay=10.0)
+        error = LumberyardHTTPError(429, "Too Many Requests")
+        self.assertEqual(
+            policy.compute_retry_delay("GET", "/data/key", error, 0, "3"),
+            3.0
+        )
+        self.assertEqual(
+            policy.compute_retry_delay("GET", "/data/key", error, 0, "30"),
+            None
+        )
+
+    def test_retry_budget(self):
+        """
+        retries stop when the budget is spent, and earn back slowly
+        """
+        budget = RetryBudget(ratio=0.5, reserve=2.0)
+        self.assertTrue(budget.withdraw())
+        self.assertTrue(budget.withdraw())
+        self.assertFalse(budget.withdraw())
+        budget.deposit()
+        self.assertFalse(budget.withdraw())
+        budget.deposit()
+        self.assertTrue(budget.withdraw())
+
+        # the balance never goes over the reserve
+        for _ in range(10):
+            budget.deposit()
+        self.assertEqual(budget.balance, 2.0)
+
+        policy = RetryPolicy(base_delay=0.0, budget_ratio=0.0,
+                             budget_reserve=1.0)
+        error = socket.error(errno.ECONNRESET, "connection reset")
+        self.assertEqual(
+            policy.compute_retry_delay("GET", "/data/key", error, 0), 0.0
+        )
+        self.assertEqual(
+            policy.compute_retry_delay("GET", "/data/key", error, 0), None
+        )
+
+    def test_compute_delay(self):
+        """
+        a caller that counts its own attempts, such as a resumable handler,
+        still spends the shared budget
+        """
+        policy = RetryPolicy(num_retries=1, base_delay=0.0, 
+                             budget_ratio=0.0, budget_reserve=2.0)
+        error = socket.error(errno.ECONNRESET, "connection reset")
+        self.assertEqual(policy.compute_delay(error, 5), 0.0)
+        self.assertEqual(
+            policy.compute_delay(LumberyardHTTPError(404, "not found"), 0), 
+            None
+        )
+        self.assertEqual(
+            policy.compute_retry_delay("GET", "/data/key", error, 0), 0.0
+        )
+        self.assertEqual(policy.compute_delay(error, 0), None)
+
+if __name__ == "__main__":
+    initialize_logging()
+    unittest.main()
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+test_single_flight.py
+
+test sharing one call among threads
+"""
+import sys
+import threading
+import time
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+from motoboto.deadline import DeadlineExceeded, deadline_scope
+from motoboto.s3.single_flight import SingleFlight
+
+from tests.test_util import initialize_logging
+
+_thread_count = 8
+_wait_time = 10.0
+
+class TestSingleFlight(unittest.TestCase):
+    """
+    test SingleFlight without a server
+    """
+
+    def _run_threads(self, single_flight, call_key, function):
+        """
+        make the call from several threads, while function is blocked,
+        return the list of (succeeded, result or error)
+        """
+        outcomes = list()
+        lock = threading.Lock()
+        def _run():
+            try:
+                outcome = (True, single_flight.do(call_key, function), )
+            except Exception:
+                outcome = (False, sys.exc_info()[1], )
+            with lock:
+                outcomes.append(outcome)
+
+        threads = [threading.Thread(target=_run)
+                   for _ in range(_thread_count)]
+        for thread in threads:
+            thread.start()
+        return threads, outcomes
+
+    def _wait_for_waiters(self, single_flight):
+        while single_flight.calls_made + single_flight.calls_shared < \
+              _thread_count:
+            time.sleep(0.01)
+
+    def test_shared_result(self):
+        """
+        threads making the same call at once share one call
+        """
+        single_flight = SingleFlight()
+        release = threading.Event()
+        def _function():
+            release.wait(_wait_time)
+            return b"contents"
+
+        threads, outcomes = self._run_threads(single_flight,
+                                              ("key", ),
+                                              _function)
+        self._wait_for_waiters(single_flight)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(single_flight.calls_made, 1)
+        self.assertEqual(single_flight.calls_shared, _thread_count - 1)
+        self.assertEqual(outcomes, [(True, b"contents", )] * _thread_count)
+
+    def test_shared_error(self):
+        """
+        every thread gets the error of the shared call
+        """
+        single_flight = SingleFlight()
+        release = threading.Event()
+        error = IOError("connection reset")
+        def _function():
+            release.wait(_wait_time)
+            raise error
+
+        threads, outcomes = self._run_threads(single_flight,
+                                              ("key", ),
+                                              _function)
+        self._wait_for_waiters(single_flight)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(single_flight.calls_made, 1)
+        self.assertEqual(outcomes, [(False, error, )] * _thread_count)
+
+    def test_calls_in_turn(self):
+        """
+        calls that are not in flight together, or are not the same, are
+        not shared
+        """
+        single_flight = SingleFlight()
+        self.assertEqual(single_flight.do(("a", ), lambda: 1), 1)
+        self.assertEqual(single_flight.do(("a", ), lambda: 2), 2)
+        self.assertEqual(single_flight.do(("b", ), lambda: 3), 3)
+        self.assertEqual(single_flight.calls_made, 3)
+        self.assertEqual(single_flight.calls_shared, 0)
+
+    def test_waiter_deadline(self):
+        """
+        a waiting thread gives up at its own deadline
+        """
+        single_flight = SingleFlight()
+        release = threading.Event()
+        def _function():
+            release.wait(_wait_time)
+            return b"contents"
+
+        leader = threading.Thread(
+            target=lambda: single_flight.do(("key", ), _function)
+        )
+        leader.start()
+        while single_flight.calls_made == 0:
+            time.sleep(0.01)
+
+        with deadline_scope(total_timeout=0.1):
+            self.assertRaises(DeadlineExceeded,
+                              single_flight.do,
+                              ("key", ),
+                              _function)
+        release.set()
+        leader.join()
+
+if __name__ == "__main__":
+    initialize_logging()
+    unittest.main()
@@ -19,6 +19,7 @@ _motoboto = os.environ.get("USE_BOTO", "0") != "1"
 
 if _motoboto:
     import motoboto as boto
+    from motoboto.s3.block_cache import BlockCache
     from motoboto.s3.key import Key
 
 from tests.test_util import test_dir_path, initialize_logging
@@ -262,6 +263,121 @@ class TestSlice(unittest.TestCase):
 
         self._tear_down_archive(key)
 
+    @unittest.skipIf(not _motoboto, "motoboto only")
+    def test_parallel_multipart(self):
+        """
+        test get_contents_to_file fetching ranges in parallel, for the whole
+        archive and for slices
+        """
+        test_data, key = self._set_up_multipart_archive(
+            "test_parallel_multipart"
+        )
+        part_size = 1024 ** 2
+        test_params = [(None, None), 
+                       (0, _multipart_part_size + 1), 
+                       (12345, part_size * 3), 
+                       (len(test_data) - 2048, None), ]
+
+        for slice_offset, slice_size in test_params:
+            retrieve_file_path = os.path.join(
+                test_dir_path, "test_parallel_multipart"
+            )
+            with open(retrieve_file_path, "wb") as retrieve_file:
+                key.get_contents_to_file(retrieve_file, 
+                                         slice_offset=slice_offset, 
+                                         slice_size=slice_size,
+                                         concurrency=4,
+                                         part_size=part_size) 
+                self.assertEqual(retrieve_file.tell(), 
+                                 os.path.getsize(retrieve_file_path))
+
+            with open(retrieve_file_path, "rb") as retrieve_file:
+                retrieved_data = retrieve_file.read()
+
+            start = (0 if slice_offset is None else slice_offset)
+            end = (None if slice_size is None else start + slice_size)
+            self.assertEqual(len(retrieved_data), 
+                             len(test_data[start:end]),
+                             (slice_offset, slice_size, ))
+            self.assertTrue(retrieved_data == test_data[start:end],
+                            (slice_offset, slice_size, ))
+
+        self._tear_down_archive(key)
+
+    @unittest.skipIf(not _motoboto, "motoboto only")
+    def test_block_cache(self):
+        """
+        test get_contents_as_string serving slices of a version from a 
+        BlockCache, in memory and on disk
+        """
+        test_data, key = self._set_up_single_archive()
+        block_size = 64 * 1024
+        test_params = [(0, 1024), 
+                       (1024, 2048), 
+                       (block_size - 100, 200), 
+                       (12345, block_size * 3), 
+                       (len(test_data) - 2048, None), 
+                       (len(test_data) - 100, 1000), 
+                       (len(test_data) + 100, 1000), ]
+
+        disk_path = os.path.join(test_dir_path, "block_cache")
+        for memory_budget in [block_size * 64, block_size * 2, ]:
+            block_cache = BlockCache(block_size=block_size, 
+                                     memory_budget=memory_budget,
+                                     disk_path=disk_path)
+            s3_connection = boto.connect_s3(block_cache=block_cache)
+            read_key = Key(s3_connection.get_bucket(key._bucket.name))
+            read_key.name = key.name
+
+            misses = list()
+            for _ in range(2):
+                for slice_offset, slice_size in test_params:
+                    data = read_key.get_contents_as_string(
+                        version_id=key.version_id,
+                        slice_offset=slice_offset,
+                        slice_size=slice_size
+                    )
+                    end = (None if slice_size is None 
+                           else slice_offset + slice_size)
+                    self.assertTrue(data == test_data[slice_offset:end],
+                                    (slice_offset, slice_size, ))
+                misses.append(block_cache.misses)
+
+            # the second pass is served from memory or disk
+            self.assertEqual(misses[0], misses[1])
+            self.assertTrue(block_cache.hits > 0)
+            self.assertTrue(block_cache.memory_bytes <= memory_budget)
+            s3_connection.close()
+
+        block_cache.clear()
+        self.assertEqual(block_cache.disk_bytes, 0)
+        self.assertEqual(os.listdir(disk_path), [])
+
+        self._tear_down_archive(key)
+
+    @unittest.skipIf(not _motoboto, "motoboto only")
+    def test_block_cache_block_size_change(self):
+        """
+        a BlockCache reopened on the same disk_path with another block_size
+        does not serve the blocks of the old one
+        """
+        test_data, key = self._set_up_single_archive()
+        disk_path = os.path.join(test_dir_path, "block_cache")
+        for block_size in [4 * 1024, 8 * 1024, 4 * 1024, ]:
+            block_cache = BlockCache(block_size=block_size, 
+                                     disk_path=disk_path)
+            s3_connection = boto.connect_s3(block_cache=block_cache)
+            read_key = Key(s3_connection.get_bucket(key._bucket.name))
+            read_key.name = key.name
+            data = read_key.get_contents_as_string(version_id=key.version_id,
+                                                   slice_offset=0,
+                                                   slice_size=16 * 1024)
+            self.assertTrue(data == test_data[:16 * 1024], block_size)
+            s3_connection.close()
+
+        block_cache.clear()
+        self._tear_down_archive(key)
+
 if __name__ == "__main__":
     initialize_logging()
     unittest.main()
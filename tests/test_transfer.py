@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+test_transfer.py
+
+test moving many files at once with TransferManager
+
+note TransferManager is a motoboto extension, it does not exist in boto
+"""
+import logging
+import os
+import os.path
+import shutil
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+_motoboto = os.environ.get("USE_BOTO", "0") != "1"
+
+if _motoboto:
+    import motoboto as boto
+    from motoboto.transfer import TransferManager
+
+from tests.test_util import test_dir_path, initialize_logging
+
+class TestTransfer(unittest.TestCase):
+    """
+    test moving many files at once with TransferManager
+    """
+
+    def setUp(self):
+        log = logging.getLogger("setUp")
+        self.tearDown()  
+        log.debug("creating {0}".format(test_dir_path))
+        os.makedirs(test_dir_path)
+        log.debug("opening s3 connection")
+        self._s3_connection = boto.connect_s3()
+
+    def tearDown(self):
+        log = logging.getLogger("tearDown")
+        if hasattr(self, "_s3_connection") \
+        and self._s3_connection is not None:
+            log.debug("closing s3 connection")
+            self._s3_connection.close()
+            self._s3_connection = None
+
+        if os.path.exists(test_dir_path):
+            shutil.rmtree(test_dir_path)
+
+    @unittest.skipIf(not _motoboto, "motoboto only")
+    def test_upload_and_download(self):
+        """
+        test uploading and downloading a mix of small and large files
+        """
+        part_size = 1024 ** 2
+        file_sizes = [0, 1, 1024, 10 * 1024, part_size * 3 + 17, ]
+
+        # create the bucket
+        bucket = self._s3_connection.create_unique_bucket()
+        self.assertTrue(bucket is not None)
+
+        upload_dir = os.path.join(test_dir_path, "upload")
+        os.makedirs(upload_dir)
+        test_data = dict()
+        for index, file_size in enumerate(file_sizes):
+            key_name = "test-key-{0}".format(index)
+            test_data[key_name] = os.urandom(file_size)
+            with open(os.path.join(upload_dir, key_name), "wb") as output_file:
+                output_file.write(test_data[key_name])
+
+        with TransferManager(max_workers=3, 
+                             multipart_threshold=part_size,
+                             part_size=part_size,
+                             part_concurrency=2) as transfer_manager:
+            futures = [
+                transfer_manager.upload(bucket, 
+                                        os.path.join(upload_dir, key_name))
+                for key_name in sorted(test_data)
+            ]
+            for future in futures:
+                key = future.result()
+                self.assertEqual(key.name, future.key_name)
+                self.assertTrue(future.done())
+                self.assertEqual(future.bytes_transferred, 
+                                 len(test_data[key.name]))
+
+            self.assertEqual(transfer_manager.completed_count, len(futures))
+            self.assertEqual(transfer_manager.bytes_transferred, 
+                             sum(file_sizes))
+            self.assertTrue(transfer_manager.throughput > 0)
+
+            download_dir = os.path.join(test_dir_path, "download", "nested")
+            futures = [
+                transfer_manager.download(bucket, 
+                                          key_name,
+                                          os.path.join(download_dir, key_name))
+                for key_name in sorted(test_data)
+            ]
+            missing_future = transfer_manager.download(
+                bucket, "no-such-key", os.path.join(download_dir, "missing")
+            )
+
+        for future in futures:
+            with open(future.path, "rb") as input_file:
+                self.assertTrue(
+                    input_file.read() == test_data[future.key_name],
+                    future.key_name
+                )
+        self.assertTrue(missing_future.exception() is not None)
+        self.assertEqual(transfer_manager.failed_count, 1)
+        self.assertEqual(transfer_manager.pending_count, 0)
+
+        self.assertEqual(len(list(bucket.delete_keys(test_data.keys()))),
+                         len(test_data))
+        
+        # delete the bucket
+        self._s3_connection.delete_bucket(bucket.name)
+
+if __name__ == "__main__":
+    initialize_logging()
+    unittest.main()